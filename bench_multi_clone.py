@@ -0,0 +1,259 @@
+# Imports
+import contextlib
+import io
+import json
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# Set directory to root
+current_dir = os.path.dirname(os.path.abspath(__file__))
+os.chdir(current_dir)
+sys.path.insert(0, current_dir)
+
+# Imports after directory change
+from multiclone.core import main
+from multiclone.core import clone_request
+from multiclone.sub.git.command import git_run
+
+#####################################################################################################
+# Define ############################################################################################
+#####################################################################################################
+
+# Argument name -> (default, type, description)
+ARGUMENT_MAP = {
+    "--depth": (3, int, "Dependency levels below the root repository"),
+    "--fan-out": (3, int, "Dependencies listed by every repository above the last level"),
+    "--width": (16, int, "Maximum repositories per level, dependencies are shared (diamonds) once reached"),
+    "--files": (50, int, "Files per repository"),
+    "--file-size": (4096, int, "Bytes per file"),
+    "--commits": (3, int, "Commits per repository"),
+    "--jobs": (4, int, "Jobs passed to main"),
+    "--runs": (3, int, "Measured runs, every run clones into an empty workspace"),
+    "--actions": (0, int, "1 to add .postcloneactions (shared folder and content structure link) to every repository"),
+    "--state": (0, int, "1 to use the workspace state, the workspace is kept so runs after the first are no-op reruns"),
+    "--bench-path": (None, str, "Folder for the synthetic remotes and workspaces (default: temporary folder)"),
+    "--save": (None, str, "Path to write the results to as JSON"),
+    "--compare": (None, str, "Path of saved results to compare with, exit code 1 on regression"),
+    "--threshold": (10.0, float, "Allowed slow down in percent of the median total time before a regression"),
+}
+
+#####################################################################################################
+# Functions #########################################################################################
+#####################################################################################################
+
+def get_arguments():
+    """
+    Parse the command line, "--name value" for every entry of ARGUMENT_MAP. "--help" prints the arguments.
+
+    Returns:
+        dict: Argument name without "--" and with "_" instead of "-" -> value.
+    """
+    if "--help" in sys.argv:
+        print("Usage: python bench_multi_clone.py [--<argument> <value>]")
+        for name, (default, _, description) in ARGUMENT_MAP.items():
+            print(f"  {name}: {description} (default: {default})")
+        sys.exit(0)
+    argument_map = {}
+    for name, (default, cast, _) in ARGUMENT_MAP.items():
+        value = default
+        if name in sys.argv:
+            index = sys.argv.index(name)
+            if index + 1 < len(sys.argv):
+                value = cast(sys.argv[index + 1])
+        argument_map[name[2:].replace("-", "_")] = value
+    return argument_map
+
+def build_level_names(depth, fan_out, width):
+    """
+    Name the repositories of every level, level 0 being the root repository.
+
+    Returns:
+        list: One repository name array per level.
+    """
+    level_array = []
+    for level in range(depth + 1):
+        count = min(max(1, fan_out) ** level, width)
+        level_array.append([f"Bench{level}x{index}" for index in range(count)])
+    return level_array
+
+def build_remotes(remote_path, level_array, fan_out, files, file_size, commits, actions):
+    """
+    Create a bare repository for every name, each listing fan_out repositories of the next level as dependencies.
+
+    Returns:
+        int: Number of repositories created.
+    """
+    work_path = os.path.join(remote_path, "_work")
+    for level, name_array in enumerate(level_array):
+        next_name_array = level_array[level + 1] if level + 1 < len(level_array) else []
+        for index, name in enumerate(name_array):
+            repo_path = os.path.join(work_path, name)
+            git_run(["git", "init", "--quiet", repo_path])
+            dependency_array = []
+            for k in range(min(fan_out, len(next_name_array))):
+                dependency_name = next_name_array[(index * fan_out + k) % len(next_name_array)]
+                if dependency_name not in dependency_array:
+                    dependency_array.append(dependency_name)
+            if dependency_array:
+                with open(os.path.join(repo_path, ".dependencies"), 'w') as file:
+                    file.write("\n".join(f"file://{os.path.join(remote_path, dependency)}"
+                                         for dependency in dependency_array))
+            if actions:
+                with open(os.path.join(repo_path, ".postcloneactions"), 'w') as file:
+                    file.write("Action_CreateMainFolder Shared\n"
+                               f"Action_LinkContentStructureToFolder target=Content;exclusions=.dependencies;"
+                               f".postcloneactions\n")
+            content_path = os.path.join(repo_path, "Content", name)
+            os.makedirs(content_path)
+            for commit in range(max(1, commits)):
+                for file_index in range(files):
+                    with open(os.path.join(content_path, f"file{file_index}.txt"), 'wb') as file:
+                        file.write(f"{name} {commit} {file_index}\n".encode().ljust(file_size, b"."))
+                git_run(["git", "add", "-A"], cwd=repo_path)
+                git_run(["git", "-c", "user.name=bench", "-c", "user.email=bench@localhost", "commit", "--quiet",
+                         "-m", f"Commit {commit}"], cwd=repo_path)
+            git_run(["git", "clone", "--quiet", "--bare", repo_path, os.path.join(remote_path, name)])
+    shutil.rmtree(work_path)
+    return sum(len(name_array) for name_array in level_array)
+
+def run_once(remote_path, workspace_path, root_name, jobs, trace_path, state=False, keep=False):
+    """
+    Run main with tracing enabled, output suppressed.
+
+    Args:
+        state (bool, optional, default=False): Use the workspace state.
+        keep (bool, optional, default=False): Run on the existing workspace instead of an empty one.
+
+    Returns:
+        dict: Wall time in seconds per phase and in total, and the run status.
+    """
+    if os.path.exists(workspace_path) and not keep:
+        shutil.rmtree(workspace_path)
+    request = clone_request(url=f"file://{os.path.join(remote_path, root_name)}", branch=None, commit=None)
+    output = io.StringIO()
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        status = main([request], path=workspace_path, force=True, depth=1, jobs=jobs, trace=trace_path, state=state)
+    total = time.perf_counter() - start_time
+
+    with open(trace_path, 'r') as file:
+        event_array = json.load(file)["traceEvents"]
+    phase_map = {"total": total}
+    for event in event_array:
+        if event.get("cat") == "phase":
+            phase_map[event["name"]] = phase_map.get(event["name"], 0) + event["dur"] / 1e6
+    phase_map["status"] = status
+    return phase_map
+
+def peak_rss_mb():
+    """
+    Get the peak resident set size of this process and of its finished child processes (git).
+
+    Returns:
+        tuple: Peak RSS in MB of this process and of the largest child process.
+    """
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KB on Linux
+    self_usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    child_usage = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return self_usage * scale / 1024 / 1024, child_usage * scale / 1024 / 1024
+
+def compare_results(result_map, baseline_map, threshold):
+    """
+    Print the median phase times against a baseline.
+
+    Returns:
+        bool: True if the median total time is more than threshold percent slower than the baseline.
+    """
+    print(f"Compared with baseline (threshold {threshold}%):")
+    ignored_set = {"bench_path", "save", "compare", "threshold"}
+    if any(baseline_map["config"].get(name) != value for name, value in result_map["config"].items()
+           if name not in ignored_set):
+        print("  Warning: baseline was measured with a different config")
+    regression = False
+    for phase, median in result_map["median"].items():
+        baseline = baseline_map["median"].get(phase)
+        if not baseline:
+            continue
+        change = (median - baseline) / baseline * 100
+        print(f"  {phase:20} {baseline:8.3f} s -> {median:8.3f} s ({change:+.1f}%)")
+        if phase == "total" and change > threshold:
+            regression = True
+    print("Regression detected" if regression else "No regression detected")
+    return regression
+
+#####################################################################################################
+# Benchmark #########################################################################################
+#####################################################################################################
+
+if __name__ == "__main__":
+    argument_map = get_arguments()
+    bench_path = argument_map["bench_path"] or tempfile.mkdtemp(prefix="multiclone-bench-")
+    remote_path = os.path.join(bench_path, "remote")
+    if os.path.exists(remote_path):
+        shutil.rmtree(remote_path)
+    os.makedirs(remote_path)
+
+    # Build synthetic remotes
+    print("")
+    print("MultiClone benchmark")
+    print("")
+    print("Config:")
+    for name, value in argument_map.items():
+        print(f"  {name}: {value}")
+    level_array = build_level_names(argument_map["depth"], argument_map["fan_out"], argument_map["width"])
+    start_time = time.perf_counter()
+    repo_count = build_remotes(remote_path, level_array, argument_map["fan_out"], argument_map["files"],
+                               argument_map["file_size"], argument_map["commits"], argument_map["actions"])
+    print(f"  Repositories: {repo_count} (built in {time.perf_counter() - start_time:.2f} s)")
+    print("")
+
+    # Measure
+    run_array = []
+    print("Runs:")
+    for run in range(max(1, argument_map["runs"])):
+        phase_map = run_once(remote_path, os.path.join(bench_path, "workspace"), level_array[0][0],
+                             argument_map["jobs"], os.path.join(bench_path, f"trace{run}.json"),
+                             state=bool(argument_map["state"]), keep=bool(argument_map["state"]) and run > 0)
+        run_array.append(phase_map)
+        phase_string = ", ".join(f"{phase} {seconds:.3f} s" for phase, seconds in phase_map.items()
+                                 if phase not in ("total", "status"))
+        print(f"  Run {run + 1}: {phase_map['total']:.3f} s ({phase_string}){'' if phase_map['status'] else ' FAILED'}")
+    print("")
+
+    # Report
+    phase_name_array = [phase for phase in run_array[0] if phase != "status"]
+    result_map = {
+        "config": argument_map,
+        "repositories": repo_count,
+        "runs": run_array,
+        "median": {phase: statistics.median(phase_map.get(phase, 0) for phase_map in run_array)
+                   for phase in phase_name_array},
+    }
+    result_map["peak_rss_mb"], result_map["peak_child_rss_mb"] = peak_rss_mb()
+    print("Median:")
+    for phase, median in result_map["median"].items():
+        print(f"  {phase:20} {median:8.3f} s")
+    print(f"Peak RSS: {result_map['peak_rss_mb']:.1f} MB (largest git process: "
+          f"{result_map['peak_child_rss_mb']:.1f} MB)")
+    print(f"Traces: {bench_path}")
+    print("")
+
+    if argument_map["save"] is not None:
+        with open(argument_map["save"], 'w') as file:
+            json.dump(result_map, file, indent=2)
+        print(f"Results written: {argument_map['save']}")
+    exit_code = 0
+    if argument_map["compare"] is not None:
+        with open(argument_map["compare"], 'r') as file:
+            baseline_map = json.load(file)
+        if compare_results(result_map, baseline_map, argument_map["threshold"]):
+            exit_code = 1
+    if not all(phase_map["status"] for phase_map in run_array):
+        print("Not all runs successful")
+        exit_code = 1
+    sys.exit(exit_code)
@@ -11,19 +11,47 @@ if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("")
         print(
-            "Usage: python Main.py <url_list> [--path <value>] [--version-action <value>] [--force] [--depth <value>]")
+            "Usage: python Main.py <url_list> [--path <value>] [--version-action <value>] [--conflict-action <value>] [--force] [--sync] [--resolve] [--depth <value>] [--jobs <value>] [--write-lock <value>] [--from-lock <value>] [--mirror-cache <value>] [--mirror-cache-size <value>] [--pipeline-actions] [--initial-stage-order <value>] [--final-stage-order <value>] [--plan] [--async-limit <value>] [--action-timeout <value>] [--trace <value>] [--state] [--resume] [--prefetch]")
         print(
             "  <url_list>: Semicolon separated list of urls to clone. Specific versions can be acquired by space separated addition of:")
         print("    branch=<branch name>: name of branch to clone")
         print(
             "    commit=<commit>: ID of specific commit to clone (disregards branch if present, however is disregarded itself on use of ALL_NEWEST)")
+        print("    depth=<depth>: Clone depth of this repository (overrides --depth)")
+        print("    filter=<filter spec>: Partial clone filter, for example filter=blob:none")
+        print("    sparse=<dir>[,<dir>]: Only materialize these folders (and the files in the repository root)")
         print("  --path: Absolute path to roo clone folder (optional, default: os.getcwd())")
         print("  --version-action: Specifies how to handle repository versioning. Accepted values as string or number:")
         print("    1: USE_TARGET_IF_ARGUMENT_ELSE_NEWEST")
         print("    2: ALL_NEWEST")
         print("    3: ALWAYS_USE_TARGET")
+        print("  --conflict-action: Specifies the version used when dependencies request a repository at different versions. Accepted values as string or number:")
+        print("    1: USE_FIRST_REQUEST")
+        print("    2: USE_NEWEST")
+        print("    3: FAIL (clones not yet started are cancelled once a conflict is found, use --resolve to abort before cloning anything)")
         print("  --force: Whether to force clone (optional, default: False)")
+        print("  --sync: Fetch the requested version into existing repositories instead of re-cloning (optional, default: False)")
+        print("  --resolve: Resolve all dependencies remotely before cloning anything (optional, default: False)")
         print("  --depth: Clone depth (optional, default: 1)")
+        print("  --jobs: Number of repositories cloned at the same time (optional, default: 1)")
+        print("  --write-lock: Path of a lock file to write the resolved commit of every cloned repository to (optional)")
+        print("  --from-lock: Path of a lock file to clone the locked commits from, <url_list> may be omitted (optional)")
+        print("  --mirror-cache: Path to a folder of bare mirrors that repositories are cloned from (optional, default: disabled)")
+        print("  --mirror-cache-size: Size in MB the mirror cache is kept below by removing least recently used mirrors (optional, default: 10240)")
+        print("  --pipeline-actions: Run post clone actions of a repository as soon as it and its dependencies are cloned (optional, default: False)")
+        print("  --initial-stage-order: Order of initial post clone actions when pipelining. Accepted values as string or number:")
+        print("    1: GLOBAL (default, completed for all repositories before any other action)")
+        print("    2: PER_REPO (run right before the actions of the same repository)")
+        print("  --final-stage-order: Order of final post clone actions when pipelining. Accepted values as string or number:")
+        print("    1: GLOBAL (default, run after all other actions once cloning is complete)")
+        print("    2: PER_REPO (run right after the actions of the same repository)")
+        print("  --plan: Print the post clone action plan instead of running the post clone actions (optional, default: False)")
+        print("  --async-limit: Number of async post clone actions running at the same time (optional, default: 8)")
+        print("  --action-timeout: Seconds an async post clone action may run before it fails (optional, default: no limit)")
+        print("  --state: Keep the workspace state in <path>/.multiclone and skip unchanged repositories and post clone actions (optional, default: False)")
+        print("  --resume: Continue an interrupted run made with --state or --resume, skipping the clones and post clone actions it finished (optional, default: False)")
+        print("  --prefetch: Clone the dependencies found by the last run with the same <url_list> right away, discarding clones no longer requested (optional, default: False)")
+        print("  --trace: Path of a Chrome trace-event JSON file to write the timing of the run to, a summary of the slowest steps is printed (optional, default: disabled)")
         print("")
 
         sys.exit(1)
@@ -35,16 +63,42 @@ if __name__ == "__main__":
         from multiclone.core import main
         from multiclone.core import string_to_clone_elements
         from multiclone.core import VersionAction
+        from multiclone.core import ConflictAction
+        from multiclone.core import StageOrder
 
 
-        # Sanity check clone_info - url_list
-        url_list = sys.argv[1].split(";")
-        if not url_list:
+        # Get from-lock argument
+        if "--from-lock" in sys.argv:
+            from_lock_index = sys.argv.index("--from-lock")
+            if from_lock_index + 1 < len(sys.argv):
+                from_lock = sys.argv[from_lock_index + 1]
+            else:
+                from_lock = None
+        else:
+            from_lock = None
+
+        # Get write-lock argument
+        if "--write-lock" in sys.argv:
+            write_lock_index = sys.argv.index("--write-lock")
+            if write_lock_index + 1 < len(sys.argv):
+                write_lock = sys.argv[write_lock_index + 1]
+            else:
+                write_lock = None
+        else:
+            write_lock = None
+
+        # Sanity check clone_info - url_list (may be omitted when cloning from a lock file)
+        if sys.argv[1].startswith("--"):
+            url_list_string = ""
+        else:
+            url_list_string = sys.argv[1]
+        url_list = [url for url in url_list_string.split(";") if url.strip()]
+        if not url_list and from_lock is None:
             print("No URLs provided. Exiting...")
             sys.exit(1)
 
         # Parse url list and build clone_request_list
-        clone_request_list = string_to_clone_elements(sys.argv[1], ";")
+        clone_request_list = string_to_clone_elements(url_list_string, ";")
 
         # Get path argument
         if "--path" in sys.argv:
@@ -81,12 +135,111 @@ if __name__ == "__main__":
         else:
             version_action = VersionAction.USE_TARGET_IF_ARGUMENT_ELSE_NEWEST  # Default value
 
+        # Get conflict-action argument
+        if "--conflict-action" in sys.argv:
+            action_index = sys.argv.index("--conflict-action")
+            if action_index + 1 < len(sys.argv):
+                action_value = sys.argv[action_index + 1]
+                try:
+                    conflict_action = ConflictAction(int(action_value))  # Try parsing as an integer
+                except ValueError:
+                    conflict_action = ConflictAction[action_value.upper()]  # Treat as a string
+            else:
+                conflict_action = ConflictAction.USE_FIRST_REQUEST  # Default value
+        else:
+            conflict_action = ConflictAction.USE_FIRST_REQUEST  # Default value
+
+        # Get pipeline-actions argument
+        if "--pipeline-actions" in sys.argv:
+            pipeline_actions = True
+        else:
+            pipeline_actions = False
+
+        # Get initial-stage-order and final-stage-order arguments
+        stage_order_map = {}
+        for stage_argument in ["--initial-stage-order", "--final-stage-order"]:
+            stage_order_map[stage_argument] = StageOrder.GLOBAL  # Default value
+            if stage_argument in sys.argv:
+                stage_index = sys.argv.index(stage_argument)
+                if stage_index + 1 < len(sys.argv):
+                    stage_value = sys.argv[stage_index + 1]
+                    try:
+                        stage_order_map[stage_argument] = StageOrder(int(stage_value))  # Try parsing as an integer
+                    except ValueError:
+                        stage_order_map[stage_argument] = StageOrder[stage_value.upper()]  # Treat as a string
+
+        # Get plan argument
+        if "--plan" in sys.argv:
+            plan = True
+        else:
+            plan = False
+
+        # Get async-limit argument
+        if "--async-limit" in sys.argv:
+            async_limit_index = sys.argv.index("--async-limit")
+            if async_limit_index + 1 < len(sys.argv):
+                async_limit = int(sys.argv[async_limit_index + 1])
+            else:
+                async_limit = 8
+        else:
+            async_limit = 8
+
+        # Get action-timeout argument
+        if "--action-timeout" in sys.argv:
+            action_timeout_index = sys.argv.index("--action-timeout")
+            if action_timeout_index + 1 < len(sys.argv):
+                action_timeout = float(sys.argv[action_timeout_index + 1])
+            else:
+                action_timeout = None
+        else:
+            action_timeout = None
+
+        # Get trace argument
+        if "--trace" in sys.argv:
+            trace_index = sys.argv.index("--trace")
+            if trace_index + 1 < len(sys.argv):
+                trace = sys.argv[trace_index + 1]
+            else:
+                trace = None
+        else:
+            trace = None
+
+        # Get state argument
+        if "--state" in sys.argv:
+            state = True
+        else:
+            state = False
+
+        # Get resume argument
+        if "--resume" in sys.argv:
+            resume = True
+        else:
+            resume = False
+
+        # Get prefetch argument
+        if "--prefetch" in sys.argv:
+            prefetch = True
+        else:
+            prefetch = False
+
         # Get force argument
         if "--force" in sys.argv:
             force = True
         else:
             force = False
 
+        # Get sync argument
+        if "--sync" in sys.argv:
+            sync = True
+        else:
+            sync = False
+
+        # Get resolve argument
+        if "--resolve" in sys.argv:
+            resolve = True
+        else:
+            resolve = False
+
         # Get depth argument
         if "--depth" in sys.argv:
             depth_index = sys.argv.index("--depth")
@@ -97,6 +250,36 @@ if __name__ == "__main__":
         else:
             depth = 1
 
+        # Get jobs argument
+        if "--jobs" in sys.argv:
+            jobs_index = sys.argv.index("--jobs")
+            if jobs_index + 1 < len(sys.argv):
+                jobs = int(sys.argv[jobs_index + 1])
+            else:
+                jobs = 1
+        else:
+            jobs = 1
+
+        # Get mirror-cache argument
+        if "--mirror-cache" in sys.argv:
+            mirror_cache_index = sys.argv.index("--mirror-cache")
+            if mirror_cache_index + 1 < len(sys.argv):
+                mirror_cache = sys.argv[mirror_cache_index + 1]
+            else:
+                mirror_cache = None
+        else:
+            mirror_cache = None
+
+        # Get mirror-cache-size argument
+        if "--mirror-cache-size" in sys.argv:
+            mirror_cache_size_index = sys.argv.index("--mirror-cache-size")
+            if mirror_cache_size_index + 1 < len(sys.argv):
+                mirror_cache_size = int(sys.argv[mirror_cache_size_index + 1])
+            else:
+                mirror_cache_size = 10240
+        else:
+            mirror_cache_size = 10240
+
         # Act on debug argument
         if "--debug" in sys.argv:
             root_folder = os.getcwd()
@@ -113,4 +296,10 @@ if __name__ == "__main__":
 
         # Call main
         main(clone_request_list, path=path, version_action=version_action, force=force, depth=depth,
-             action_paths=action_paths)
+             action_paths=action_paths, jobs=jobs, mirror_cache=mirror_cache, mirror_cache_size=mirror_cache_size,
+             sync=sync, resolve=resolve, write_lock=write_lock, from_lock=from_lock,
+             conflict_action=conflict_action, pipeline_actions=pipeline_actions,
+             initial_stage_order=stage_order_map["--initial-stage-order"],
+             final_stage_order=stage_order_map["--final-stage-order"], plan=plan, async_limit=async_limit,
+             action_timeout=action_timeout, trace=trace, state=state, resume=resume,
+             prefetch=prefetch)
@@ -5,24 +5,47 @@
 # System
 import sys
 import os
+import time
 
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from enum import Enum, auto
 
 # Non-system
 from multiclone.sub.globals import globals_object
 
 from multiclone.sub.clone_url import git_clone_url
+from multiclone.sub.clone_url import clone_result
+from multiclone.sub.clone_url import promote_clone
+from multiclone.sub.clone_url import discard_clone
 from multiclone.sub.post_clone_handler import post_clone_action_handler
+from multiclone.sub.post_clone_handler import PostCloneActionPipeline
+from multiclone.sub.post_clone_handler import StageOrder
+from multiclone.sub.async_action import ASYNC_LIMIT_DEFAULT
 from multiclone.sub.path import build_clone_dependencies_path
+from multiclone.sub.git.mirror import mirror_evict
+from multiclone.sub.git.mirror import mirror_update
+from multiclone.sub.git.remote_file import git_read_remote_file
+from multiclone.sub.clone_url import normalize_url
+from multiclone.sub.graph import DependencyGraph
+from multiclone.sub.clone_url import extract_repo_name
+from multiclone.sub.trace import trace_enable
+from multiclone.sub.trace import trace_finish
+from multiclone.sub.trace import trace_span
+from multiclone.sub.state import WorkspaceState
+from multiclone.sub.prefetch import GraphCache
 
 #####################################################################################################
 # Define ############################################################################################
 #####################################################################################################
 
 # Define named tuple types
-clone_request = namedtuple("clone_request", ["url", "branch", "commit"])
-clone_info = namedtuple("clone_info", ["url", "branch", "commit", "clone_attempted", "clone_status", "clone_path"])
+clone_request = namedtuple("clone_request", ["url", "branch", "commit", "depth", "filter", "sparse"],
+                           defaults=(None, None, None))
+clone_info = namedtuple("clone_info", ["url", "branch", "commit", "clone_attempted", "clone_status", "clone_path",
+                                       "depth", "filter", "sparse", "clone_commit"], defaults=(None, None, None, None))
+
+version_constraint = namedtuple("version_constraint", ["requester", "branch", "commit"])
 
 # Define enums
 class VersionAction(Enum):
@@ -30,41 +53,129 @@ class VersionAction(Enum):
     ALL_NEWEST = auto()
     ALWAYS_USE_TARGET = auto()
 
+class ConflictAction(Enum):
+    USE_FIRST_REQUEST = auto()  # Default
+    USE_NEWEST = auto()
+    FAIL = auto()
+
 #####################################################################################################
 # main ##############################################################################################
 #####################################################################################################
 
 def main(clone_request_list, path=None, version_action=VersionAction.USE_TARGET_IF_ARGUMENT_ELSE_NEWEST,
-         force=True, depth=1, action_paths=None):
+         force=True, depth=1, action_paths=None, jobs=1, mirror_cache=None, mirror_cache_size=10240,
+         sync=False, resolve=False, write_lock=None, from_lock=None,
+         conflict_action=ConflictAction.USE_FIRST_REQUEST, pipeline_actions=False,
+         initial_stage_order=StageOrder.GLOBAL, final_stage_order=StageOrder.GLOBAL, plan=False,
+         async_limit=ASYNC_LIMIT_DEFAULT, action_timeout=None, trace=None, state=False, resume=False,
+         prefetch=False):
     """
     Main function to perform the cloning process.
-    When all provided elements have been cloned each repository will be searched (in order) for ".dependencies".
+    When a provided element has been cloned its repository will be searched for ".dependencies".
     Content of ".dependencies". should be formatted as the clone_request_list using linefeed instead of ";".
-    ".dependencies" will be cloned while new dependencies are found.
+    ".dependencies" are queued for cloning as soon as they are found, while other clones are still running.
 
     Args:
         clone_request_list (list): List of clone_request objects.
                                    Use space separated branch= or commit= to specify specific target version.
+                                   Use space separated depth=, filter= or sparse= to specify per repository clone
+                                   options.
         path (str, optional, default = os.getcwd()): The absolute clone target path.
         version_action (VersionAction, optional): Version action to perform.
                                                   Default is USE_TARGET_IF_ARGUMENT_ELSE_NEWEST.
         force (bool, optional): Whether to force removal of existing repositories. Default is True.
         depth (int, optional): The depth of the clone (number of commits to include). Default is 1.
         action_paths (str array, optional, default empty): Array of paths to load post clone actions from.
+        jobs (int, optional): Number of repositories cloned, and handled by post clone actions, at the same time.
+                              Default is 1.
+        mirror_cache (str, optional): Path to a cache of bare mirrors that repositories are cloned from. Mirrors are
+                                      fetched incrementally. Disabled if None (default).
+        mirror_cache_size (int, optional): Size in MB the mirror cache is reduced to after cloning by removing the least
+                                           recently used mirrors. Default is 10240.
+        sync (bool, optional): Update existing repositories by fetching the requested version and hard resetting to it
+                               instead of removing and re-cloning them. Takes precedence over force. Default is False.
+        resolve (bool, optional): Resolve the full dependency graph by fetching only the ".dependencies"-files before
+                                  cloning anything. Aborts if a repository can not be resolved. Default is False.
+        write_lock (str, optional): Path of a lock file to write the resolved commit of every cloned repository to.
+        from_lock (str, optional): Path of a lock file to clone from. All locked commits are cloned at once and
+                                   ".dependencies" are not searched. clone_request_list may be empty. Default is None.
+        conflict_action (ConflictAction, optional): Version selected when dependencies request a repository at
+                                                    different versions. Default is USE_FIRST_REQUEST. FAIL cancels
+                                                    the clones not yet started as soon as a conflict is found, only
+                                                    with resolve the run aborts before anything is cloned.
+        pipeline_actions (bool, optional): Run the post clone actions of a repository as soon as it and all its
+                                           dependencies have been cloned, while other clones are still running.
+                                           Default is False.
+        initial_stage_order (StageOrder, optional): Order of the initial actions when pipelining. GLOBAL (default)
+                                                    completes them for all repositories before any normal action.
+        final_stage_order (StageOrder, optional): Order of the final actions when pipelining. GLOBAL (default) runs
+                                                  them after all other actions once cloning is complete.
+        plan (bool, optional): Print the compiled post clone action plan instead of running it (dry-run of the post
+                               clone actions, repositories are still cloned). Default is False.
+        async_limit (int, optional): Number of async post clone actions ("async def action(self, ctx)") running at the
+                                     same time. Default is 8.
+        action_timeout (float, optional): Seconds an async post clone action may run before it is cancelled and fails.
+                                          No limit if None (default).
+        trace (str, optional): Path of a Chrome trace-event JSON file to write the timing of every phase, clone, git
+                               command, plugin load and post clone action to. A summary of the slowest is printed at
+                               the end. Disabled if None (default).
+        state (bool, optional): Keep the state of the workspace in "<path>/.multiclone/state.db". Repositories requested
+                                with the same url, version and options as when they were cloned, and still at the
+                                cloned commit, are not cloned again (also with force, branches are not checked for new
+                                commits unless sync is used). Post clone action lines already applied are skipped if
+                                their action file, repository and dependencies are unchanged. Default is False.
+        resume (bool, optional): Continue a run that was interrupted. Runs with state or resume journal their finished
+                                 clones and post clone actions in "<path>/.multiclone/journal.jsonl", repositories and
+                                 action lines the interrupted run finished are skipped as if unchanged (see state).
+                                 Default is False.
+        prefetch (bool, optional): Cache the dependencies found for the requested repositories in
+                                   "<path>/.multiclone/graph" and clone the cached dependencies of the last run with the
+                                   same requests right away, next to the requested repositories. A prefetched clone is
+                                   used once a ".dependencies"-file requests it exactly as cached, else it is cancelled
+                                   or discarded. With resolve the cache is only updated, with from_lock it is not
+                                   used. Default is False.
 
     Returns:
         list: List of boolean values indicating the success of each cloning operation.
     """
 
     # Print config
+    if trace is not None:
+        trace_enable(trace)
+    config_span = trace_span("config", "phase")
     print("")
     print("MultiClone (version 1.0.1)")
     print("")
     print("Config:")
     print(f"  Path: {path}")
     print(f"  Version action: {version_action.name}")
+    print(f"  Conflict action: {conflict_action.name}")
     print(f"  Force: {force}")
+    print(f"  Sync: {sync}")
+    print(f"  Resolve: {resolve}")
+    if from_lock is not None:
+        print(f"  From lock: {from_lock}")
+    if write_lock is not None:
+        print(f"  Write lock: {write_lock}")
     print(f"  Depth: {depth}")
+    print(f"  Jobs: {jobs}")
+    if plan:
+        print(f"  Plan: {plan}")
+    if action_timeout is not None:
+        print(f"  Action timeout: {action_timeout} s")
+    if pipeline_actions:
+        print(f"  Pipeline actions: {pipeline_actions} (initial: {initial_stage_order.name}, "
+              f"final: {final_stage_order.name})")
+    if mirror_cache is not None:
+        print(f"  Mirror cache: {mirror_cache} ({mirror_cache_size} MB)")
+    if trace is not None:
+        print(f"  Trace: {trace}")
+    if state:
+        print(f"  State: {state}")
+    if resume:
+        print(f"  Resume: {resume}")
+    if prefetch:
+        print(f"  Prefetch: {prefetch}")
     print("")
     print("Details:")
     print(f"  Working directory: {os.getcwd()}")
@@ -82,75 +193,181 @@ def main(clone_request_list, path=None, version_action=VersionAction.USE_TARGET_
     print(f"  Source: {path_source}")
     print("")
 
+    # Load workspace state and start the journal
+    workspace_state = WorkspaceState(path, database=state, resume=resume) if state or resume else None
+    if resume and workspace_state.resumed:
+        print(f"Resume interrupted run: {workspace_state.resumed_clone_count} clones and "
+              f"{workspace_state.resumed_action_count} post clone actions finished")
+        print("")
+    elif resume:
+        print("Resume: No interrupted run found")
+        print("")
+
     # Populate global
+    globals_object.path_workspace = path
     globals_object.path_main = path_main
     globals_object.path_source = path_source
     globals_object.force = force
 
-    # Parse clone_request_list into a clone_info_list
+    # Load lock file, locked requests take precedence over requests with the same url
+    if from_lock is not None:
+        lock_request_list = read_lock_file(from_lock)
+        lock_url_set = set(normalize_url(request.url) for request in lock_request_list)
+        clone_request_list = lock_request_list + [request for request in clone_request_list
+                                                  if normalize_url(request.url) not in lock_url_set]
+
+    # Parse clone_request_list into a clone_info_list indexed by a dependency graph
     clone_info_list = []
-    clone_url_list = []
+    graph = DependencyGraph()
     for request in clone_request_list:
-        clone_info_list.append(clone_request_to_info_element(request))    
-        clone_url_list.append(request.url)
+        node, is_new = graph.add(request.url, len(clone_info_list))
+        if is_new:
+            clone_info_list.append(clone_request_to_info_element(request))
+        else:
+            print(f"Repository requested more than once, first request used: {request.url}")
     
-    # Pre-clone handling of VersionAction.ALL_NEWEST
-    if version_action == VersionAction.ALL_NEWEST:
+    # Pre-clone handling of VersionAction.ALL_NEWEST (locked versions are always used)
+    if version_action == VersionAction.ALL_NEWEST and from_lock is None:
         for i, info in enumerate(clone_info_list):
             if info.branch and info.branch.startswith("tags/"):  # Tag disregarded
                 clone_info_list[i] = info._replace(branch=None)
             if info.commit:  # Commit disregarded
                 clone_info_list[i] = info._replace(commit=None)
 
-    # Requested clone
-    print("Clone requested repositories:")
-    clone_info_list = execute_clone(clone_info_list, path_source=path_source, version_action=version_action,
-                                    force=force, depth=depth)
-    
-    # Build boolean status array
-    status_array = []
-    clone_attempted_array = []
+    # Requested versions always take precedence over versions requested by dependencies
     for info in clone_info_list:
-        clone_attempted_array.append(info.clone_attempted)
-        if info.clone_attempted:
-            status_array.append(info.clone_status)
+        node = graph.get(info.url)
+        node.constraints.append(version_constraint(requester=None, branch=info.branch, commit=info.commit))
 
-    # Initial result evaluation
+    requested_count = len(clone_info_list)
+    run_start_time = time.time()
+
+    # Predict dependencies from the graph found by the last run with the same requests
+    graph_cache = None
+    prediction_list = None
+    if prefetch and from_lock is None:
+        request_line_array = [f"version_action={version_action.name}", f"conflict_action={conflict_action.name}"]
+        request_line_array.extend(clone_info_to_string(info) for info in clone_info_list)
+        graph_cache = GraphCache(path, request_line_array)
+        dependency_line_array = graph_cache.read() if not resolve else None  # Resolve only updates the cache
+        if dependency_line_array is not None:
+            prediction_list = string_to_clone_elements("\n".join(dependency_line_array), delimiter="\n",
+                                                       version_action=VersionAction.ALWAYS_USE_TARGET)
+            print(f"Prefetch: {len(prediction_list)} dependencies cached by the last run")
+            print("")
+        elif not resolve:
+            print("Prefetch: No dependencies cached for the requested repositories")
+            print("")
+    config_span.end(requested=requested_count)
+
+    # Resolve dependency graph before cloning
+    if resolve and from_lock is None:
+        print("Resolve dependencies:")
+        with trace_span("resolve", "phase"):
+            clone_info_list, failed_array = execute_resolve(clone_info_list, version_action=version_action,
+                                                            jobs=jobs, mirror_cache=mirror_cache, graph=graph,
+                                                            conflict_action=conflict_action)
+        print("")
+        conflict_found = report_version_conflicts(graph, clone_info_list, conflict_action)
+        if conflict_found and conflict_action == ConflictAction.FAIL:
+            print("Dependency version conflict - Abort")
+            abort_run(workspace_state)
+        if failed_array:
+            print("Dependency resolution failed for:")
+            for info in failed_array:
+                print(f"  {info.url}")
+            print("Dependency resolution failed - Abort")
+            abort_run(workspace_state)
+        print(f"Dependency graph resolved: {len(clone_info_list)} repositories")
+        print("")
+
+    # Post clone actions of ready repositories run while cloning
+    if pipeline_actions and not plan:
+        action_pipeline = PostCloneActionPipeline(plugin_folders=action_paths, jobs=jobs,
+                                                  initial_stage_order=initial_stage_order,
+                                                  final_stage_order=final_stage_order, async_limit=async_limit,
+                                                  action_timeout=action_timeout, state=workspace_state)
+
+        def ready_callback(info):
+            mark_reusable_actions(workspace_state, graph, info)
+            action_pipeline.repository_ready(info.clone_path)
+            action_pipeline.print_completed()
+    else:
+        action_pipeline = None
+        ready_callback = None
+
+    # Clone requested repositories, dependencies are queued as soon as their requester has been cloned
+    if from_lock is None:
+        print("Clone requested repositories and dependencies:")
+    else:
+        print("Clone locked repositories:")
+    with trace_span("clone", "phase"):
+        clone_info_list = execute_clone(clone_info_list, path_source=path_source, version_action=version_action,
+                                        force=force, depth=depth, jobs=jobs, recursive=True, mirror_cache=mirror_cache,
+                                        sync=sync, dependencies=from_lock is None, graph=graph,
+                                        conflict_action=conflict_action, ready_callback=ready_callback,
+                                        workspace_state=workspace_state, prediction=prediction_list)
+    print("")
+
+    # Cache the found dependencies for the next run
+    if graph_cache is not None:
+        graph_cache.write([clone_info_to_string(info._replace(clone_commit=None))
+                           for info in clone_info_list[requested_count:] if info.clone_status])
+
+    # Report version conflicts found while cloning
+    if not resolve or from_lock is not None:
+        conflict_found = report_version_conflicts(graph, clone_info_list, conflict_action)
+        if conflict_found and conflict_action == ConflictAction.FAIL:
+            print("Dependency version conflict - Abort")
+            abort_run(workspace_state)
+
+    # Write lock file
+    if write_lock is not None:
+        locked_count = write_lock_file(write_lock, clone_info_list)
+        print(f"Lock file written: {write_lock} ({locked_count} repositories)")
+        if locked_count < len(clone_info_list):
+            print("  Repositories that failed to clone are not locked")
+        print("")
+
+    # Mirror cache eviction, mirrors used by this run are kept
+    if mirror_cache is not None:
+        with trace_span("mirror eviction", "phase"):
+            evicted_array = mirror_evict(mirror_cache, mirror_cache_size * 1024 * 1024, keep_after=run_start_time)
+        if evicted_array:
+            print("Evicted from mirror cache:")
+            for name in evicted_array:
+                print(f"  {name}")
+            print("")
+
+    # Requested result evaluation
+    status_array = []
+    for info in clone_info_list[:requested_count]:
+        status_array.append(info.clone_status)
     if status_array and all(status_array):
-        print("Requested clone operations successful, check for dependencies")
+        print("Requested clone operations successful")
     elif status_array and any(status_array):
-        print("Some clone operations failed, check for dependencies")
+        print("Some requested clone operations failed")
     elif status_array:
         print("All clone operations failed - Abort")
-        sys.exit(1)
+        abort_run(workspace_state)
     else:
         print("No clone operations performed - Abort")
-        sys.exit(1)
-    print("")
+        abort_run(workspace_state)
 
-    # Clone dependencies
-    clone_action_result = True
-    if not all(clone_attempted_array):
-        print("Clone dependencies:")
-        all_done = False
-        while not all_done:
-            clone_info_list = execute_clone(clone_info_list, path_source=path_source, version_action=version_action,
-                                            force=force, depth=depth)
-            clone_attempted_array = []
-            for info in clone_info_list:
-                clone_attempted_array.append(info.clone_attempted)
-            all_done = all(clone_attempted_array)
-
-        # Result evaluation
+    # Dependency result evaluation
+    clone_action_result = all(status_array)
+    if len(clone_info_list) > requested_count:
         status_array = []
-        for info in clone_info_list:
+        for info in clone_info_list[requested_count:]:
             status_array.append(info.clone_status)
         if status_array and all(status_array):
             print("All dependency clone operations successful")
         elif status_array and any(status_array):
-            print("Some clone operations failed")
-        print("")
-        clone_action_result = all(status_array)
+            print("Some dependency clone operations failed")
+        else:
+            print("All dependency clone operations failed")
+        clone_action_result = clone_action_result and all(status_array)
+    print("")
 
     # Post clone action handling
     path_array = []
@@ -158,7 +375,23 @@ def main(clone_request_list, path=None, version_action=VersionAction.USE_TARGET_
         if info.clone_status:
             path_array.append(info.clone_path)
 
-    action_result = post_clone_action_handler(path_array, plugin_folders=action_paths)
+    action_span = trace_span("post clone actions", "phase")
+    for info in clone_info_list:
+        if info.clone_status:
+            mark_reusable_actions(workspace_state, graph, info)
+    if action_pipeline is not None:
+        print("Complete pipelined post clone actions:")
+        for path in path_array:
+            action_pipeline.repository_ready(path)  # Repositories with failed dependencies, queued once
+        action_result = action_pipeline.finish()
+    else:
+        action_result = post_clone_action_handler(path_array, plugin_folders=action_paths, jobs=jobs, plan_only=plan,
+                                                  async_limit=async_limit, action_timeout=action_timeout,
+                                                  state=workspace_state)
+    action_span.end(status=action_result)
+    if workspace_state is not None:
+        workspace_state.close()
+    trace_finish()
 
     return clone_action_result and action_result
 
@@ -169,6 +402,8 @@ def main(clone_request_list, path=None, version_action=VersionAction.USE_TARGET_
 def string_to_clone_elements(string, delimiter=";", version_action=None):
     """
     Parse a string into an array of clone_info elements.
+    Each element is a url followed by optional space separated arguments:
+        branch=<branch or tags/tag>, commit=<commit>, depth=<depth>, filter=<filter spec>, sparse=<dir>[,<dir>]
 
     Args:
         string (str): string to parse into clone_request_list.
@@ -188,6 +423,8 @@ def string_to_clone_elements(string, delimiter=";", version_action=None):
     
     for url in url_list:
         url_parts = url.split()
+        if not url_parts:  # skip empty lines
+            continue
         url_info = clone_request(url=url_parts[0], branch=None, commit=None)
         for part in url_parts[1:]:
             if part.startswith("branch="):
@@ -199,6 +436,13 @@ def string_to_clone_elements(string, delimiter=";", version_action=None):
                     url_info = url_info._replace(branch=branch_name)
             elif part.startswith("commit=") and not get_newest:  # skip commit getting newest
                 url_info = url_info._replace(commit=part[len("commit="):])
+            elif part.startswith("depth="):
+                url_info = url_info._replace(depth=int(part[len("depth="):]))
+            elif part.startswith("filter="):
+                url_info = url_info._replace(filter=part[len("filter="):])
+            elif part.startswith("sparse="):
+                sparse_array = [folder.replace("\\", "/").strip("/") for folder in part[len("sparse="):].split(",")]
+                url_info = url_info._replace(sparse=tuple(folder for folder in sparse_array if folder))
         clone_request_list.append(url_info)
         
     return clone_request_list
@@ -215,12 +459,75 @@ def clone_request_to_info_element(request):
     """
     
     clone_info_element = clone_info(url=request.url, branch=request.branch, commit=request.commit,
-                                    clone_attempted=False, clone_status=False, clone_path=None)
+                                    clone_attempted=False, clone_status=False, clone_path=None, depth=request.depth,
+                                    filter=request.filter, sparse=request.sparse)
     return clone_info_element
 
-def execute_clone(clone_info_list, path_source, version_action, force=False, depth=1):
+def clone_info_to_string(info):
+    """
+    Format a clone_info element as a ".dependencies"-line, the inverse of string_to_clone_elements.
+    The resolved clone_commit is used as commit if available.
+
+    Args:
+        info (clone_info): The element to format.
+
+    Returns:
+        str: The formatted line.
     """
-    Clone .
+    part_array = [info.url]
+    if info.branch is not None:
+        part_array.append(f"branch={info.branch}")
+    commit = info.clone_commit if info.clone_commit is not None else info.commit
+    if commit is not None:
+        part_array.append(f"commit={commit}")
+    if info.depth is not None:
+        part_array.append(f"depth={info.depth}")
+    if info.filter is not None:
+        part_array.append(f"filter={info.filter}")
+    if info.sparse:
+        part_array.append(f"sparse={','.join(info.sparse)}")
+    return " ".join(part_array)
+
+def write_lock_file(file_path, clone_info_list):
+    """
+    Write the resolved commit of every successfully cloned element to a lock file.
+    The lock file uses the ".dependencies"-format with one line per repository.
+
+    Args:
+        file_path (str): Path of the lock file.
+        clone_info_list (clone_info array) : List of cloned clone_info elements.
+
+    Returns:
+        int: Number of locked repositories.
+    """
+    line_array = []
+    for info in clone_info_list:
+        if info.clone_status and info.clone_commit is not None:
+            line_array.append(clone_info_to_string(info))
+    with open(file_path, 'w') as file:
+        file.write("\n".join(line_array) + "\n")
+    return len(line_array)
+
+def read_lock_file(file_path):
+    """
+    Read a lock file written by write_lock_file. Locked commits are always used.
+
+    Args:
+        file_path (str): Path of the lock file.
+
+    Returns:
+        clone_request_list (clone_request array): List of locked clone_request elements.
+    """
+    with open(file_path, 'r') as file:
+        lock_content = file.read()
+    return string_to_clone_elements(lock_content, delimiter="\n", version_action=VersionAction.ALWAYS_USE_TARGET)
+
+def execute_clone(clone_info_list, path_source, version_action, force=False, depth=1, jobs=1, recursive=False,
+                  mirror_cache=None, sync=False, dependencies=True, graph=None,
+                  conflict_action=None, ready_callback=None, workspace_state=None, prediction=None):
+    """
+    Clone all elements not yet attempted using a pool of up to jobs concurrent git processes.
+    The output of each clone is printed as one block when it completes.
 
     Args:
         clone_info_list (clone_info array) : List of clone_info elements to clone.
@@ -228,39 +535,588 @@ def execute_clone(clone_info_list, path_source, version_action, force=False, dep
         version_action (VersionAction): Version action to perform. Only in use when getting dependencies.
         force (bool, optional, default=False): Whether to force removal of existing repositories. Default is True.
         depth (int, optional, default=1): The depth of the clone (number of commits to include). Default is 1.
+        jobs (int, optional, default=1): Number of repositories cloned at the same time.
+        recursive (bool, optional, default=False): Queue dependencies as soon as the repository listing them has been
+            cloned, returning when the whole dependency graph has been cloned. If False found dependencies are added
+            to the returned list as not attempted.
+        mirror_cache (str, optional, default=None): Path to a mirror cache folder to clone through.
+        sync (bool, optional, default=False): Whether to sync existing repositories to the requested version.
+        dependencies (bool, optional, default=True): Whether to search cloned repositories for ".dependencies".
+        graph (DependencyGraph, optional, default=None): Graph indexing clone_info_list, updated with found
+            dependencies, their edges and version constraints. Built from clone_info_list if None.
+        conflict_action (ConflictAction, optional, default=None): Selects the version of a repository requested at
+            different versions, from the constraints in graph order (see sort_constraints). A repository cloned
+            before another version was selected is cloned again, unless it was passed to ready_callback.
+            Defaults to ConflictAction.USE_FIRST_REQUEST. With FAIL the clones not yet started are cancelled and no
+            more dependencies are queued once a conflict is found.
+        ready_callback (function, optional, default=None): Called with the clone_info of every successfully cloned
+            repository once it and all its known dependencies have been cloned, while other clones may still run.
+        workspace_state (WorkspaceState, optional, default=None): Workspace state, repositories unchanged since they
+            were recorded are not cloned again (unless sync). Every finished clone is recorded as soon as it is done.
+        prediction (clone_request array, optional, default=None): Dependencies expected to be found, cloned
+            speculatively into their partial folder right after the requested repositories (only if recursive and
+            searching dependencies). A speculative clone is moved into place once a dependency request equal to its
+            prediction is found. Speculative clones of a repository requested differently, or not requested once all
+            clones are done, are cancelled if not started or else discarded. Existing repositories are not speculatively
+            synced.
 
     Returns:
         clone_info_list (clone_info array) : List of clone_info elements.
     """
 
-    # Build url array
-    url_array = []
-    for info in clone_info_list:
-        url_array.append(info.url)
+    # Index elements by normalized url
+    if graph is None:
+        graph = build_dependency_graph(clone_info_list)
+    if conflict_action is None:
+        conflict_action = ConflictAction.USE_FIRST_REQUEST
 
     # Clone
-    clone_info_list_addition = []
-    for i, info in enumerate(clone_info_list):
-        if not info.clone_attempted:
-            info = info._replace(clone_attempted=True)
-            clone_result = git_clone_url(info.url, path=path_source, force=force, depth=depth, branch=info.branch,
-                                         commit=info.commit)
-            clone_status = clone_result.status
-            clone_path = clone_result.path
-            clone_dependencies_path = build_clone_dependencies_path(clone_path)
-            info = info._replace(clone_status=clone_status, clone_path=clone_path)
-            clone_info_list[i] = info
-            if clone_status and os.path.exists(clone_dependencies_path):
-                # Load dependencies
-                with open(clone_dependencies_path, 'r') as file:
-                    dependencies_content = file.read()
-                dependency_clone_request_list = string_to_clone_elements(dependencies_content, delimiter="\n",
-                                                                         version_action=version_action)
-                for request in dependency_clone_request_list:
-                    if request.url not in url_array:
-                        clone_info_list_addition.append(clone_request_to_info_element(request))
-    
-    # Add found dependencies to return value
-    clone_info_list.extend(clone_info_list_addition)
+    ready_key_set = set()
+    reclone_index_set = set()  # Repositories cloning while another version was selected
+    conflict_abort = False
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        future_map = {}
+        index_future_map = {}
+        prefetch_map = {}  # Repository name -> (speculative future, predicted request), not yet requested
+        deferred_map = {}  # Running speculative future of a repository requested differently -> index to clone after
+        prefetch_count_map = {"confirmed": 0, "discarded": 0}
+
+        def notify_ready():
+            for node in reversed(list(graph.node_map.values())):  # Dependencies before their requesters
+                if node.key in ready_key_set or not clone_info_list[node.index].clone_status:
+                    continue
+                if all(clone_info_list[graph.node_map[key].index].clone_attempted
+                       for key in graph.reachable_keys([node.key])):
+                    ready_key_set.add(node.key)
+                    ready_callback(clone_info_list[node.index])
+
+        def submit_clone(index, replace=False):
+            future = executor.submit(clone_worker, clone_info_list[index], path_source, force or replace, depth,
+                                     mirror_cache, sync, workspace_state)
+            future_map[future] = index
+            index_future_map[index] = future
+
+        def apply_selected_version(node):
+            if not node.constraints or node.key in ready_key_set:
+                return  # Post clone actions of a ready repository may be running, reported by report_version_conflicts
+            selected = select_version(sort_constraints(graph, node), conflict_action)
+            known_info = clone_info_list[node.index]
+            if (known_info.branch, known_info.commit) == (selected.branch, selected.commit):
+                return
+            clone_info_list[node.index] = known_info._replace(branch=selected.branch, commit=selected.commit,
+                                                              clone_attempted=False, clone_status=False)
+            known_future = index_future_map.get(node.index)
+            if known_future is not None and known_future in future_map:
+                if not known_future.cancel():
+                    reclone_index_set.add(node.index)  # Cloned again at the selected version once done
+                    return
+                future_map.pop(known_future)
+                submit_clone(node.index)
+            elif known_info.clone_attempted:
+                print(f"  Selected version changed, clone again: {known_info.url}")
+                submit_clone(node.index, replace=True)
+            # Else not queued yet, the selected version is cloned when it is queued
+
+        def submit_requested(index, request):
+            future, predicted = prefetch_map.pop(extract_repo_name(request.url), (None, None))
+            if future is None:
+                submit_clone(index)
+            elif predicted == request:  # Prediction confirmed, the speculative clone is used
+                future_map[future] = index
+                index_future_map[index] = future
+                prefetch_count_map["confirmed"] += 1
+            elif future.cancel() or future.done():
+                discard_prefetched(future)
+                submit_clone(index)
+            else:
+                prefetch_count_map["discarded"] += 1
+                deferred_map[future] = index  # Same partial folder, cloned once the speculative clone is done
+
+        def discard_prefetched(future):
+            prefetch_count_map["discarded"] += 1
+            if not future.cancelled():
+                discard_clone(future.result()[0])
+
+        for i, info in enumerate(clone_info_list):
+            if not info.clone_attempted and graph.get(info.url).index == i:  # Duplicates are cloned once
+                submit_clone(i)
+
+        # Speculative clones of predicted dependencies, queued after the requested repositories
+        if recursive and dependencies:
+            requested_name_set = set(extract_repo_name(info.url) for info in clone_info_list)
+            for request in prediction or []:
+                repo_name = extract_repo_name(request.url)
+                if repo_name in requested_name_set or repo_name in prefetch_map:
+                    continue  # Cloned into the same folder
+                if sync and os.path.isdir(os.path.join(path_source, repo_name, ".git")):
+                    continue
+                future = executor.submit(clone_worker, clone_request_to_info_element(request), path_source, force,
+                                         depth, mirror_cache, sync, workspace_state, True)
+                prefetch_map[repo_name] = (future, request)
+
+        while future_map or deferred_map:
+            done, _ = wait(list(future_map) + list(deferred_map), return_when=FIRST_COMPLETED)
+            for future in [done_future for done_future in done if done_future in deferred_map]:
+                discard_clone(future.result()[0])
+                index = deferred_map.pop(future)
+                if not conflict_abort:
+                    submit_clone(index)
+            for future in sorted([done_future for done_future in done if done_future in future_map],
+                                 key=future_map.get):
+                i = future_map.pop(future)
+                clone_result, log = future.result()
+                clone_result = promote_clone(clone_result, log=log)
+                for line in log:
+                    print(line)
+                if i in reclone_index_set:
+                    reclone_index_set.discard(i)
+                    if not conflict_abort:
+                        print(f"  Selected version changed, clone again: {clone_info_list[i].url}")
+                        submit_clone(i, replace=True)
+                        continue
+                info = clone_info_list[i]._replace(clone_attempted=True, clone_status=clone_result.status,
+                                                   clone_path=clone_result.path, clone_commit=clone_result.commit)
+                clone_info_list[i] = info
+                if workspace_state is not None and info.clone_status and info.clone_commit is not None:
+                    workspace_state.record_clone(normalize_url(info.url), info.url, clone_options(info, depth),
+                                                 info.clone_path, info.clone_commit)
+                elif workspace_state is not None:
+                    workspace_state.forget_clone(normalize_url(info.url))
+                if not dependencies or conflict_abort:
+                    continue
+
+                # Replace edges and constraints from a previously cloned version
+                requester_node = graph.get(info.url)
+                previous_key_array = requester_node.dependency_keys
+                for key in previous_key_array:
+                    dependency_node = graph.node_map[key]
+                    dependency_node.constraints = [constraint for constraint in dependency_node.constraints
+                                                   if constraint.requester != requester_node.key]
+                requester_node.dependency_keys = []
+
+                # Queue dependencies not seen before
+                for request in load_dependency_requests(info, version_action):
+                    node, is_new = graph.add(request.url, len(clone_info_list), requester_url=info.url)
+                    node.constraints.append(version_constraint(requester=requester_node.key, branch=request.branch,
+                                                               commit=request.commit))
+                    if is_new:
+                        clone_info_list.append(clone_request_to_info_element(request))
+                        if recursive:
+                            submit_requested(node.index, request)
+                        continue
+
+                    # Conflicting versions with FAIL, cancel what has not started (the run is aborted by the caller)
+                    if conflict_action == ConflictAction.FAIL and versions_conflict(node.constraints):
+                        print(f"  Version conflict found for {clone_info_list[node.index].url} - Cancel pending clones")
+                        for pending_future in list(future_map):
+                            if pending_future.cancel():
+                                future_map.pop(pending_future)
+                        conflict_abort = True
+                        break
+
+                    # Known repository, clone the selected version (again if another version was cloned)
+                    apply_selected_version(node)
+
+                # Dependencies of the previous version no longer listed
+                if not conflict_abort:
+                    for key in previous_key_array:
+                        if key not in requester_node.dependency_keys and key in graph.node_map:
+                            apply_selected_version(graph.node_map[key])
+
+            if ready_callback is not None:
+                notify_ready()
+
+        # Speculative clones not requested by this run
+        for future, _ in prefetch_map.values():
+            future.cancel()
+        for future, _ in prefetch_map.values():
+            discard_prefetched(future)
+        if prediction:
+            print(f"  Prefetched dependencies: {prefetch_count_map['confirmed']} confirmed, "
+                  f"{prefetch_count_map['discarded']} discarded")
     
     return clone_info_list
+
+def abort_run(workspace_state):
+    """
+    Exit after a failed run. The workspace state is written but the run is not marked done, so what it finished is
+    skipped when run again with --resume.
+
+    Args:
+        workspace_state (WorkspaceState): The workspace state, None if not used.
+    """
+    if workspace_state is not None:
+        workspace_state.close(done=False)
+        print("Run again with --resume to skip what this run finished")
+    sys.exit(1)
+
+def clone_options(info, depth):
+    """
+    Get the version and clone options of a clone_info element, as compared by the workspace state.
+
+    Args:
+        info (clone_info): The element.
+        depth (int): The default depth, used if info.depth is not set.
+
+    Returns:
+        dict: The options.
+    """
+    return {"branch": info.branch, "commit": info.commit, "depth": info.depth if info.depth is not None else depth,
+            "filter": info.filter, "sparse": list(info.sparse) if info.sparse else None}
+
+def mark_reusable_actions(workspace_state, graph, info):
+    """
+    Allow the recorded post clone actions of a repository to be skipped if it and all its dependencies were not cloned
+    again by this run.
+
+    Args:
+        workspace_state (WorkspaceState): The workspace state, nothing is done if None.
+        graph (DependencyGraph): The dependency graph.
+        info (clone_info): The cloned element.
+    """
+    if workspace_state is None:
+        return
+    node = graph.get(info.url)
+    if node is not None and graph.reachable_keys([node.key]) <= workspace_state.unchanged_key_set:
+        workspace_state.mark_actions_reusable(info.clone_path)
+
+def build_dependency_graph(clone_info_list):
+    """
+    Index a clone_info_list by normalized url. Later elements with an already indexed url are not indexed.
+
+    Args:
+        clone_info_list (clone_info array) : List of clone_info elements.
+
+    Returns:
+        DependencyGraph: Graph with one node per repository, no edges and the version of each element as requested.
+    """
+    graph = DependencyGraph()
+    for i, info in enumerate(clone_info_list):
+        node, is_new = graph.add(info.url, i)
+        if is_new:
+            node.constraints.append(version_constraint(requester=None, branch=info.branch, commit=info.commit))
+    return graph
+
+def sort_constraints(graph, node, order_map=None):
+    """
+    Sort the version constraints on a repository into graph order: direct requests first, then by the position of
+    the requester in graph order and the line of the repository in the ".dependencies"-file of the requester. The
+    order does not depend on the order clones or resolves finish, so the first request is the same for every run.
+
+    Args:
+        graph (DependencyGraph): The dependency graph.
+        node (DependencyNode): The repository.
+        order_map (dict, optional, default=None): Result of graph.order_map(), computed if None.
+
+    Returns:
+        version_constraint array: The constraints in graph order.
+    """
+    if order_map is None:
+        order_map = graph.order_map()
+
+    def constraint_order(constraint):
+        if constraint.requester is None:
+            return (0, ())
+        requester_node = graph.node_map.get(constraint.requester)
+        if requester_node is None or constraint.requester not in order_map:
+            return (2, ())  # Requester no longer in the graph
+        dependency_keys = requester_node.dependency_keys
+        line = dependency_keys.index(node.key) if node.key in dependency_keys else len(dependency_keys)
+        return (1, order_map[constraint.requester] + (line,))
+
+    return sorted(node.constraints, key=constraint_order)
+
+def select_version(constraint_array, conflict_action):
+    """
+    Select the version to clone from the version constraints on a repository.
+    A version requested directly (not as a dependency) is always selected. Dependencies requesting no version (newest)
+    are compatible with any version, so a version requested by another dependency is selected.
+
+    Args:
+        constraint_array (version_constraint array): Constraints in graph order, see sort_constraints.
+        conflict_action (ConflictAction): Policy used when dependencies request different versions.
+
+    Returns:
+        version_constraint: The selected constraint.
+    """
+    for constraint in constraint_array:
+        if constraint.requester is None:
+            return constraint
+    versioned_array = [constraint for constraint in constraint_array
+                       if (constraint.branch, constraint.commit) != (None, None)]
+    if versioned_array:
+        constraint_array = versioned_array
+    if conflict_action == ConflictAction.USE_NEWEST:
+        for constraint in constraint_array:
+            if constraint.commit is None and not (constraint.branch and constraint.branch.startswith("tags/")):
+                return constraint
+    return constraint_array[0]
+
+def report_version_conflicts(graph, clone_info_list, conflict_action):
+    """
+    Print every repository requested at different versions with the requesters and the selected version. Requests
+    without version (newest) are compatible with any version and no conflict by themselves.
+
+    Args:
+        graph (DependencyGraph): Graph indexing clone_info_list.
+        clone_info_list (clone_info array) : List of clone_info elements.
+        conflict_action (ConflictAction): Policy used to select the version.
+
+    Returns:
+        bool: True if any conflict was found.
+    """
+    conflict_found = False
+    order_map = graph.order_map()
+    for node in graph.node_map.values():
+        if not versions_conflict(node.constraints):
+            continue
+        if not conflict_found:
+            print(f"Version conflicts ({conflict_action.name}):")
+            conflict_found = True
+        info = clone_info_list[node.index]
+        print(f"  {info.url}")
+        constraint_array = sort_constraints(graph, node, order_map)
+        for constraint in constraint_array:
+            requester = constraint.requester if constraint.requester is not None else "Requested"
+            print(f"    {requester}: {version_to_string(constraint.branch, constraint.commit)}")
+        selected = select_version(constraint_array, conflict_action)
+        if (info.branch, info.commit) == (selected.branch, selected.commit):
+            print(f"    Selected: {version_to_string(info.branch, info.commit)}")
+        else:
+            print(f"    Selected: {version_to_string(selected.branch, selected.commit)} (not applied, already cloned "
+                  f"{version_to_string(info.branch, info.commit)} - use resolve to apply)")
+    if conflict_found:
+        print("")
+    return conflict_found
+
+def versions_conflict(constraint_array):
+    """
+    Check if the version constraints on a repository request different versions. A constraint without version
+    (newest) is compatible with any version.
+
+    Args:
+        constraint_array (version_constraint array): Constraints in request order.
+
+    Returns:
+        bool: True if at least two different versions are requested.
+    """
+    version_set = set((constraint.branch, constraint.commit) for constraint in constraint_array
+                      if (constraint.branch, constraint.commit) != (None, None))
+    return len(version_set) > 1
+
+def version_to_string(branch, commit):
+    if commit is not None:
+        return f"commit={commit}"
+    if branch is not None:
+        return f"branch={branch}"
+    return "newest"
+
+def load_dependency_requests(info, version_action):
+    """
+    Load the clone requests from the ".dependencies"-file of a cloned repository.
+
+    Args:
+        info (clone_info): The cloned element.
+        version_action (VersionAction): Version action used when parsing the dependencies.
+
+    Returns:
+        clone_request_list (clone_request array): Empty if the clone failed or no ".dependencies"-file exists.
+    """
+    if not info.clone_status:
+        return []
+    with trace_span(f"dependencies {extract_repo_name(info.url)}", "dependencies") as span:
+        clone_dependencies_path = build_clone_dependencies_path(info.clone_path)
+        if not os.path.exists(clone_dependencies_path):
+            return []
+        with open(clone_dependencies_path, 'r') as file:
+            dependencies_content = file.read()
+        dependency_clone_request_list = string_to_clone_elements(dependencies_content, delimiter="\n",
+                                                                 version_action=version_action)
+        span.end(count=len(dependency_clone_request_list))
+        return dependency_clone_request_list
+
+def execute_resolve(clone_info_list, version_action, jobs=1, mirror_cache=None, graph=None, conflict_action=None):
+    """
+    Resolve the transitive dependency graph without cloning. Only the ".dependencies"-file of each requested version
+    is fetched, using up to jobs concurrent git processes. Dependencies are queued as soon as they are found.
+    When a repository is requested at different versions the version selected by conflict_action is resolved, and
+    repositories only required by versions that were not selected are removed.
+
+    Args:
+        clone_info_list (clone_info array) : List of requested clone_info elements.
+        version_action (VersionAction): Version action used when parsing the dependencies.
+        jobs (int, optional, default=1): Number of repositories resolved at the same time.
+        mirror_cache (str, optional, default=None): Path to a mirror cache folder to read ".dependencies" through.
+        graph (DependencyGraph, optional, default=None): Graph indexing clone_info_list, updated with found
+            dependencies, their edges and version constraints. Built from clone_info_list if None.
+        conflict_action (ConflictAction, optional, default=None): Selects the version of a repository requested at
+            different versions. Defaults to ConflictAction.USE_FIRST_REQUEST.
+
+    Returns:
+        tuple: The clone_info_list extended with all found dependencies (not attempted) and a clone_info array of
+            the elements that could not be resolved.
+    """
+
+    # Index elements by normalized url
+    if graph is None:
+        graph = build_dependency_graph(clone_info_list)
+    if conflict_action is None:
+        conflict_action = ConflictAction.USE_FIRST_REQUEST
+
+    # Resolve
+    failed_index_set = set()
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        future_map = {}
+
+        def submit_resolve(index):
+            info = clone_info_list[index]
+            future = executor.submit(resolve_worker, info, version_action, mirror_cache)
+            future_map[future] = (index, (info.branch, info.commit))
+
+        def apply_selected_version(node):
+            if not node.constraints:
+                return
+            selected = select_version(sort_constraints(graph, node), conflict_action)
+            known_info = clone_info_list[node.index]
+            if (known_info.branch, known_info.commit) != (selected.branch, selected.commit):
+                clone_info_list[node.index] = known_info._replace(branch=selected.branch, commit=selected.commit)
+                submit_resolve(node.index)  # Pending results for the previous version are discarded
+
+        for i, info in enumerate(clone_info_list):
+            if graph.get(info.url).index == i:  # Duplicates are resolved once
+                submit_resolve(i)
+
+        while future_map:
+            done, _ = wait(future_map, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=lambda done_future: future_map[done_future][0]):
+                i, version = future_map.pop(future)
+                dependency_clone_request_list, log = future.result()
+                info = clone_info_list[i]
+                node = graph.get(info.url)
+                if node is None or node.index != i or (info.branch, info.commit) != version:
+                    continue  # Version no longer selected or repository removed
+                for line in log:
+                    print(line)
+                if dependency_clone_request_list is None:
+                    failed_index_set.add(i)
+                    continue
+                failed_index_set.discard(i)
+
+                # Replace edges and constraints from a previously resolved version
+                for key in node.dependency_keys:
+                    dependency_node = graph.node_map[key]
+                    dependency_node.constraints = [constraint for constraint in dependency_node.constraints
+                                                   if constraint.requester != node.key]
+                node.dependency_keys = []
+
+                # Queue dependencies not seen before, select version of known dependencies
+                for request in dependency_clone_request_list:
+                    dependency_node, is_new = graph.add(request.url, len(clone_info_list), requester_url=info.url)
+                    dependency_node.constraints.append(version_constraint(requester=node.key, branch=request.branch,
+                                                                          commit=request.commit))
+                    if is_new:
+                        clone_info_list.append(clone_request_to_info_element(request))
+                        submit_resolve(dependency_node.index)
+                    else:
+                        apply_selected_version(dependency_node)
+
+            # Remove repositories no longer required once everything queued has been resolved
+            if not future_map:
+                root_key_array = [node.key for node in graph.node_map.values() if node.requester_key is None]
+                reachable_key_set = graph.reachable_keys(root_key_array)
+                for key in [key for key in graph.node_map if key not in reachable_key_set]:
+                    graph.remove(key)
+                for node in list(graph.node_map.values()):
+                    if node.constraints:
+                        apply_selected_version(node)
+
+    # Compact list to the repositories in the graph
+    compact_info_list = []
+    failed_array = []
+    for i, info in enumerate(clone_info_list):
+        node = graph.get(info.url)
+        if node is None or node.index != i:
+            continue
+        node.index = len(compact_info_list)
+        compact_info_list.append(info)
+        if i in failed_index_set:
+            failed_array.append(info)
+
+    return compact_info_list, failed_array
+
+def resolve_worker(info, version_action, mirror_cache=None):
+    """
+    Read the dependencies of a single clone_info element from its remote. Runs on an execute_resolve worker thread.
+
+    Args:
+        info (clone_info): The element to resolve.
+        version_action (VersionAction): Version action used when parsing the dependencies.
+        mirror_cache (str, optional, default=None): Path to a mirror cache folder to read through.
+
+    Returns:
+        tuple: The dependency clone_request_list (None on failure) and the collected output lines.
+    """
+    log = [f"  Resolve {info.url}"]
+    try:
+        with trace_span(f"resolve {extract_repo_name(info.url)}", "resolve", url=info.url,
+                        version=version_to_string(info.branch, info.commit)):
+            mirror = None
+            if mirror_cache is not None:
+                mirror = mirror_update(info.url, normalize_url(info.url), mirror_cache, log=log)
+            dependencies_content = git_read_remote_file(info.url, ".dependencies", branch=info.branch,
+                                                        commit=info.commit, mirror=mirror)
+    except Exception as e:
+        log.append(f"    Failed to resolve repository: {info.url} ({e})")
+        return None, log
+    if dependencies_content is None:
+        dependencies_content = ""
+    dependency_clone_request_list = string_to_clone_elements(dependencies_content, delimiter="\n",
+                                                             version_action=version_action)
+    log.append(f"    Dependencies found: {len(dependency_clone_request_list)}")
+    return dependency_clone_request_list, log
+
+def clone_worker(info, path_source, force, depth, mirror_cache=None, sync=False, workspace_state=None,
+                 speculative=False):
+    """
+    Clone a single clone_info element collecting its output. Runs on an execute_clone worker thread.
+
+    Args:
+        info (clone_info): The element to clone.
+        path_source (str): Path to the clone target.
+        force (bool): Whether to force removal of existing repositories.
+        depth (int): The depth of the clone (number of commits to include). Overridden by info.depth if set.
+        mirror_cache (str, optional, default=None): Path to a mirror cache folder to clone through.
+        sync (bool, optional, default=False): Whether to sync an existing repository to the requested version.
+        workspace_state (WorkspaceState, optional, default=None): Workspace state, the repository is not cloned again
+            if unchanged since it was recorded (unless sync).
+        speculative (bool, optional, default=False): Leave a new clone in its partial folder, see promote_clone.
+
+    Returns:
+        tuple: The clone_result and the collected output lines.
+    """
+    log = []
+
+    # Unchanged since the last run
+    if workspace_state is not None and not sync:
+        repo_name = extract_repo_name(info.url)
+        clone_path = os.path.join(path_source, repo_name)
+        clone_commit = workspace_state.clone_unchanged(normalize_url(info.url), info.url, clone_options(info, depth),
+                                                       clone_path)
+        if clone_commit is not None:
+            log.append(f"  Clone {info.url}")
+            log.append(f"    Repository unchanged since last run, clone skipped: {repo_name}")
+            return clone_result(path=clone_path, status=True, commit=clone_commit), log
+
+    span = trace_span(f"clone {extract_repo_name(info.url)}", "clone", url=info.url,
+                      version=version_to_string(info.branch, info.commit), speculative=speculative)
+    try:
+        if info.depth is not None:
+            depth = info.depth
+        result = git_clone_url(info.url, path=path_source, force=force, depth=depth, branch=info.branch,
+                               commit=info.commit, log=log, mirror_cache=mirror_cache, sync=sync,
+                               filter_spec=info.filter, sparse=info.sparse, promote=not speculative)
+    except Exception as e:
+        log.append(f"    Failed to clone repository: {info.url} ({e})")
+        result = clone_result(path="", status=False)
+    span.end(status=result.status)
+    return result, log
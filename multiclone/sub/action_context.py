@@ -0,0 +1,121 @@
+# System imports
+import inspect
+import os
+import threading
+
+from collections import namedtuple
+
+# Core imports
+from multiclone.sub.action_plan import parse_action_arguments
+from multiclone.sub.globals import globals_object
+
+# Define named tuple type, read-only workspace information shared by all actions of a run
+workspace_info = namedtuple("workspace_info", ["path_main", "path_source", "force", "path_array", "repo_name_array"])
+
+# Plugin class -> True if its action takes a context
+context_interface_map = {}
+context_interface_map_lock = threading.Lock()
+
+########################################################################################################################
+# Context ##############################################################################################################
+########################################################################################################################
+
+
+class ActionContext:
+    """
+    Everything a post clone action needs, owned by a single action call so actions can run concurrently.
+
+    Attributes:
+        repo_path (str): Path to the repository the action is run for.
+        repo_name (str): Name of the repository.
+        data (str): The action data (the action line after the plugin name).
+        arguments (action_arguments): The parsed action data.
+        workspace (workspace_info): Read-only workspace information.
+        log (str array): Lines shown if the action fails.
+        report (str array): Lines always shown.
+        variable_map (dict): Variables of the action.
+    """
+
+    def __init__(self, repo_path, data="", arguments=None, workspace=None):
+        self.repo_path = repo_path
+        self.repo_name = os.path.basename(repo_path)
+        self.data = data if data is not None else ""
+        self.arguments = arguments if arguments is not None else parse_action_arguments(self.data)
+        self.workspace = workspace if workspace is not None else build_workspace_info()
+        self.log = []
+        self.report = []
+        self.variable_map = {}
+
+    def log_add(self, log_value):
+        self.log.append(log_value)
+
+    def report_add(self, report_value):
+        self.report.append(report_value)
+
+    def variable_add(self, name, value):
+        self.variable_map[name] = value
+
+    def variable_get(self, name, default=None):
+        return self.variable_map.get(name, default)
+
+
+def build_workspace_info():
+    """
+    Snapshot the workspace information of the run.
+
+    Returns:
+        workspace_info: The workspace information.
+    """
+    return workspace_info(path_main=globals_object.path_main, path_source=globals_object.path_source,
+                          force=globals_object.force, path_array=tuple(globals_object.path_array),
+                          repo_name_array=tuple(globals_object.repo_name_array))
+
+########################################################################################################################
+# Plugin interface #####################################################################################################
+########################################################################################################################
+
+
+def takes_context(plugin_object):
+    """
+    Check if a plugin uses the context interface, "def action(self, ctx)", instead of "def action(self)" reading
+    globals_object. The result is cached per plugin class.
+
+    Args:
+        plugin_object (object): The plugin object.
+
+    Returns:
+        boolean: True if action takes a context.
+    """
+    plugin_class = type(plugin_object)
+    with context_interface_map_lock:
+        if plugin_class in context_interface_map:
+            return context_interface_map[plugin_class]
+    try:
+        parameter_array = list(inspect.signature(plugin_object.action).parameters.values())
+    except (TypeError, ValueError):
+        parameter_array = []
+    context_interface = len(parameter_array) > 0
+    with context_interface_map_lock:
+        context_interface_map[plugin_class] = context_interface
+    return context_interface
+
+
+def run_legacy_action(plugin_object, ctx):
+    """
+    Adapter running a plugin using the globals_object interface with a context. The action state of globals_object is
+    held per thread, the log and report of the action are copied to the context.
+
+    Args:
+        plugin_object (object): The plugin object.
+        ctx (ActionContext): The context of the action.
+
+    Returns:
+        The value returned by the action.
+    """
+    globals_object.pca_initialize(ctx.repo_path, ctx.data, ctx.arguments)  # Reset and initialize global action data
+    try:
+        return plugin_object.action()
+    finally:
+        ctx.log.extend(globals_object.action_log)
+        ctx.report.extend(globals_object.action_report)
+        ctx.variable_map.update(globals_object.action_variable_map)
@@ -0,0 +1,285 @@
+# System imports
+import hashlib
+import os
+import threading
+
+from collections import namedtuple
+
+# Core imports
+from multiclone.sub.async_action import AsyncActionRunner
+
+# Action files in stage order
+ACTION_SOURCE_INITIAL = ".postcloneactions_initial"
+ACTION_SOURCE = ".postcloneactions"
+ACTION_SOURCE_FINAL = ".postcloneactions_final"
+ACTION_SOURCE_ARRAY = [ACTION_SOURCE_INITIAL, ACTION_SOURCE, ACTION_SOURCE_FINAL]
+
+# Define named tuple types
+action_arguments = namedtuple("action_arguments", ["value", "source", "target", "exclusions", "mode"])
+action_step = namedtuple("action_step", ["plugin_name", "data", "arguments", "repo_path", "action_source",
+                                         "line_number", "shared_key"])
+
+# Keys supported by the shared argument parser
+ACTION_ARGUMENT_KEYS = ("source", "target", "exclusions", "mode")
+
+########################################################################################################################
+# Arguments ############################################################################################################
+########################################################################################################################
+
+
+def parse_action_arguments(data):
+    """
+    Parse the data of an action line. Keyed arguments are semicolon separated "key=value" pairs, "exclusions=" takes
+    every following semicolon separated value that is not a keyed argument itself.
+
+    Example:
+        "source=Src;target=PPL;exclusions=a.txt;b.txt" -> source "Src", target "PPL", exclusions ["a.txt", "b.txt"]
+
+    Args:
+        data (str): The action data (the action line after the plugin name).
+
+    Returns:
+        action_arguments:
+          value (str): The stripped data, used by actions taking a single path.
+          source (str): Value of "source=" or None.
+          target (str): Value of "target=" or None.
+          exclusions (str array): Values of "exclusions=", empty if not provided.
+          mode (str): Value of "mode=" or None.
+    """
+    data = data if data is not None else ""
+    source = None
+    target = None
+    mode = None
+    exclusions = []
+    in_exclusions = False
+    for part in data.split(";"):
+        part = part.strip()
+        if part.startswith("source="):
+            source = part[len("source="):]
+            in_exclusions = False
+        elif part.startswith("target="):
+            target = part[len("target="):]
+            in_exclusions = False
+        elif part.startswith("mode="):
+            mode = part[len("mode="):]
+            in_exclusions = False
+        elif part.startswith("exclusions="):
+            exclusions.append(part[len("exclusions="):])
+            in_exclusions = True
+        elif in_exclusions:
+            exclusions.append(part)
+    exclusions = [exclusion for exclusion in exclusions if exclusion]
+    return action_arguments(value=data.strip(), source=source, target=target, exclusions=exclusions, mode=mode)
+
+
+def validate_action_arguments(plugin_class, arguments):
+    """
+    Validate parsed arguments against the argument metadata of a plugin class. Plugins without metadata accept any
+    arguments.
+
+    Plugin class attributes:
+        required_arguments (str tuple): action_arguments fields that must be provided ("value" for a single path).
+        argument_keys (str tuple): Keyed arguments accepted, unknown "key=" arguments are reported if provided.
+        argument_values (dict): Keyed argument -> tuple of the values accepted.
+
+    Args:
+        plugin_class (class): The plugin class.
+        arguments (action_arguments): The parsed arguments.
+
+    Returns:
+        str array: Error descriptions, empty if valid.
+    """
+    error_array = []
+    for name in getattr(plugin_class, "required_arguments", ()):
+        if not getattr(arguments, name):
+            error_array.append("path argument missing" if name == "value" else f"{name}-argument missing")
+
+    argument_keys = getattr(plugin_class, "argument_keys", None)
+    if argument_keys is not None:
+        in_exclusions = False
+        for part in arguments.value.split(";"):
+            key = part.strip().split("=", 1)[0]
+            if "=" not in part or not key.isidentifier():
+                continue
+            if key in argument_keys:
+                in_exclusions = key == "exclusions"
+            elif not in_exclusions:
+                error_array.append(f"unknown argument: {key}=")
+
+    for name, value_array in getattr(plugin_class, "argument_values", {}).items():
+        value = getattr(arguments, name)
+        if value is not None and value not in value_array:
+            error_array.append(f"{name}-argument must be one of {', '.join(value_array)}: {value}")
+    return error_array
+
+########################################################################################################################
+# Plan #################################################################################################################
+########################################################################################################################
+
+
+class ActionPlan:
+    """
+    Post clone actions of all repositories, parsed and validated once before any action is run.
+    Actions of plugins marked idempotent (class attribute idempotent = True, the result only depends on the action
+    data and not on the repository) are shared: identical actions in the same stage are run once, by the first
+    repository reaching them, and the result is reused by the others.
+    Async actions of all repositories are run by the async_runner of the plan. Steps applied by an earlier run are
+    skipped if a WorkspaceState is provided and the step is unchanged.
+    """
+
+    def __init__(self, plugin_map, async_runner=None, state=None):
+        self.plugin_map = plugin_map
+        self.async_runner = async_runner if async_runner is not None else AsyncActionRunner()
+        self.state = state
+        self.repository_map = {}  # Repository path -> {action source: action_step array}
+        self.source_hash_map = {}  # (Repository path, action source) -> hash of the action file
+        self.path_array = []
+        self.error_array = []
+        self.shared_step_map = {}  # Shared key -> first action_step
+        self.shared_result_map = {}  # Shared key -> action status
+        self.shared_lock_map = {}  # Shared key -> lock
+        self.lock = threading.Lock()
+
+    def add_repository(self, path):
+        """
+        Parse and validate the action files of a repository. A repository is added once.
+
+        Args:
+            path (str): Path to the cloned repository.
+
+        Returns:
+            str array: Errors found in the action files of the repository.
+        """
+        if path in self.repository_map:
+            return []
+
+        repo_name = os.path.basename(path)
+        source_map = {}
+        source_hash_map = {}
+        error_array = []
+        for action_source in ACTION_SOURCE_ARRAY:
+            path_clone_actions = os.path.join(path, action_source)
+            if not os.path.exists(path_clone_actions):
+                continue
+            with open(path_clone_actions, 'r') as file:
+                action_content = file.read()
+            source_hash_map[(path, action_source)] = hashlib.sha1(action_content.encode("utf-8")).hexdigest()
+
+            step_array = []
+            for line_number, line in enumerate(action_content.split("\n"), start=1):
+                if not line.strip():
+                    continue
+                line_split = line.strip().split(" ", 1)  # Get name by splitting on first space
+                plugin_name = line_split[0]
+                data = line_split[1] if len(line_split) > 1 else ""
+                location = f"{repo_name}/{action_source}:{line_number}"
+
+                # Validate plugin
+                if plugin_name not in self.plugin_map:
+                    error_array.append(f"{location}: unknown action {plugin_name}")
+                    continue
+                try:
+                    plugin_class = type(self.plugin_map[plugin_name])
+                except ImportError as e:
+                    error_array.append(f"{location}: failed to load {plugin_name}: {e}")
+                    continue
+
+                # Validate arguments
+                arguments = parse_action_arguments(data)
+                for error in validate_action_arguments(plugin_class, arguments):
+                    error_array.append(f"{location}: {plugin_name} {error}")
+
+                shared_key = None
+                if getattr(plugin_class, "idempotent", False):
+                    shared_key = (action_source, plugin_name, arguments.value)
+                step_array.append(action_step(plugin_name=plugin_name, data=data, arguments=arguments,
+                                              repo_path=path, action_source=action_source, line_number=line_number,
+                                              shared_key=shared_key))
+            source_map[action_source] = step_array
+
+        with self.lock:
+            self.repository_map[path] = source_map
+            self.source_hash_map.update(source_hash_map)
+            self.path_array.append(path)
+            self.error_array.extend(error_array)
+            for step_array in source_map.values():
+                for step in step_array:
+                    if step.shared_key is not None and step.shared_key not in self.shared_step_map:
+                        self.shared_step_map[step.shared_key] = step
+                        self.shared_lock_map[step.shared_key] = threading.Lock()
+        return error_array
+
+    def action_sources(self, path):
+        """
+        Get the action files found in a repository, also if empty.
+
+        Args:
+            path (str): Path to the repository.
+
+        Returns:
+            str array: The action file names in stage order.
+        """
+        return list(self.repository_map.get(path, {}))
+
+    def steps(self, path, action_source):
+        return self.repository_map.get(path, {}).get(action_source, [])
+
+    def source_hash(self, step):
+        return self.source_hash_map[(step.repo_path, step.action_source)]
+
+    def run_shared(self, step, run_function):
+        """
+        Run a step, running shared steps only once and reusing their status. Must be called holding a job slot of the
+        async runner, the slot is given up while waiting for another worker running the same shared step.
+
+        Args:
+            step (action_step): The step to run.
+            run_function (function): Runs the step, returning a tuple of its boolean status and its context.
+
+        Returns:
+            tuple: The (status, context) of the step, context None if reused, and True if the step was run by this
+                call.
+        """
+        if step.shared_key is None:
+            return run_function(step), True
+        shared_lock = self.shared_lock_map[step.shared_key]
+        if not shared_lock.acquire(blocking=False):
+            with self.async_runner.waiting():  # The running worker may wait for an async action
+                shared_lock.acquire()
+        try:
+            if step.shared_key in self.shared_result_map:
+                return (self.shared_result_map[step.shared_key], None), False
+            result = run_function(step)
+            self.shared_result_map[step.shared_key] = result[0]
+            return result, True
+        finally:
+            shared_lock.release()
+
+    def print_plan(self):
+        """
+        Print the steps of every repository and stage, marking steps shared with an earlier repository.
+        """
+        step_count = 0
+        shared_count = 0
+        for action_source in ACTION_SOURCE_ARRAY:
+            path_array = [path for path in self.path_array if self.steps(path, action_source)]
+            if not path_array:
+                continue
+            print(f"  {action_source}:")
+            for path in path_array:
+                print(f"    {os.path.basename(path)}:")
+                for step in self.steps(path, action_source):
+                    step_count += 1
+                    first_step = self.shared_step_map.get(step.shared_key) if step.shared_key else None
+                    if first_step is not None and first_step is not step:
+                        shared_count += 1
+                        print(f"      {step.plugin_name} {step.data} (shared with "
+                              f"{os.path.basename(first_step.repo_path)})")
+                    else:
+                        print(f"      {step.plugin_name} {step.data}".rstrip())
+        linked_array = [path for path in self.path_array if not self.action_sources(path)]
+        if linked_array:
+            print("  Linked to main:")
+            for path in linked_array:
+                print(f"    {os.path.basename(path)}")
+        print(f"  Steps: {step_count} ({shared_count} shared)")
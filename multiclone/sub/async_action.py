@@ -0,0 +1,136 @@
+# System imports
+import asyncio
+import inspect
+import threading
+
+from contextlib import contextmanager
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+# Default number of async actions running at the same time
+ASYNC_LIMIT_DEFAULT = 8
+
+########################################################################################################################
+# Async actions ########################################################################################################
+########################################################################################################################
+
+
+def is_async_action(plugin_object):
+    """
+    Check if a plugin defines "async def action(self, ctx)".
+
+    Args:
+        plugin_object (object): The plugin object or class.
+
+    Returns:
+        boolean: True if the action is a coroutine function.
+    """
+    return inspect.iscoroutinefunction(getattr(plugin_object, "action", None))
+
+
+class AsyncActionRunner:
+    """
+    Runs the async actions of all repositories on one event loop in a background thread, so I/O bound actions overlap
+    instead of blocking their repository worker.
+
+    Repository workers hold one of the job_slots while running actions. A worker awaiting an async action gives up its
+    slot, so another repository can run its actions in the meantime, and takes a slot again when the action is done.
+    The actions of a repository still run in order. Workers are sized by worker_count to leave room for the waiting
+    workers.
+
+    Attributes:
+        jobs (int): Number of repositories running actions at the same time.
+        async_limit (int): Number of async actions running at the same time.
+        timeout (float): Default seconds an async action may run before it is cancelled and fails, None for no limit.
+            A plugin class attribute "timeout" takes precedence.
+    """
+
+    def __init__(self, jobs=1, async_limit=ASYNC_LIMIT_DEFAULT, timeout=None):
+        self.jobs = max(1, jobs)
+        self.async_limit = max(1, async_limit)
+        self.timeout = timeout
+        self.job_slots = threading.BoundedSemaphore(self.jobs)
+        self.loop = None
+        self.loop_thread = None
+        self.semaphore = None
+        self.lock = threading.Lock()
+
+    def worker_count(self):
+        return self.jobs + self.async_limit
+
+    def run(self, plugin_object, ctx):
+        """
+        Run an async action to completion on the event loop. The job slot of the calling worker is released while
+        waiting.
+
+        Args:
+            plugin_object (object): The plugin object.
+            ctx (ActionContext): The context of the action.
+
+        Returns:
+            The value returned by the action, False if it timed out or raised.
+        """
+        timeout = getattr(plugin_object, "timeout", self.timeout)
+        future = asyncio.run_coroutine_threadsafe(self.limited(plugin_object.action(ctx), timeout), self.start())
+        with self.waiting():
+            try:
+                return future.result()
+            except (asyncio.TimeoutError, FutureTimeoutError):
+                ctx.log_add(f"Action timed out after {timeout} seconds")
+            except Exception as e:
+                ctx.log_add(f"Action raised {type(e).__name__}: {e}")
+        return False
+
+    @contextmanager
+    def waiting(self):
+        """
+        Give up the job slot of the calling worker while waiting, for async actions and for shared actions run by
+        another worker (which may itself need a slot to finish).
+        """
+        self.job_slots.release()
+        try:
+            yield
+        finally:
+            self.job_slots.acquire()
+
+    async def limited(self, coroutine, timeout):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.async_limit)  # Created on the loop thread
+        async with self.semaphore:
+            return await asyncio.wait_for(coroutine, timeout)
+
+    def start(self):
+        """
+        Start the event loop thread on first use.
+
+        Returns:
+            asyncio.AbstractEventLoop: The running loop.
+        """
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self.semaphore = None
+                self.loop_thread = threading.Thread(target=self.loop.run_forever, name="multiclone-async-actions",
+                                                    daemon=True)
+                self.loop_thread.start()
+            return self.loop
+
+    def close(self):
+        """
+        Stop the event loop thread, if started. Async actions still running are cancelled.
+        """
+        with self.lock:
+            if self.loop is None:
+                return
+            loop = self.loop
+            self.loop = None
+
+        async def cancel_all():
+            task_array = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in task_array:
+                task.cancel()
+            await asyncio.gather(*task_array, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(cancel_all(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        self.loop_thread.join()
+        loop.close()
@@ -1,14 +1,28 @@
 import os
-import subprocess
+
+from urllib.parse import urlsplit, urlunsplit
 
 from collections import namedtuple
 
+from multiclone.sub.fs import remove_tree
+from multiclone.sub.fs import stat_cache_invalidate
 from multiclone.sub.git.clone import git_clone
+from multiclone.sub.git.command import log_line
+from multiclone.sub.git.command import git_head_commit
+from multiclone.sub.git.mirror import mirror_update
+from multiclone.sub.git.sync import git_sync
 
 # Define named tuple type
-clone_result = namedtuple("clone_result", ["path", "status"])
+clone_result = namedtuple("clone_result", ["path", "status", "commit"], defaults=(None,))
+
+# Accepted URL prefixes, "file://" for local repositories (offline use and benchmarks)
+URL_PREFIXES = ('http', 'file://')
 
-def git_clone_url(url, path=None, force=True, depth=1, branch=None, commit=None):
+# Suffix of the folder a repository is cloned into before it is renamed to its final path
+PARTIAL_SUFFIX = ".partial"
+
+def git_clone_url(url, path=None, force=True, depth=1, branch=None, commit=None, log=None, mirror_cache=None,
+                  sync=False, filter_spec=None, sparse=None, promote=True):
     """
     Clone a Git repository from the given URL with optional depth, branch, or commit.
     
@@ -19,18 +33,36 @@ def git_clone_url(url, path=None, force=True, depth=1, branch=None, commit=None)
         depth (int, optional, default = 1): The depth of the clone (number of commits to include).
         branch (str, optional, default = None): The branch to clone (ignored if commit is specified).
         commit (str, optional, default = None): The commit hash or reference to clone (takes precedence over branch).
+        log (str array, optional, default = None): Collects output lines instead of printing them.
+            Used when cloning in parallel so the output of each repository can be printed as one block.
+        mirror_cache (str, optional, default = None): Path to a mirror cache folder. If provided, a bare mirror of the
+            repository is created or fetched in the cache and the repository is cloned from it.
+        sync (boolean, optional, default = False): If repo is already cloned only the requested version is fetched and
+            the working tree is hard reset to it. Clean repositories already at the requested version are skipped.
+            Takes precedence over force for existing repositories.
+        filter_spec (str, optional, default = None): Partial clone filter, for example "blob:none".
+        sparse (str array, optional, default = None): Folders to materialize using a cone mode sparse-checkout.
+        promote (boolean, optional, default = True): If False a successful clone is left in its partial folder, which
+            is returned as path, for promote_clone to move it into place or discard_clone to remove it later.
+            Existing repositories are still skipped or synced in place.
+
+    The repository is cloned into a ".<name>.partial"-folder next to its final path and only renamed to the final path
+    (replacing an existing repository if force) once the clone succeeded, so an interrupted clone never looks cloned
+    and a failed forced clone keeps the existing repository. An existing folder that is not a readable repository
+    (for example left by an interrupted older version) is cloned again also without force.
     
     Returns:
         clone_result:
           path (str): Path to cloned repository.
           status (boolean): True if the clone was successful, False otherwise.
+          commit (str): The commit hash checked out, None if unsuccessful.
     """
     # Print header
-    print(f"  Clone {url}")
+    log_line(log, f"  Clone {url}")
     
     # Sanity check for a valid URL
-    if not url.startswith('http'):
-        print(f"    Invalid URL: {url}")
+    if not url.startswith(URL_PREFIXES):
+        log_line(log, f"    Invalid URL: {url}")
         return clone_result(path="", status=False)
 
     # Handle path parameter
@@ -39,43 +71,205 @@ def git_clone_url(url, path=None, force=True, depth=1, branch=None, commit=None)
 
     # Acquire repo details
     repo_name = extract_repo_name(url)
+    if not valid_repo_name(repo_name):
+        log_line(log, f"    Invalid repository name in URL: {url}")
+        return clone_result(path="", status=False)
     repo_path = os.path.join(path, repo_name)  # Build repo path 
 
-    # Force handling
-    if os.path.exists(repo_path) and force:
+    # Sync handling
+    if sync and os.path.isdir(os.path.join(repo_path, ".git")):
+        mirror = mirror_update(url, normalize_url(url), mirror_cache, log=log) if mirror_cache is not None else None
+        result = git_sync(repo_path, depth, branch, commit, log=log, mirror=mirror, filter_spec=filter_spec,
+                          sparse=sparse)
+        if result.skipped:
+            log_line(log, f"    Repository already at requested version, sync skipped: {repo_name}")
+        elif result.status:
+            log_line(log, f"    Successfully synced repository: {repo_name}")
+        else:
+            log_line(log, f"    Failed to sync repository: {repo_name}")
+        commit = git_head_commit(repo_path) if result.status else None
+        return clone_result(path=repo_path, status=result.status, commit=commit)
+
+    # Existing repository handling, folders that are not a readable repository are replaced
+    if os.path.exists(repo_path) and not (force or sync):
+        existing_commit = git_head_commit(repo_path)
+        if existing_commit is not None:
+            log_line(log, f"    Repository already exists, clone skipped: {repo_name}")
+            return clone_result(path=repo_path, status=True, commit=existing_commit)
+        log_line(log, f"    Existing folder is not a readable repository, cloned again: {repo_name}")
+
+    # Remove a partial clone left by an interrupted run
+    partial_path = os.path.join(path, f".{repo_name}{PARTIAL_SUFFIX}")
+    if os.path.exists(partial_path):
         try:
-            # Removal using rmdir (note: shutil.rmtree does not have required access)
-            command = ["rmdir", repo_path, "/s", "/q"]
-            subprocess.run(command, shell=True)
-            print(f"    Forced removal of: {repo_name}")
-        except subprocess.CalledProcessError as e:
-            print(f"    Forced removal failure for: {repo_name}")
+            remove_tree(partial_path)
+        except OSError as e:
+            log_line(log, f"    Partial clone removal failure for: {repo_name}")
+            log_line(log, f"      {e}")
             return clone_result(path=repo_path, status=False)
-    elif os.path.exists(repo_path) and not force:
-        print(f"    Repository already exists, clone skipped: {repo_name}")
-        return clone_result(path=repo_path, status=True)
+
+    # Update mirror
+    mirror = None
+    if mirror_cache is not None:
+        mirror = mirror_update(url, normalize_url(url), mirror_cache, log=log)
 
     # Call clone action
-    success = git_clone(url, repo_path, depth, branch, commit)
+    success = git_clone(url, partial_path, depth, branch, commit, log=log, mirror=mirror, filter_spec=filter_spec,
+                        sparse=sparse)
+    if not success:
+        remove_partial_clone(partial_path)
+        log_line(log, f"    Failed to clone repository: {repo_name}")
+        return clone_result(path=repo_path, status=False)
+
+    if not promote:
+        log_line(log, f"    Cloned into partial folder: {repo_name}")
+        return clone_result(path=partial_path, status=True, commit=git_head_commit(partial_path))
+    if not move_clone_into_place(partial_path, repo_path, log=log):
+        return clone_result(path=repo_path, status=False)
+    log_line(log, f"    Successfully cloned repository: {repo_name}")
+    return clone_result(path=repo_path, status=True, commit=git_head_commit(repo_path))
+
+def move_clone_into_place(partial_path, repo_path, log=None):
+    """
+    Rename a clone from its partial folder to its final path, replacing an existing repository (force handling, sync
+    re-clones folders that are not a repository). The partial folder is removed on failure. Only a folder next to the
+    partial folder is replaced, never the clone root itself or a folder outside of it.
+
+    Args:
+        partial_path (str): Path of the partial folder.
+        repo_path (str): The final path.
+        log (str array, optional, default = None): Collects output lines instead of printing them.
+
+    Returns:
+        boolean: True if the clone was moved into place.
+    """
+    repo_name = os.path.basename(repo_path)
+    clone_root = os.path.dirname(os.path.abspath(partial_path))
+    if not valid_repo_name(repo_name) or os.path.dirname(os.path.abspath(repo_path)) != clone_root:
+        log_line(log, f"    Refused to replace a folder that is not a repository folder of the clone root: {repo_path}")
+        remove_partial_clone(partial_path)
+        return False
+    if os.path.exists(repo_path):
+        try:
+            remove_tree(repo_path)
+            log_line(log, f"    Forced removal of: {repo_name}")
+        except OSError as e:
+            log_line(log, f"    Forced removal failure for: {repo_name}")
+            log_line(log, f"      {e}")
+            remove_partial_clone(partial_path)
+            return False
+    try:
+        os.rename(partial_path, repo_path)
+    except OSError as e:
+        log_line(log, f"    Failed to move clone into place: {repo_name}")
+        log_line(log, f"      {e}")
+        return False
+    finally:
+        stat_cache_invalidate(repo_path)
+    return True
+
+def partial_to_repo_path(path):
+    """
+    Get the final path of a clone left in its partial folder.
+
+    Args:
+        path (str): Path returned by git_clone_url.
 
-    if success:
-        print(f"    Successfully cloned repository: {repo_name}")
-    else:
-        print(f"    Failed to clone repository: {repo_name}")
-    return clone_result(path=repo_path, status=success)
+    Returns:
+        str: The final path, None if path is not a partial folder.
+    """
+    folder_name = os.path.basename(path)
+    if not (folder_name.startswith(".") and folder_name.endswith(PARTIAL_SUFFIX)):
+        return None
+    return os.path.join(os.path.dirname(path), folder_name[1:-len(PARTIAL_SUFFIX)])
+
+def promote_clone(result, log=None):
+    """
+    Move a clone left in its partial folder by git_clone_url (promote=False) into place.
+
+    Args:
+        result (clone_result): The result returned by git_clone_url. Returned unchanged if not in a partial folder.
+        log (str array, optional, default = None): Collects output lines instead of printing them.
+
+    Returns:
+        clone_result: The result with the final path.
+    """
+    repo_path = partial_to_repo_path(result.path) if result.status else None
+    if repo_path is None:
+        return result
+    if not move_clone_into_place(result.path, repo_path, log=log):
+        return clone_result(path=repo_path, status=False)
+    log_line(log, f"    Successfully cloned repository: {os.path.basename(repo_path)}")
+    return result._replace(path=repo_path)
+
+def discard_clone(result):
+    """
+    Remove a clone left in its partial folder by git_clone_url (promote=False). Other results are left untouched.
+
+    Args:
+        result (clone_result): The result returned by git_clone_url.
+    """
+    if result.status and partial_to_repo_path(result.path) is not None:
+        remove_partial_clone(result.path)
+
+def remove_partial_clone(partial_path):
+    """
+    Remove a partial folder, ignoring failures as it is removed by the next clone of the repository anyway.
+
+    Args:
+        partial_path (str): Path of the partial folder.
+    """
+    try:
+        remove_tree(partial_path)
+    except OSError:
+        pass
+
+def valid_repo_name(repo_name):
+    """
+    Check if a repository name can be used as folder name in the clone root.
+
+    Args:
+        repo_name (str): The name returned by extract_repo_name.
+
+    Returns:
+        boolean: False for an empty name, "." or ".." and names containing a path separator.
+    """
+    return repo_name not in ("", ".", "..") and "/" not in repo_name and "\\" not in repo_name
 
 def extract_repo_name(url):
     """
-    Extract repository name from provided url. If the name contains ".." everything before ".." will be removed.
+    Extract repository name from provided url. Trailing "/" and ".git" are removed as by normalize_url. If the name
+    contains ".." everything before ".." will be removed.
     
     Args:
         url (str): The URL of the Git repository.
         
     Returns:
-        string: The name of the repository with anything before ".." removed.
+        string: The name of the repository with anything before ".." removed, empty if the url has no name.
+    """
+    name = url.strip().rstrip("/").split("/")[-1]
+    if name.endswith(".git"):
+        name = name[:-len(".git")]
+    if ".." in name:
+        return name.split("..", 1)[1]
+    return name
+
+def normalize_url(url):
+    """
+    Normalize a repository URL so different spellings of the same repository compare equal.
+    Scheme and host are lower cased, trailing "/" and ".git" are removed.
+
+    Args:
+        url (str): The URL of the Git repository.
+
+    Returns:
+        string: The normalized URL.
     """
-    url_components = url.split("/")
-    if ".." in url_components[-1]:
-        return url_components[-1].split("..", 1)[1]
-    else:
-        return url_components[-1]
+    url = url.strip().rstrip("/")
+    if url.endswith(".git"):
+        url = url[:-len(".git")]
+    url_parts = urlsplit(url)
+    if url_parts.scheme and url_parts.netloc:
+        url = urlunsplit((url_parts.scheme.lower(), url_parts.netloc.lower(), url_parts.path, url_parts.query,
+                          url_parts.fragment))
+    return url
@@ -0,0 +1,219 @@
+# System imports
+import os
+import platform
+import shutil
+import stat
+import subprocess
+import sys
+import threading
+
+IS_WINDOWS = platform.system() == 'Windows'
+
+if IS_WINDOWS:
+    import _winapi
+
+# Windows file attribute and reparse tags (also defined in stat on Windows builds)
+FILE_ATTRIBUTE_REPARSE_POINT = getattr(stat, "FILE_ATTRIBUTE_REPARSE_POINT", 0x400)
+IO_REPARSE_TAG_MOUNT_POINT = getattr(stat, "IO_REPARSE_TAG_MOUNT_POINT", 0xA0000003)
+IO_REPARSE_TAG_SYMLINK = getattr(stat, "IO_REPARSE_TAG_SYMLINK", 0xA000000C)
+
+# Per run lstat cache, path -> os.stat_result. Missing paths are not cached, they may be created by other code at any
+# time. Entries are invalidated by the functions of this module and the cache is cleared for every action run.
+stat_cache_map = {}
+stat_cache_lock = threading.Lock()
+
+########################################################################################################################
+# Stat cache ###########################################################################################################
+########################################################################################################################
+
+
+def lstat_cached(path):
+    """
+    Get the lstat result of a path, cached until the path is changed through this module or the cache is cleared.
+    Only found paths are cached, a missing path is looked up again on the next call.
+
+    Args:
+        path (str): The path.
+
+    Returns:
+        os.stat_result: The lstat result or None if the path does not exist.
+    """
+    key = os.path.abspath(path)
+    with stat_cache_lock:
+        if key in stat_cache_map:
+            return stat_cache_map[key]
+    try:
+        result = os.lstat(key)
+    except OSError:
+        return None
+    with stat_cache_lock:
+        stat_cache_map[key] = result
+    return result
+
+
+def stat_cache_invalidate(path):
+    """
+    Drop a path and everything below it from the stat cache.
+
+    Args:
+        path (str): The path.
+    """
+    key = os.path.abspath(path)
+    prefix = os.path.join(key, "")
+    with stat_cache_lock:
+        for cached_path in [cached_path for cached_path in stat_cache_map
+                            if cached_path == key or cached_path.startswith(prefix)]:
+            del stat_cache_map[cached_path]
+
+
+def stat_cache_clear():
+    with stat_cache_lock:
+        stat_cache_map.clear()
+
+########################################################################################################################
+# Links ################################################################################################################
+########################################################################################################################
+
+
+def path_exists(path):
+    """
+    Check if a path exists without following links, so broken links are found too.
+
+    Args:
+        path (str): The path.
+
+    Returns:
+        boolean: True if the path exists.
+    """
+    return lstat_cached(path) is not None
+
+
+def is_link(path):
+    """
+    Check if a path is a folder link: a junction or symbolic link on Windows, a symbolic link elsewhere.
+
+    Args:
+        path (str): The path.
+
+    Returns:
+        boolean: True if the path is a link.
+    """
+    result = lstat_cached(path)
+    if result is None:
+        return False
+    if stat.S_ISLNK(result.st_mode):
+        return True
+    if IS_WINDOWS and getattr(result, "st_file_attributes", 0) & FILE_ATTRIBUTE_REPARSE_POINT:
+        return getattr(result, "st_reparse_tag", 0) in (IO_REPARSE_TAG_MOUNT_POINT, IO_REPARSE_TAG_SYMLINK)
+    return False
+
+
+def link_target(path):
+    """
+    Get the folder a link points to.
+
+    Args:
+        path (str): Path to the link.
+
+    Returns:
+        str: The link target or None if path is not a readable link.
+    """
+    try:
+        return os.readlink(path)
+    except (OSError, ValueError):
+        return None
+
+
+def create_link(target_path, source_path):
+    """
+    Create a folder link at target_path pointing to source_path. A junction is created on Windows (no elevated
+    rights needed), a symbolic link elsewhere. Python builds without _winapi.CreateJunction use mklink /J instead.
+
+    Args:
+        target_path (str): Path of the link to create.
+        source_path (str): The folder to link to.
+
+    Raises:
+        OSError: If the link could not be created.
+    """
+    try:
+        if IS_WINDOWS and hasattr(_winapi, "CreateJunction"):
+            _winapi.CreateJunction(os.path.abspath(source_path), os.path.abspath(target_path))
+        elif IS_WINDOWS:
+            create_junction_mklink(target_path, source_path)
+        else:
+            os.symlink(source_path, target_path, target_is_directory=True)
+    finally:
+        stat_cache_invalidate(target_path)
+
+
+def create_junction_mklink(target_path, source_path):
+    """
+    Create a junction through cmd.exe mklink /J, used when _winapi.CreateJunction is not available.
+
+    Args:
+        target_path (str): Path of the junction to create.
+        source_path (str): The folder to link to.
+
+    Raises:
+        OSError: If the junction could not be created.
+    """
+    startupinfo = subprocess.STARTUPINFO()
+    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    try:
+        subprocess.run(["cmd.exe", "/c", "mklink", "/j", target_path, source_path], check=True,
+                       startupinfo=startupinfo, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except subprocess.CalledProcessError as e:
+        raise OSError(f"mklink failed: {e.stderr.decode(errors='replace').strip()}") from e
+
+
+def remove_link(path):
+    """
+    Remove a folder link without touching the folder it points to.
+
+    Args:
+        path (str): Path to the link.
+
+    Raises:
+        OSError: If the link could not be removed.
+    """
+    try:
+        if IS_WINDOWS:
+            os.rmdir(path)  # Junctions and directory symbolic links are removed as folders
+        else:
+            os.unlink(path)
+    finally:
+        stat_cache_invalidate(path)
+
+
+def remove_tree(path):
+    """
+    Remove a folder and its content, or only the link if path is a link. Read-only files (git objects) are made
+    writable before removal.
+
+    Args:
+        path (str): The path.
+
+    Raises:
+        OSError: If the folder could not be removed.
+    """
+    def on_error(function, failed_path, exc_info):
+        os.chmod(failed_path, stat.S_IWRITE)
+        function(failed_path)
+
+    # onerror is deprecated since Python 3.12, onexc receives the exception instead of exc_info
+    if sys.version_info >= (3, 12):
+        error_handler_map = {"onexc": on_error}
+    else:
+        error_handler_map = {"onerror": on_error}
+
+    stat_cache_invalidate(path)  # Always act on the current state
+    try:
+        if is_link(path):
+            remove_link(path)
+        elif lstat_cached(path) is not None and not os.path.isdir(path):
+            os.remove(path)
+        elif lstat_cached(path) is not None:
+            shutil.rmtree(path, **error_handler_map)
+    finally:
+        stat_cache_invalidate(path)
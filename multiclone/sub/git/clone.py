@@ -1,8 +1,12 @@
 import os
 import subprocess
-import platform
 
-def git_clone(url, path, depth=1, branch=None, commit=None, hide_terminal=True):
+from multiclone.sub.git.command import git_run
+from multiclone.sub.git.command import log_line
+from multiclone.sub.git.command import log_process_error
+
+def git_clone(url, path, depth=1, branch=None, commit=None, hide_terminal=True, log=None, mirror=None,
+              filter_spec=None, sparse=None):
     """
     Clone a Git repository from the given URL with optional depth, branch, or commit.
     
@@ -13,6 +17,13 @@ def git_clone(url, path, depth=1, branch=None, commit=None, hide_terminal=True):
         branch (str, optional, default = None): The branch to clone (ignored if commit is specified).
         commit (str, optional, default = None): The commit hash or reference to clone (takes precedence over branch).
         hide_terminal (boolean, optional, default = True): Run while hiding terminal
+        log (str array, optional, default = None): Collects output lines instead of printing them.
+        mirror (str, optional, default = None): Path to a local bare mirror of url to clone from.
+            Objects are hard linked from the mirror and origin is pointed back at url.
+        filter_spec (str, optional, default = None): Partial clone filter, for example "blob:none".
+            Not used when cloning from a mirror.
+        sparse (str array, optional, default = None): Folders to materialize using a cone mode sparse-checkout.
+            Files in the repository root are always materialized.
     
     Returns:
         bool: True if the clone was successful, False otherwise.
@@ -23,29 +34,22 @@ def git_clone(url, path, depth=1, branch=None, commit=None, hide_terminal=True):
     if not os.path.exists(path):
         os.makedirs(path)
     
+    if mirror is not None:
+        return git_clone_from_mirror(url, path, mirror, branch, commit, hide_terminal, log, sparse)
+
+    if commit is not None:
+        return git_clone_commit(url, path, commit, depth, hide_terminal, log, filter_spec, sparse)
+
     command = ['git', 'clone']
     
     if depth is not None:
         command.extend(['--depth', str(depth)])
-    
-    if commit is not None:
-        command.extend(['--single-branch', '--tags'])
-        command.append(url)
-        subprocess.run(command, check=True)
-        
-        # Change to the cloned repository directory
-        repo_name = url.split('/')[-1].split('.git')[0]
-        subprocess.run(['cd', repo_name], shell=True)
-        
-        # Fetch the specific commit
-        fetch_command = ['git', 'fetch', '--depth=1', 'origin', commit]
-        subprocess.run(fetch_command, check=True)
-        
-        # Checkout the specific commit
-        checkout_command = ['git', 'checkout', commit]
-        subprocess.run(checkout_command, check=True)
-        
-        return True
+
+    if filter_spec is not None:
+        command.append(f"--filter={filter_spec}")
+
+    if sparse:
+        command.append('--sparse')
     
     if branch is not None and commit is None:
         command.extend(['--branch', branch])
@@ -53,20 +57,153 @@ def git_clone(url, path, depth=1, branch=None, commit=None, hide_terminal=True):
     command.extend([url, path])
     
     try:
-        if platform.system() == 'Windows' and hide_terminal:
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            subprocess.run(command, check=True, startupinfo=startupinfo, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-        elif platform.system() == 'Darwin' and hide_terminal:
-            script = f'tell application "Terminal" to do script "{subprocess.list2cmdline(command)}"'
-            subprocess.run(['osascript', '-e', script], check=True)
-        else:
-            # For other platforms, fall back to the default behavior (visible terminal)
-            subprocess.run(command, check=True)    
+        git_run(command, hide_terminal=hide_terminal)
+        if sparse:
+            git_sparse_checkout(path, sparse, hide_terminal)
         return True
     except subprocess.CalledProcessError as e:
         # Handle the error
-        stderr_output = e.stderr.decode("utf-8")  # Decode the stderr output
-        print("Error occurred:")
-        print(stderr_output)
+        log_process_error(log, e)
+        return False
+
+def git_clone_from_mirror(url, path, mirror, branch=None, commit=None, hide_terminal=True, log=None, sparse=None):
+    """
+    Clone a Git repository from a local bare mirror. Depth is not used as local clones hard link all objects.
+
+    Args:
+        url (str): The URL of the Git repository, set as origin of the clone.
+        path (str): Path to where repository will be cloned
+        mirror (str): Path to the local bare mirror of url.
+        branch (str, optional, default = None): The branch to clone (ignored if commit is specified).
+        commit (str, optional, default = None): The commit hash or reference to clone (takes precedence over branch).
+        hide_terminal (boolean, optional, default = True): Run while hiding terminal
+        log (str array, optional, default = None): Collects output lines instead of printing them.
+        sparse (str array, optional, default = None): Folders to materialize using a cone mode sparse-checkout.
+
+    Returns:
+        bool: True if the clone was successful, False otherwise.
+    """
+    command = ['git', 'clone']
+    if sparse:
+        command.append('--sparse')
+    if commit is not None:
+        command.append('--no-checkout')
+    elif branch is not None:
+        command.extend(['--branch', branch])
+    command.extend([mirror, path])
+
+    try:
+        git_run(command, hide_terminal=hide_terminal)
+        git_run(['git', 'remote', 'set-url', 'origin', url], cwd=path, hide_terminal=hide_terminal)
+        if sparse:
+            git_sparse_checkout(path, sparse, hide_terminal)
+        if commit is not None:
+            git_run(['git', 'checkout', '--detach', commit], cwd=path, hide_terminal=hide_terminal)
+        return True
+    except subprocess.CalledProcessError as e:
+        log_process_error(log, e)
+        return False
+
+def git_sparse_checkout(path, sparse, hide_terminal=True):
+    """
+    Limit the working tree of a repository cloned with "--sparse" to the provided folders (cone mode).
+
+    Args:
+        path (str): Path to the repository.
+        sparse (str array): Folders to materialize, relative to the repository root using "/" as separator.
+        hide_terminal (boolean, optional, default = True): Run while hiding terminal
+
+    Raises:
+        subprocess.CalledProcessError: If the sparse-checkout could not be set.
+    """
+    git_run(['git', 'sparse-checkout', 'set', '--cone', *sparse], cwd=path, hide_terminal=hide_terminal)
+
+def git_clone_commit(url, path, commit, depth=1, hide_terminal=True, log=None, filter_spec=None, sparse=None):
+    """
+    Clone a single commit of a Git repository. The repository is initialized and the commit fetched directly, so no
+    branch history is downloaded unless the server refuses to serve the commit by hash.
+
+    Args:
+        url (str): The URL of the Git repository.
+        path (str): Path to where repository will be cloned
+        commit (str): The commit hash to clone.
+        depth (int, optional, default = 1): The depth of the fetch (number of commits to include).
+        hide_terminal (boolean, optional, default = True): Run while hiding terminal
+        log (str array, optional, default = None): Collects output lines instead of printing them.
+        filter_spec (str, optional, default = None): Partial clone filter, for example "blob:none".
+        sparse (str array, optional, default = None): Folders to materialize using a cone mode sparse-checkout.
+
+    Returns:
+        bool: True if the clone was successful, False otherwise.
+    """
+    try:
+        git_run(['git', 'init', '--quiet', path], hide_terminal=hide_terminal)
+        git_run(['git', 'remote', 'add', 'origin', url], cwd=path, hide_terminal=hide_terminal)
+        if filter_spec is not None:
+            # Mark origin as promisor so filtered objects are fetched on demand
+            git_run(['git', 'config', 'remote.origin.promisor', 'true'], cwd=path, hide_terminal=hide_terminal)
+            git_run(['git', 'config', 'remote.origin.partialclonefilter', filter_spec], cwd=path,
+                    hide_terminal=hide_terminal)
+        if sparse:
+            git_sparse_checkout(path, sparse, hide_terminal)
+        git_fetch_commit(path, 'origin', commit, depth, hide_terminal, log, filter_spec)
+        git_run(['git', 'checkout', '--quiet', '--detach', commit], cwd=path, hide_terminal=hide_terminal)
+        return True
+    except subprocess.CalledProcessError as e:
+        log_process_error(log, e)
         return False
+
+def git_fetch_commit(path, source, commit, depth=1, hide_terminal=True, log=None, filter_spec=None):
+    """
+    Fetch a single commit by hash in one round trip. If the server refuses the hash (abbreviated, or the server does
+    not allow fetching unadvertised commits) branches and tags are fetched with increasing depth until it is found.
+
+    Args:
+        path (str): Path to the repository to fetch into.
+        source (str): Remote name, URL or path to fetch from.
+        commit (str): The commit hash to fetch.
+        depth (int, optional, default = 1): The depth of the fetch (number of commits to include).
+        hide_terminal (boolean, optional, default = True): Run while hiding terminal
+        log (str array, optional, default = None): Collects output lines instead of printing them.
+        filter_spec (str, optional, default = None): Partial clone filter, for example "blob:none".
+
+    Raises:
+        subprocess.CalledProcessError: If the commit could not be fetched.
+    """
+    command = ['git', 'fetch', '--quiet', '--no-tags']
+    if filter_spec is not None:
+        command.append(f"--filter={filter_spec}")
+
+    try:
+        depth_command = command + (['--depth', str(depth)] if depth is not None else [])
+        git_run(depth_command + [source, commit], cwd=path, hide_terminal=hide_terminal)
+        return
+    except subprocess.CalledProcessError:
+        log_line(log, f"    Commit could not be fetched directly, deepen history: {commit}")
+
+    # Deepen branch and tag history until the commit is found, last attempt fetches the full history
+    refspec_array = ['+refs/heads/*:refs/remotes/origin/*', '+refs/tags/*:refs/tags/*']
+    deepen_depth_array = [100, None] if depth is not None else [None]
+    for deepen_depth in deepen_depth_array:
+        if deepen_depth is not None:
+            depth_command = command + ['--depth', str(deepen_depth)]
+        elif is_shallow(path):
+            depth_command = command + ['--unshallow']
+        else:
+            depth_command = list(command)
+        git_run(depth_command + [source] + refspec_array, cwd=path, hide_terminal=hide_terminal)
+        if commit_exists(path, commit):
+            return
+    raise subprocess.CalledProcessError(1, ['git', 'fetch', source, commit],
+                                        stderr=f"fatal: commit not found: {commit}".encode("utf-8"))
+
+def commit_exists(path, commit):
+    try:
+        git_run(['git', 'cat-file', '-e', f"{commit}^{{commit}}"], cwd=path)
+        return True
+    except subprocess.CalledProcessError:
+        return False
+
+def is_shallow(path):
+    output = git_run(['git', 'rev-parse', '--is-shallow-repository'], cwd=path).stdout
+    return output.decode("utf-8").strip() == "true"
@@ -0,0 +1,95 @@
+import os
+import platform
+import subprocess
+
+from multiclone.sub.trace import trace_span
+
+# Git options taking a value before the subcommand
+GIT_OPTION_VALUE_SET = {"-C", "-c", "--git-dir", "--work-tree"}
+
+def git_run(command, cwd=None, hide_terminal=True):
+    """
+    Run a git command with captured output so concurrent commands do not write to the terminal at the same time.
+
+    Args:
+        command (str array): The command to run, starting with "git".
+        cwd (str, optional, default = None): Working directory of the command.
+        hide_terminal (boolean, optional, default = True): Run while hiding terminal (Windows only).
+
+    Returns:
+        subprocess.CompletedProcess: Completed process with stdout and stderr as bytes.
+
+    Raises:
+        subprocess.CalledProcessError: If the command returns a non-zero exit code.
+    """
+    with trace_span(f"git {git_subcommand(command)}", "git", command=" ".join(command), cwd=cwd):
+        if platform.system() == 'Windows' and hide_terminal:
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            return subprocess.run(command, check=True, cwd=cwd, startupinfo=startupinfo,
+                                  stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return subprocess.run(command, check=True, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+def git_subcommand(command):
+    """
+    Get the subcommand of a git command, for example "fetch" of ["git", "--git-dir", path, "fetch", "origin"].
+
+    Args:
+        command (str array): The command, starting with "git".
+
+    Returns:
+        str: The subcommand, empty if not found.
+    """
+    skip_value = False
+    for word in command[1:]:
+        if skip_value:
+            skip_value = False
+        elif word in GIT_OPTION_VALUE_SET:
+            skip_value = True
+        elif not word.startswith("-"):
+            return word
+    return ""
+
+def log_line(log, line):
+    """
+    Print a line or, if a log is provided, append it to the log so it can be printed later as one block.
+
+    Args:
+        log (str array): Log to append to. Line is printed if None.
+        line (str): The line to output.
+    """
+    if log is None:
+        print(line)
+    else:
+        log.append(line)
+
+def log_process_error(log, error, indentation="    "):
+    """
+    Output the stderr of a failed git command.
+
+    Args:
+        log (str array): Log to append to. Lines are printed if None.
+        error (subprocess.CalledProcessError): The error raised by git_run.
+        indentation (str, optional, default = "    "): Indentation of the output lines.
+    """
+    log_line(log, f"{indentation}Error occurred:")
+    stderr_output = error.stderr.decode("utf-8", errors="replace") if error.stderr else ""
+    for line in stderr_output.splitlines():
+        log_line(log, f"{indentation}  {line}")
+
+def git_head_commit(path):
+    """
+    Get the commit hash HEAD of a repository points to.
+
+    Args:
+        path (str): Path to the repository.
+
+    Returns:
+        str: The full commit hash or None if it could not be read.
+    """
+    if not os.path.exists(os.path.join(path, ".git")):  # Never report the commit of an enclosing repository
+        return None
+    try:
+        return git_run(['git', 'rev-parse', 'HEAD'], cwd=path).stdout.decode("utf-8").strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
@@ -0,0 +1,149 @@
+import hashlib
+import os
+import subprocess
+import threading
+
+from multiclone.sub.fs import remove_tree
+from multiclone.sub.git.command import git_run
+from multiclone.sub.git.command import log_line
+from multiclone.sub.git.command import log_process_error
+
+# Name of the file touched inside a mirror every time it is used, drives LRU eviction
+MIRROR_LAST_USED_FILE = "multiclone-last-used"
+
+# One lock per mirror path so two workers never fetch into the same mirror at once
+mirror_lock_map = {}
+mirror_lock_map_lock = threading.Lock()
+
+#####################################################################################################
+# Mirror update #####################################################################################
+#####################################################################################################
+
+def mirror_update(url, normalized_url, cache_path, log=None):
+    """
+    Create or incrementally fetch the bare mirror of a repository in the mirror cache.
+
+    Args:
+        url (str): The URL of the Git repository.
+        normalized_url (str): The normalized URL, used to name the mirror.
+        cache_path (str): Path to the mirror cache folder.
+        log (str array, optional, default = None): Collects output lines instead of printing them.
+
+    Returns:
+        str: Path to the mirror or None if no mirror is available.
+    """
+    mirror_path = build_mirror_path(normalized_url, cache_path)
+
+    with mirror_lock_map_lock:
+        if mirror_path not in mirror_lock_map:
+            mirror_lock_map[mirror_path] = threading.Lock()
+        mirror_lock = mirror_lock_map[mirror_path]
+
+    with mirror_lock:
+        if os.path.isfile(os.path.join(mirror_path, "HEAD")):
+            try:
+                git_run(['git', '--git-dir', mirror_path, 'fetch', '--prune', '--tags', 'origin'])
+                log_line(log, f"    Mirror updated: {os.path.basename(mirror_path)}")
+            except subprocess.CalledProcessError as e:
+                # A stale mirror is still a valid source, missing objects are caught when cloning
+                log_line(log, f"    Mirror update failed, using cached content: {os.path.basename(mirror_path)}")
+                log_process_error(log, e, indentation="      ")
+        else:
+            # Clone to a temporary folder first so an interrupted clone never looks like a valid mirror
+            os.makedirs(cache_path, exist_ok=True)
+            temporary_path = f"{mirror_path}.partial"
+            if os.path.exists(temporary_path):
+                remove_mirror(temporary_path)
+            try:
+                git_run(['git', 'clone', '--mirror', url, temporary_path])
+                os.rename(temporary_path, mirror_path)
+                log_line(log, f"    Mirror created: {os.path.basename(mirror_path)}")
+            except (subprocess.CalledProcessError, OSError) as e:
+                log_line(log, f"    Mirror creation failed: {os.path.basename(mirror_path)}")
+                if isinstance(e, subprocess.CalledProcessError):
+                    log_process_error(log, e, indentation="      ")
+                remove_mirror(temporary_path)
+                return None
+
+        # Mark as used
+        with open(os.path.join(mirror_path, MIRROR_LAST_USED_FILE), 'w') as file:
+            file.write(f"{url}\n")
+
+    return mirror_path
+
+def build_mirror_path(normalized_url, cache_path):
+    """
+    Build the mirror path of a repository, a readable name followed by a hash of the normalized URL.
+
+    Args:
+        normalized_url (str): The normalized URL of the Git repository.
+        cache_path (str): Path to the mirror cache folder.
+
+    Returns:
+        str: Path to the mirror.
+    """
+    url_hash = hashlib.sha1(normalized_url.encode("utf-8")).hexdigest()[:12]
+    repo_name = normalized_url.rstrip("/").split("/")[-1]
+    return os.path.join(cache_path, f"{repo_name}-{url_hash}.git")
+
+#####################################################################################################
+# Mirror eviction ###################################################################################
+#####################################################################################################
+
+def mirror_evict(cache_path, max_size, keep_after=None):
+    """
+    Remove the least recently used mirrors until the mirror cache is no larger than max_size.
+
+    Args:
+        cache_path (str): Path to the mirror cache folder.
+        max_size (int): Maximum size of the cache in bytes.
+        keep_after (float, optional, default = None): Mirrors used after this time stamp are never evicted.
+
+    Returns:
+        str array: Names of the evicted mirrors.
+    """
+    if not os.path.isdir(cache_path):
+        return []
+
+    # Collect mirrors with size and last use
+    mirror_array = []
+    total_size = 0
+    for entry in os.scandir(cache_path):
+        if not entry.is_dir(follow_symlinks=False) or not entry.name.endswith(".git"):
+            continue
+        last_used_path = os.path.join(entry.path, MIRROR_LAST_USED_FILE)
+        try:
+            last_used = os.stat(last_used_path).st_mtime
+        except OSError:
+            last_used = 0.0
+        size = folder_size(entry.path)
+        total_size += size
+        mirror_array.append((last_used, entry.name, entry.path, size))
+
+    # Evict oldest first
+    evicted_array = []
+    for last_used, name, path, size in sorted(mirror_array):
+        if total_size <= max_size:
+            break
+        if keep_after is not None and last_used >= keep_after:
+            continue
+        remove_mirror(path)
+        total_size -= size
+        evicted_array.append(name)
+
+    return evicted_array
+
+def folder_size(path):
+    size = 0
+    for root, dirs, files in os.walk(path):
+        for file in files:
+            try:
+                size += os.lstat(os.path.join(root, file)).st_size
+            except OSError:
+                pass
+    return size
+
+def remove_mirror(path):
+    # Git marks object files read-only, remove_tree makes them writable before removal
+    if os.path.exists(path):
+        remove_tree(path)
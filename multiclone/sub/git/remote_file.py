@@ -0,0 +1,61 @@
+import shutil
+import subprocess
+import tempfile
+
+from multiclone.sub.git.command import git_run
+from multiclone.sub.git.sync import build_sync_ref
+
+def git_read_remote_file(url, file_path, branch=None, commit=None, mirror=None):
+    """
+    Read a single file of a remote repository version without cloning it.
+    Only the commit and its trees are fetched (blob-less), the file content is then fetched on its own.
+    If a mirror is provided the file is read from the mirror instead, which needs no network access.
+
+    Args:
+        url (str): The URL of the Git repository.
+        file_path (str): Path of the file relative to the repository root, using "/" as separator.
+        branch (str, optional, default = None): The branch to read from (ignored if commit is specified).
+        commit (str, optional, default = None): The commit hash to read from (takes precedence over branch).
+        mirror (str, optional, default = None): Path to a local bare mirror of url.
+
+    Returns:
+        str: Content of the file or None if the file does not exist in the requested version.
+
+    Raises:
+        subprocess.CalledProcessError: If the requested version could not be fetched.
+    """
+    if mirror is not None:
+        revision = commit if commit is not None else build_sync_ref(branch)
+        return read_file(mirror, revision, file_path)
+
+    temporary_path = tempfile.mkdtemp(prefix="multiclone-resolve-")
+    try:
+        git_run(['git', 'init', '--bare', '--quiet', temporary_path])
+        git_run(['git', 'remote', 'add', 'origin', url], cwd=temporary_path)
+        # Mark origin as promisor so missing blobs are fetched on demand
+        git_run(['git', 'config', 'remote.origin.promisor', 'true'], cwd=temporary_path)
+        git_run(['git', 'config', 'remote.origin.partialclonefilter', 'blob:none'], cwd=temporary_path)
+
+        ref = commit if commit is not None else build_sync_ref(branch)
+        try:
+            git_run(['git', 'fetch', '--quiet', '--no-tags', '--depth', '1', '--filter=blob:none', 'origin', ref],
+                    cwd=temporary_path)
+            revision = 'FETCH_HEAD'
+        except subprocess.CalledProcessError:
+            if commit is None:
+                raise
+            # Server refused the commit (abbreviated or not advertised), fetch commit history only and look it up
+            git_run(['git', 'fetch', '--quiet', '--tags', '--filter=tree:0', 'origin',
+                     '+refs/heads/*:refs/remotes/origin/*'], cwd=temporary_path)
+            revision = commit
+
+        return read_file(temporary_path, revision, file_path)
+    finally:
+        shutil.rmtree(temporary_path, ignore_errors=True)
+
+def read_file(git_dir, revision, file_path):
+    tree_entry = git_run(['git', '--git-dir', git_dir, 'ls-tree', revision, '--', file_path]).stdout
+    if not tree_entry.strip():
+        return None
+    content = git_run(['git', '--git-dir', git_dir, 'show', f"{revision}:{file_path}"]).stdout
+    return content.decode("utf-8", errors="replace")
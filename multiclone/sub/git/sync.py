@@ -0,0 +1,158 @@
+import subprocess
+
+from collections import namedtuple
+
+from multiclone.sub.git.clone import git_fetch_commit
+from multiclone.sub.git.clone import git_sparse_checkout
+from multiclone.sub.git.command import git_run
+from multiclone.sub.git.command import log_line
+from multiclone.sub.git.command import log_process_error
+
+# Define named tuple type
+sync_result = namedtuple("sync_result", ["status", "skipped"])
+
+def git_sync(path, depth=1, branch=None, commit=None, log=None, mirror=None, filter_spec=None, sparse=None):
+    """
+    Update an existing clone to the requested version by fetching only that version and hard resetting to it.
+    Clean repositories already at the requested version are skipped, their sparse-checkout and filter are still
+    updated.
+
+    Args:
+        path (str): Path to the existing repository.
+        depth (int, optional, default = 1): The depth of the fetch (number of commits to include).
+        branch (str, optional, default = None): The branch to sync to (ignored if commit is specified).
+        commit (str, optional, default = None): The commit hash to sync to (takes precedence over branch).
+        log (str array, optional, default = None): Collects output lines instead of printing them.
+        mirror (str, optional, default = None): Path to a local bare mirror to fetch from instead of origin.
+        filter_spec (str, optional, default = None): Partial clone filter, for example "blob:none". Set for later
+            fetches, objects that are already present are kept.
+        sparse (str array, optional, default = None): Folders to materialize using a cone mode sparse-checkout.
+            An existing sparse-checkout is disabled if None.
+
+    Returns:
+        sync_result:
+          status (boolean): True if the repository is at the requested version, False otherwise.
+          skipped (boolean): True if the repository was already at the requested version.
+    """
+    source = mirror if mirror is not None else 'origin'
+
+    try:
+        head = git_output(['git', 'rev-parse', 'HEAD'], path)
+        clean = not git_output(['git', 'status', '--porcelain', '--untracked-files=no'], path)
+        if clean:
+            git_sync_checkout_options(path, filter_spec, sparse)
+
+        # Resolve target and skip if already there
+        if commit is not None:
+            if clean and head.startswith(commit.lower()):
+                return sync_result(status=True, skipped=True)
+            ref = commit
+        else:
+            ref = build_sync_ref(branch)
+            if clean and ls_remote_commit(source, ref, path) == head:
+                return sync_result(status=True, skipped=True)
+
+        # Fetch requested version only
+        if commit is not None:
+            git_fetch_commit(path, source, commit, depth, log=log, filter_spec=filter_spec)
+        else:
+            command = ['git', 'fetch', '--no-tags']
+            if depth is not None:
+                command.extend(['--depth', str(depth)])
+            if filter_spec is not None:
+                command.append(f"--filter={filter_spec}")
+            command.extend([source, ref])
+            git_run(command, cwd=path)
+
+        # Reset working tree
+        if commit is not None:
+            git_run(['git', 'checkout', '--force', '--detach', commit], cwd=path)
+        elif branch is not None and not branch.startswith("tags/"):
+            git_run(['git', 'checkout', '--force', '-B', branch, 'FETCH_HEAD'], cwd=path)
+        elif branch is None:
+            git_run(['git', 'reset', '--hard', 'FETCH_HEAD'], cwd=path)
+        else:
+            git_run(['git', 'checkout', '--force', '--detach', 'FETCH_HEAD'], cwd=path)
+        if not clean:
+            git_sync_checkout_options(path, filter_spec, sparse)
+        return sync_result(status=True, skipped=False)
+    except subprocess.CalledProcessError as e:
+        log_line(log, f"    Sync failed for: {path}")
+        log_process_error(log, e)
+        return sync_result(status=False, skipped=False)
+
+def git_sync_checkout_options(path, filter_spec=None, sparse=None):
+    """
+    Apply the partial clone filter and sparse-checkout of a repository request to an existing clone.
+
+    Args:
+        path (str): Path to the existing repository.
+        filter_spec (str, optional, default = None): Partial clone filter, for example "blob:none".
+        sparse (str array, optional, default = None): Folders to materialize, None to disable the sparse-checkout.
+
+    Raises:
+        subprocess.CalledProcessError: If a setting could not be applied.
+    """
+    if filter_spec is not None:
+        # Mark origin as promisor so filtered objects are fetched on demand
+        git_run(['git', 'config', 'remote.origin.promisor', 'true'], cwd=path)
+        git_run(['git', 'config', 'remote.origin.partialclonefilter', filter_spec], cwd=path)
+    if sparse:
+        git_sparse_checkout(path, sparse)
+    elif git_config_value('core.sparseCheckout', path) == "true":
+        git_run(['git', 'sparse-checkout', 'disable'], cwd=path)
+
+def git_config_value(key, path):
+    """
+    Get a config value of a repository.
+
+    Args:
+        key (str): The config key.
+        path (str): Path to the repository.
+
+    Returns:
+        str: The value or None if the key is not set.
+    """
+    try:
+        return git_output(['git', 'config', '--get', key], path)
+    except subprocess.CalledProcessError:
+        return None
+
+def build_sync_ref(branch):
+    """
+    Build the remote ref to sync to from a branch argument.
+
+    Args:
+        branch (str): Branch name, "tags/" prefixed tag name or None for the remote default branch.
+
+    Returns:
+        str: The full remote ref.
+    """
+    if branch is None:
+        return "HEAD"
+    if branch.startswith("tags/"):
+        return f"refs/{branch}"
+    return f"refs/heads/{branch}"
+
+def ls_remote_commit(source, ref, path):
+    """
+    Get the commit a remote ref points to without fetching. Annotated tags are peeled to their commit.
+
+    Args:
+        source (str): Remote name, URL or path to query.
+        ref (str): The full remote ref.
+        path (str): Path to the repository the command is run in.
+
+    Returns:
+        str: The commit hash or None if the ref was not found.
+    """
+    output = git_output(['git', 'ls-remote', source, ref, f"{ref}^{{}}"], path)
+    commit_map = {}
+    for line in output.splitlines():
+        line_parts = line.split()
+        if len(line_parts) == 2:
+            commit_map[line_parts[1]] = line_parts[0]
+    return commit_map.get(f"{ref}^{{}}", commit_map.get(ref))
+
+def git_output(command, path):
+    return git_run(command, cwd=path).stdout.decode("utf-8", errors="replace").strip()
@@ -1,4 +1,7 @@
 import os
+import threading
+
+from multiclone.sub.action_plan import parse_action_arguments
 
 # Global object to hold variables
 class GlobalVariables:
@@ -10,6 +13,7 @@ class GlobalVariables:
         self.path_main_directory = os.path.dirname(self.path_main_script)
 
         # Execution variables - Path and names
+        self.path_workspace = None
         self.path_main = None
         self.path_source = None
         self.path_array = []
@@ -18,20 +22,63 @@ class GlobalVariables:
         # Execution variables - Config
         self.force = None
 
-        # Post clone action variables
-        self.action_repo_path = None
-        self.action_repo_name = None
-        self.action_data = None
-        self.action_log = []
-        self.action_variable_map = {}
+        # Post clone action variables, held per thread so actions of different repositories can run concurrently
+        self.action_state = threading.local()
+
+    # Post clone action variables
+    def pca_state(self):
+        state = self.action_state
+        if not hasattr(state, "repo_path"):
+            state.repo_path = None
+            state.repo_name = None
+            state.data = None
+            state.arguments = None
+            state.log = []
+            state.report = []
+            state.variable_map = {}
+        return state
+
+    @property
+    def action_repo_path(self):
+        return self.pca_state().repo_path
+
+    @property
+    def action_repo_name(self):
+        return self.pca_state().repo_name
+
+    @property
+    def action_data(self):
+        return self.pca_state().data
+
+    @property
+    def action_arguments(self):
+        state = self.pca_state()
+        if state.arguments is None:
+            state.arguments = parse_action_arguments(state.data)  # Actions not run from a compiled plan
+        return state.arguments
+
+    @property
+    def action_log(self):
+        return self.pca_state().log
+
+    @property
+    def action_report(self):
+        return self.pca_state().report
+
+    @property
+    def action_variable_map(self):
+        return self.pca_state().variable_map
 
     # Post clone action (pca) methods
-    def pca_initialize(self, repo_path, action_data=None):
-        self.action_repo_path = repo_path
-        self.action_repo_name = os.path.basename(repo_path)
-        self.action_data = action_data
-        self.action_log = []
-        self.action_variable_map = {}
+    def pca_initialize(self, repo_path, action_data=None, action_arguments=None):
+        state = self.pca_state()
+        state.repo_path = repo_path
+        state.repo_name = os.path.basename(repo_path)
+        state.data = action_data
+        state.arguments = action_arguments
+        state.log = []
+        state.report = []
+        state.variable_map = {}
 
     def pca_variable_add(self, name, value):
         self.action_variable_map[name] = value
@@ -42,6 +89,10 @@ class GlobalVariables:
     def pca_log_add(self, log_value):
         self.action_log.append(log_value)
 
+    def pca_report_add(self, report_value):
+        # Unlike the log, which is only shown on failure, the report is always shown
+        self.action_report.append(report_value)
+
     def populate_paths(self, paths):
         self.path_array = []
         self.repo_name_array = []
@@ -49,6 +100,10 @@ class GlobalVariables:
             self.path_array.append(path)
             self.repo_name_array.append(os.path.basename(path))
 
+    def populate_path_append(self, path):
+        self.path_array.append(path)
+        self.repo_name_array.append(os.path.basename(path))
+
 
 # Create an instance of the GlobalVariables class
 globals_object = GlobalVariables()
\ No newline at end of file
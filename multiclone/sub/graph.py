@@ -0,0 +1,143 @@
+# Imports
+import heapq
+
+from multiclone.sub.clone_url import normalize_url
+
+########################################################################################################################
+# Dependency graph #####################################################################################################
+########################################################################################################################
+
+
+class DependencyNode:
+    """
+    A repository in the dependency graph.
+
+    Attributes:
+        key (str): The normalized URL of the repository.
+        index (int): Index of the repository in the clone_info_list the graph indexes.
+        requester_key (str): Key of the repository that first requested this one, None for requested repositories.
+        dependency_keys (str array): Keys of the dependencies of this repository in ".dependencies"-order.
+        constraints (array): Version constraints on this repository, one per request in request order. Each has a
+            requester attribute holding the key of the requesting repository (None if requested directly).
+    """
+
+    def __init__(self, key, index, requester_key=None):
+        self.key = key
+        self.index = index
+        self.requester_key = requester_key
+        self.dependency_keys = []
+        self.constraints = []
+
+
+class DependencyGraph:
+    """
+    Dependency graph keyed by normalized URL, so every repository is found in constant time and added exactly once
+    however many times and however it is referenced (for example with and without ".git").
+    """
+
+    def __init__(self):
+        self.node_map = {}
+
+    def __contains__(self, url):
+        return normalize_url(url) in self.node_map
+
+    def __len__(self):
+        return len(self.node_map)
+
+    def get(self, url):
+        """
+        Get the node of a repository.
+
+        Args:
+            url (str): The URL of the repository in any spelling.
+
+        Returns:
+            DependencyNode: The node or None if the repository is not in the graph.
+        """
+        return self.node_map.get(normalize_url(url))
+
+    def add(self, url, index, requester_url=None):
+        """
+        Add a repository unless already present and record the edge from its requester.
+
+        Args:
+            url (str): The URL of the repository.
+            index (int): Index the repository will have in the clone_info_list if it is new.
+            requester_url (str, optional, default = None): URL of the repository listing this one as dependency.
+
+        Returns:
+            tuple: The node and True if it was added, False if it was already present.
+        """
+        key = normalize_url(url)
+        requester_key = normalize_url(requester_url) if requester_url is not None else None
+
+        # Record edge
+        if requester_key is not None and requester_key != key and requester_key in self.node_map:
+            requester_node = self.node_map[requester_key]
+            if key not in requester_node.dependency_keys:
+                requester_node.dependency_keys.append(key)
+
+        if key in self.node_map:
+            return self.node_map[key], False
+        node = DependencyNode(key, index, requester_key)
+        self.node_map[key] = node
+        return node, True
+
+    def reachable_keys(self, root_key_array):
+        """
+        Get the keys of the provided repositories and all their transitive dependencies. Dependency cycles are handled.
+
+        Args:
+            root_key_array (str array): Keys of the repositories to start from.
+
+        Returns:
+            set: Keys of the reachable repositories.
+        """
+        reachable_key_set = set()
+        pending_key_array = list(root_key_array)
+        while pending_key_array:
+            key = pending_key_array.pop()
+            if key in reachable_key_set or key not in self.node_map:
+                continue
+            reachable_key_set.add(key)
+            pending_key_array.extend(self.node_map[key].dependency_keys)
+        return reachable_key_set
+
+    def order_map(self):
+        """
+        Get the position of every repository in graph order, the order a depth-first walk from the requested
+        repositories in request order and ".dependencies"-order visits them. A repository listed by several
+        repositories gets its first position. Unlike the index, the position does not depend on the order clones finish.
+
+        Returns:
+            dict: Key -> position (int tuple, compared element by element), for repositories reachable from the
+                requested repositories.
+        """
+        order_map = {}
+        pending_array = [((node.index,), key) for key, node in self.node_map.items() if node.requester_key is None]
+        heapq.heapify(pending_array)
+        while pending_array:
+            order, key = heapq.heappop(pending_array)
+            if key in order_map:
+                continue
+            order_map[key] = order
+            for line, dependency_key in enumerate(self.node_map[key].dependency_keys):
+                if dependency_key in self.node_map and dependency_key not in order_map:
+                    heapq.heappush(pending_array, (order + (line,), dependency_key))
+        return order_map
+
+    def remove(self, key):
+        """
+        Remove a repository, its edges and the version constraints it placed on its dependencies.
+
+        Args:
+            key (str): The key of the repository.
+        """
+        node = self.node_map.pop(key, None)
+        if node is None:
+            return
+        for other_node in self.node_map.values():
+            if key in other_node.dependency_keys:
+                other_node.dependency_keys.remove(key)
+            other_node.constraints = [constraint for constraint in other_node.constraints
+                                      if constraint.requester != key]
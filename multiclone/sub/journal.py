@@ -0,0 +1,94 @@
+# System imports
+import json
+import os
+import threading
+import time
+
+# Journal location, relative to the workspace root
+JOURNAL_FOLDER = ".multiclone"
+JOURNAL_FILE = "journal.jsonl"
+
+# Journal events
+JOURNAL_RUN = "run"  # A new run started
+JOURNAL_RESUME = "resume"  # An interrupted run is continued
+JOURNAL_CLONE = "clone"  # A repository was cloned (or found unchanged)
+JOURNAL_ACTION = "action"  # A post clone action line was run
+JOURNAL_DONE = "done"  # The run completed
+
+########################################################################################################################
+# Journal ##############################################################################################################
+########################################################################################################################
+
+
+class RunJournal:
+    """
+    Append-only journal of the current run in "<workspace>/.multiclone/journal.jsonl", one JSON event per line.
+    Every event is flushed to the operating system before the call returns, so the journal tells what was finished
+    when a run is killed. The journal is synced to disk once, by finish. A new run replaces the journal, a resumed run
+    appends to the journal of the interrupted run.
+    """
+
+    def __init__(self, workspace_path):
+        self.path = os.path.join(workspace_path, JOURNAL_FOLDER, JOURNAL_FILE)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.file = None
+        self.lock = threading.Lock()
+
+    def read_interrupted(self):
+        """
+        Read the events of the journaled run if it did not complete.
+
+        Returns:
+            dict array: The clone and action events, None if there is no journal or the run completed.
+        """
+        try:
+            with open(self.path, 'r') as file:
+                line_array = file.read().splitlines()
+        except OSError:
+            return None
+
+        event_array = []
+        for line in line_array:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue  # Last line cut short by the interruption
+            if event.get("event") == JOURNAL_RUN:
+                event_array = []
+            elif event.get("event") == JOURNAL_DONE:
+                return None
+            elif event.get("event") in (JOURNAL_CLONE, JOURNAL_ACTION):
+                event_array.append(event)
+        return event_array if line_array else None
+
+    def start(self, resume=False):
+        """
+        Open the journal for this run.
+
+        Args:
+            resume (boolean, optional, default = False): Append to the journal of an interrupted run instead of
+                replacing it.
+        """
+        with self.lock:
+            self.file = open(self.path, 'a' if resume else 'w')
+        self.append(JOURNAL_RESUME if resume else JOURNAL_RUN, pid=os.getpid())
+
+    def append(self, event, **value_map):
+        line = json.dumps(dict(event=event, time=time.time(), **value_map))
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def finish(self):
+        self.append(JOURNAL_DONE)
+        self.close()
+
+    def close(self):
+        # Sync and close without marking the run done, so it can be resumed
+        with self.lock:
+            if self.file is not None:
+                os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = None
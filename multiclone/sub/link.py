@@ -1,64 +1,322 @@
 # Imports
+import errno
+import hashlib
+import json
 import os
-import subprocess
 import platform
+import shutil
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Not available on Windows
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from multiclone.sub import fs
 from multiclone.sub.globals import globals_object
 from multiclone.sub.path import delete_junction_if_force
 
+# Define named tuple type
+link_result = namedtuple("link_result", ["linked", "skipped", "removed", "failed", "mode_count_map"])
+
+# Folder of the link manifests, relative to the workspace root
+LINK_MANIFEST_FOLDER = os.path.join(".multiclone", "links")
+
+# Replication modes in fallback order
+LINK_MODE_HARDLINK = "hardlink"
+LINK_MODE_REFLINK = "reflink"
+LINK_MODE_COPY = "copy"
+LINK_MODE_ARRAY = (LINK_MODE_HARDLINK, LINK_MODE_REFLINK, LINK_MODE_COPY)
+
+# Errors meaning the file system does not support a mode, the next mode is tried
+LINK_FALLBACK_ERRNO_SET = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EOPNOTSUPP, errno.EINVAL,
+                           getattr(errno, "ENOTSUP", errno.EOPNOTSUPP), getattr(errno, "ENOTTY", errno.EINVAL)}
+
+# Linux FICLONE ioctl request number
+FICLONE = 0x40049409
+
 ########################################################################################################################
 # recreate_linked_folder_structure #####################################################################################
 ########################################################################################################################
 
-def recreate_linked_folder_structure(path_source, path_target, exclusions=None):
+def recreate_linked_folder_structure(path_source, path_target, exclusions=None, workers=None, mode=LINK_MODE_HARDLINK):
+    """
+    Recreate the folder structure of path_source at path_target, replicating every file with the requested mode.
+    Names in exclusions and names starting with "_" or "." are skipped. Existing targets that already are hard links
+    to the source file are kept (hardlink mode), other existing targets are replaced if force is set and kept
+    otherwise.
+
+    Modes, falling back to the next mode where the file system does not support a mode:
+        hardlink: Hard link, no copying but the target shares the file with the source repository.
+        reflink: Copy-on-write clone (FICLONE, for example btrfs and XFS), no copying and isolated from the source.
+        copy: Full copy.
+
+    The files replicated are recorded in a manifest in "<workspace>/.multiclone/links" (one per source and target),
+    so a later run only applies the differences: new files are replicated, files changed in the source are replicated
+    again and files removed from the source are deleted. Only targets still being the file recorded in the manifest
+    are replaced or deleted.
+
+    Args:
+        path_source (str): The folder to replicate.
+        path_target (str): The folder to replicate into.
+        exclusions (str array, optional, default = None): File and folder names to skip.
+        workers (int, optional, default = None): Number of files replicated at the same time, ThreadPoolExecutor
+            default if None.
+        mode (str, optional, default = "hardlink"): The replication mode, see above.
+
+    Returns:
+        link_result:
+          linked (int): Number of files replicated.
+          skipped (int): Number of existing targets kept.
+          removed (int): Number of stale files removed.
+          failed (tuple array): (target path, error) of every file that could not be replicated or removed.
+          mode_count_map (dict): Mode -> number of files replicated with that mode.
+
+    Raises:
+        ValueError: If path_source does not exist or mode is not supported.
+    """
     if not os.path.exists(path_source):
         raise ValueError("Source path does not exist.")
+    if mode not in LINK_MODE_ARRAY:
+        raise ValueError(f"Link mode not supported: {mode}")
 
     force = globals_object.force
 
     if exclusions is None:
         exclusions = set()
+    exclusions = set(exclusions)
 
-    for root, dirs, files in os.walk(path_source, topdown=True):
-        # Exclude directories from traversal
-        dirs[:] = [d for d in dirs if
-                   os.path.basename(d) not in exclusions and not os.path.basename(d).startswith(("_", "."))]
-
-        # Create corresponding directories in target path
-        for directory in dirs:
-            source_dir = os.path.join(root, directory)
-            target_dir = os.path.join(path_target, os.path.relpath(source_dir, path_source))
-            os.makedirs(target_dir, exist_ok=True)
-
-        # Link files from source to target path
-        for file in files:
-            source_file = os.path.join(root, file)
-            target_file = os.path.join(path_target, os.path.relpath(source_file, path_source))
-            if os.path.basename(target_file) in exclusions or os.path.basename(target_file).startswith(("_", ".")):
-                continue
-            if force and os.path.exists(target_file):
-                os.remove(target_file)
-            elif os.path.exists(target_file):
+    os.makedirs(path_target, exist_ok=True)
+    manifest_path = build_manifest_path(path_source, path_target)
+    manifest_map = read_manifest(manifest_path)
+
+    # Create folders and collect files, directory entries are reused for replication
+    file_array = []
+    pending_array = [(path_source, path_target, "")]
+    while pending_array:
+        source_dir, target_dir, relative_dir = pending_array.pop()
+        with os.scandir(source_dir) as entry_iterator:
+            for entry in entry_iterator:
+                if entry.name in exclusions or entry.name.startswith(("_", ".")):
+                    continue
+                target = os.path.join(target_dir, entry.name)
+                relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                if entry.is_dir():
+                    os.makedirs(target, exist_ok=True)
+                    if not entry.is_symlink():  # Linked folders are created, not traversed
+                        pending_array.append((entry.path, target, relative_path))
+                else:
+                    file_array.append((entry, target, manifest_map.get(relative_path), relative_path))
+
+    # Replicate files, a mode found unsupported is not tried again for later files
+    linked = 0
+    skipped = 0
+    failed = []
+    owned_map = {}
+    mode_count_map = {}
+    fallback_map = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for (entry, target, _, relative_path), (status, error, manifest_entry) in zip(
+                file_array, executor.map(link_file, file_array, [force] * len(file_array),
+                                         [mode] * len(file_array), [fallback_map] * len(file_array))):
+            if status == "failed":
+                failed.append((target, error))
                 continue
-            os.link(source_file, target_file)
+            if status == "linked":
+                linked += 1
+                mode_count_map[manifest_entry["used"]] = mode_count_map.get(manifest_entry["used"], 0) + 1
+            else:
+                skipped += 1
+            if manifest_entry is not None:
+                owned_map[relative_path] = manifest_entry
+
+    # Remove stale files we own
+    removed = 0
+    for relative_path, manifest_entry in manifest_map.items():
+        if relative_path in owned_map:
+            continue
+        target = os.path.join(path_target, *relative_path.split("/"))
+        try:
+            target_stat = os.lstat(target)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            failed.append((target, e))
+            continue
+        if [target_stat.st_ino, target_stat.st_dev] != manifest_entry["target"]:
+            continue  # Replaced by someone else, not ours anymore
+        try:
+            os.remove(target)
+            removed += 1
+            remove_empty_folders(os.path.dirname(target), path_target)
+        except OSError as e:
+            failed.append((target, e))
+            owned_map[relative_path] = manifest_entry  # Still ours, retried next run
+
+    write_manifest(manifest_path, path_source, path_target, owned_map)
+    return link_result(linked=linked, skipped=skipped, removed=removed, failed=failed, mode_count_map=mode_count_map)
+
+
+def link_file(file_element, force, mode, fallback_map):
+    """
+    Replicate one file, returning the status, the error if failed and the manifest entry of the target if the target
+    is ours (None if an existing target was kept).
+    """
+    entry, target, manifest_entry, _ = file_element
+    try:
+        source_stat = entry.stat()
+        source_key = [source_stat.st_ino, source_stat.st_dev, source_stat.st_size, source_stat.st_mtime_ns]
+        try:
+            target_stat = os.lstat(target)
+        except FileNotFoundError:
+            target_stat = None
+
+        if target_stat is not None:
+            target_key = [target_stat.st_ino, target_stat.st_dev]
+            if mode == LINK_MODE_HARDLINK and target_key == source_key[:2]:
+                # Already linked
+                return "skipped", None, {"target": target_key, "source": source_key, "mode": mode,
+                                         "used": LINK_MODE_HARDLINK}
+            owned = manifest_entry is not None and target_key == manifest_entry["target"]
+            if owned and manifest_entry["mode"] == mode and manifest_entry["source"] == source_key:
+                return "skipped", None, manifest_entry  # Unchanged since replicated
+            if not owned and not force and target_key != source_key[:2]:
+                return "skipped", None, None  # Not ours, kept
+            os.remove(target)
+
+        used_mode = replicate_file(entry.path, target, fallback_map.get(mode, mode), fallback_map, mode)
+        target_stat = os.lstat(target)
+        return "linked", None, {"target": [target_stat.st_ino, target_stat.st_dev], "source": source_key,
+                                "mode": mode, "used": used_mode}
+    except OSError as e:
+        return "failed", e, None
+
+
+def replicate_file(source_path, target_path, mode, fallback_map=None, requested_mode=None):
+    """
+    Replicate a file with the mode, falling back to the next mode (hardlink, reflink, copy) if the file system does
+    not support the mode.
+
+    Args:
+        source_path (str): The file to replicate.
+        target_path (str): The path to create, must not exist.
+        mode (str): The mode to try first.
+        fallback_map (dict, optional, default = None): Updated with requested mode -> supported mode on fallback.
+        requested_mode (str, optional, default = None): Key used in fallback_map, mode if None.
+
+    Returns:
+        str: The mode used.
+
+    Raises:
+        OSError: If the file could not be replicated.
+    """
+    requested_mode = requested_mode if requested_mode is not None else mode
+    for try_mode in LINK_MODE_ARRAY[LINK_MODE_ARRAY.index(mode):]:
+        try:
+            if try_mode == LINK_MODE_HARDLINK:
+                os.link(source_path, target_path)
+            elif try_mode == LINK_MODE_REFLINK:
+                reflink_file(source_path, target_path)
+            else:
+                shutil.copy2(source_path, target_path)
+            return try_mode
+        except OSError as e:
+            if try_mode == LINK_MODE_COPY or e.errno not in LINK_FALLBACK_ERRNO_SET:
+                raise
+            if fallback_map is not None:
+                next_mode = LINK_MODE_ARRAY[LINK_MODE_ARRAY.index(try_mode) + 1]
+                fallback_map[requested_mode] = next_mode
+
+
+def reflink_file(source_path, target_path):
+    # Copy-on-write clone using the FICLONE ioctl (Linux only)
+    if fcntl is None or not hasattr(fcntl, "ioctl") or platform.system() != 'Linux':
+        raise OSError(errno.EOPNOTSUPP, "Reflink not supported on this platform", target_path)
+    with open(source_path, 'rb') as source_file:
+        with open(target_path, 'wb') as target_file:
+            try:
+                fcntl.ioctl(target_file.fileno(), FICLONE, source_file.fileno())
+            except OSError:
+                target_file.close()
+                os.remove(target_path)
+                raise
+    shutil.copystat(source_path, target_path)
+
+
+def build_manifest_path(path_source, path_target):
+    """
+    Get the path of the link manifest of a source and target, in the workspace of the run (the working directory if
+    no run populated the workspace path).
+
+    Args:
+        path_source (str): The replicated folder.
+        path_target (str): The folder replicated into.
+
+    Returns:
+        str: The manifest path.
+    """
+    path_workspace = globals_object.path_workspace if globals_object.path_workspace is not None else os.getcwd()
+    link_key = f"{os.path.abspath(path_source)}\n{os.path.abspath(path_target)}"
+    link_hash = hashlib.sha1(link_key.encode("utf-8")).hexdigest()
+    return os.path.join(path_workspace, LINK_MANIFEST_FOLDER, f"{link_hash}.json")
+
+
+def read_manifest(manifest_path):
+    """
+    Read a link manifest.
+
+    Args:
+        manifest_path (str): Path to the manifest.
+
+    Returns:
+        dict: Relative path ("/" separated) -> manifest entry of the target:
+          target ([int, int]): [inode, device] of the target.
+          source ([int, int, int, int]): [inode, device, size, mtime_ns] of the source when replicated.
+          mode (str): The mode requested.
+          used (str): The mode used.
+        Empty if missing or unreadable.
+    """
+    try:
+        with open(manifest_path, 'r', encoding="utf-8") as file:
+            manifest = json.load(file)
+        return dict(manifest["links"])
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return {}
+
+
+def write_manifest(manifest_path, path_source, path_target, owned_map):
+    # Write to a temporary file first so an interrupted run never leaves a partial manifest
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    temporary_path = f"{manifest_path}.partial"
+    with open(temporary_path, 'w', encoding="utf-8") as file:
+        json.dump({"source": os.path.abspath(path_source), "target": os.path.abspath(path_target),
+                   "links": owned_map}, file)
+    os.replace(temporary_path, manifest_path)
+
+
+def remove_empty_folders(path, path_root):
+    # Remove folders emptied by stale link removal, up to but not including path_root
+    path_root = os.path.abspath(path_root)
+    path = os.path.abspath(path)
+    while path != path_root and path.startswith(os.path.join(path_root, "")):
+        try:
+            os.rmdir(path)
+        except OSError:
+            return
+        path = os.path.dirname(path)
 
 ########################################################################################################################
 # create_folder_junction ###############################################################################################
 ########################################################################################################################
 
-# Use "except (subprocess.CalledProcessError, OSError) as e:" to catch errors from this.
+# Use "except OSError as e:" to catch errors from this.
 def create_folder_junction(target_path, source_path):
     delete_junction_if_force(target_path)  # Remove target if needed and requested
 
     if os.path.exists(target_path):
         return True
 
-    if platform.system() == 'Windows':
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        subprocess.run(["cmd.exe", "/c", "mklink", "/j", target_path, source_path], check=True,
-                       startupinfo=startupinfo, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    else:
-        # Other platforms
-        os.symlink(source_path, target_path)
+    fs.create_link(target_path, source_path)  # Junction on Windows, symbolic link on other platforms
     return True
@@ -1,44 +1,32 @@
 # Imports
 import os
-import subprocess
 
+from multiclone.sub import fs
 from multiclone.sub.globals import globals_object
 
 def folder_is_junction(path):
-    if not os.path.exists(path):
-        return False
-
-    try:
-        output = subprocess.check_output(['cmd', '/c', 'fsutil', 'reparsepoint', 'query', path], universal_newlines=True)
-        is_junction = "Tag value: Mount Point" in output
-        return is_junction
-    except subprocess.CalledProcessError:
-        return False
+    return fs.is_link(path)
 
 def create_folder(path):
     try:
         os.makedirs(path, exist_ok=True)
         return True
-    except subprocess.CalledProcessError as e:
+    except OSError as e:
         return False
 
 def delete_junction_if_force(path):
-    if os.path.exists(path) and globals_object.force and folder_is_junction(path):
+    if globals_object.force and folder_is_junction(path):
         try:
-            # Removal using rmdir
-            command = ["rmdir", path, "/s", "/q"]
-            subprocess.run(command, shell=True)
-        except subprocess.CalledProcessError as e:
+            fs.remove_link(path)
+        except OSError as e:
             return False
     return True
 
 def delete_folder_if_force(path):
-    if os.path.exists(path) and globals_object.force:
+    if globals_object.force and fs.path_exists(path):
         try:
-            # Removal using rmdir
-            command = ["rmdir", path, "/s", "/q"]
-            subprocess.run(command, shell=True)
-        except subprocess.CalledProcessError as e:
+            fs.remove_tree(path)
+        except OSError as e:
             return False
     return True
 
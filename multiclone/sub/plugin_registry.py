@@ -0,0 +1,231 @@
+# System imports
+import ast
+import importlib
+import inspect
+import os
+import sys
+import threading
+
+# Core imports
+from multiclone.sub.globals import globals_object
+from multiclone.sub.trace import trace_span
+
+# Registries built by this process, keyed by default module and resolved plugin folders
+registry_map = {}
+registry_map_lock = threading.Lock()
+
+# Plugin folders already inserted into sys.path
+sys_path_folder_set = set()
+
+########################################################################################################################
+# Registry #############################################################################################################
+########################################################################################################################
+
+
+def get_plugin_registry(default_module, plugin_folders=None):
+    """
+    Get the plugin registry of a set of plugin folders. The registry is built once per process and reused by every
+    later call with the same folders.
+
+    Args:
+        default_module (module): Module holding the default plugins.
+        plugin_folders (str, optional, default = None): Path or path array to folders containing plugin actions.
+            Relative paths are relative to Main, environmental variables are expanded.
+
+    Returns:
+        PluginRegistry: The registry.
+    """
+    folder_array = resolve_plugin_folders(plugin_folders)
+    registry_key = (default_module.__name__, tuple(folder_array))
+    with registry_map_lock:
+        if registry_key not in registry_map:
+            with trace_span("scan plugins", "plugin", folders=folder_array):
+                registry_map[registry_key] = PluginRegistry(default_module, folder_array)
+        return registry_map[registry_key]
+
+
+def resolve_plugin_folders(plugin_folders=None):
+    """
+    Resolve plugin folders to the absolute paths of the existing folders, duplicates removed.
+
+    Args:
+        plugin_folders (str, optional, default = None): Path or path array to folders containing plugin actions.
+
+    Returns:
+        str array: Absolute folder paths in provided order.
+    """
+    # Parse plugin_folders
+    if plugin_folders is None:
+        plugin_folders = []
+    elif isinstance(plugin_folders, str):
+        plugin_folders = [plugin_folders]
+    elif isinstance(plugin_folders, (list, tuple)):
+        pass  # plugin_folders is already a list
+    else:
+        # Handle the case when plugin_folders is neither a string nor a list
+        raise ValueError("plugin_folders should be a string or a list of strings")
+
+    folder_array = []
+    for folder in plugin_folders:
+        # Handle environmental variables in path
+        try:
+            expanded_folder = os.path.expandvars(folder)
+        except TypeError:
+            expanded_folder = folder
+
+        # Append to main if relative path
+        if not os.path.isabs(expanded_folder):
+            target_path = os.path.join(globals_object.path_main, expanded_folder)
+        else:
+            target_path = expanded_folder
+        target_path = os.path.abspath(target_path)
+
+        if os.path.isdir(target_path) and target_path not in folder_array:
+            folder_array.append(target_path)
+    return folder_array
+
+
+class PluginRegistry:
+    """
+    Map of plugin name to plugin object. Plugins are found by scanning the source of the plugin modules for classes
+    defining an action method, without importing the modules or instantiating the classes. A plugin module is imported,
+    and its plugin instantiated, the first time an action names it. Later folders take precedence over earlier folders,
+    all folders take precedence over the default plugins.
+
+    Classes inheriting from a base class the scan can not follow (for example imported from another module) are
+    candidates: the first time an action names one, its module is imported to check if the class has an action method.
+    """
+
+    def __init__(self, default_module, folder_array):
+        self.default_module = default_module
+        self.folder_array = folder_array
+        self.module_name_map = {}  # Plugin name -> module name
+        self.plugin_object_map = {}  # Plugin name -> plugin object
+        self.candidate_module_map = {}  # Class name -> module name, for classes not known to define action
+        self.lock = threading.Lock()
+
+        # Default plugins, the module is already imported
+        for name, obj in inspect.getmembers(default_module, inspect.isclass):
+            if obj.__module__ == default_module.__name__ and callable(getattr(obj, "action", None)):
+                self.module_name_map[name] = default_module.__name__
+
+        # Plugin folders, make importable once and scan
+        for folder in folder_array:
+            if folder not in sys_path_folder_set:
+                sys.path.insert(0, folder)
+                sys_path_folder_set.add(folder)
+            for entry in sorted(os.scandir(folder), key=lambda dir_entry: dir_entry.name):
+                if entry.is_file() and entry.name.endswith(".py"):
+                    module_name = os.path.splitext(entry.name)[0]
+                    action_name_array, candidate_name_array = scan_action_classes(entry.path)
+                    for name in action_name_array:
+                        self.module_name_map[name] = module_name
+                        self.candidate_module_map.pop(name, None)
+                    for name in candidate_name_array:
+                        self.candidate_module_map[name] = module_name
+
+    def __contains__(self, name):
+        with self.lock:
+            self.check_candidate(name)
+            return name in self.module_name_map
+
+    def __getitem__(self, name):
+        """
+        Get a plugin object, importing its module on first use.
+
+        Args:
+            name (str): The plugin name (class name).
+
+        Returns:
+            object: The plugin object.
+
+        Raises:
+            KeyError: If no plugin has the name.
+            ImportError: If the module of the plugin could not be imported.
+        """
+        with self.lock:
+            self.check_candidate(name)
+            if name not in self.plugin_object_map:
+                with trace_span(f"load {name}", "plugin", module=self.module_name_map[name]):
+                    module = importlib.import_module(self.module_name_map[name])
+                    plugin_class = getattr(module, name, None)
+                    if not inspect.isclass(plugin_class) or not callable(getattr(plugin_class, "action", None)):
+                        raise ImportError(f"Plugin {name} not found in module {module.__name__}")
+                    self.plugin_object_map[name] = plugin_class()
+            return self.plugin_object_map[name]
+
+    def names(self):
+        return list(self.module_name_map)
+
+    def check_candidate(self, name):
+        """
+        Import the module of a candidate class to check if it defines action, adding it as plugin if so. A module that
+        fails to import is added, so the import error is reported when the plugin is loaded. Called with lock held.
+
+        Args:
+            name (str): The class name.
+        """
+        module_name = self.candidate_module_map.pop(name, None)
+        if module_name is None:
+            return
+        try:
+            with trace_span(f"check {name}", "plugin", module=module_name):
+                module = importlib.import_module(module_name)
+        except Exception:
+            self.module_name_map[name] = module_name
+            return
+        plugin_class = getattr(module, name, None)
+        if inspect.isclass(plugin_class) and callable(getattr(plugin_class, "action", None)):
+            self.module_name_map[name] = module_name
+
+
+def scan_action_classes(file_path):
+    """
+    Find the top level classes of a Python source file that define an action method, directly or by inheriting from
+    another class of the same file. Classes that do not, but inherit from a base class not defined in the file, are
+    returned as candidates to be checked by importing the module.
+
+    Args:
+        file_path (str): Path to the Python file.
+
+    Returns:
+        tuple: The names of the classes defining action and the names of the candidate classes. Both empty if the file
+            could not be parsed.
+    """
+    try:
+        with open(file_path, 'r', encoding="utf-8") as file:
+            tree = ast.parse(file.read(), filename=file_path)
+    except (OSError, SyntaxError, ValueError):
+        return [], []
+
+    class_node_map = {node.name: node for node in tree.body if isinstance(node, ast.ClassDef)}
+
+    def has_action(class_node, visited_name_set):
+        # True if action is found, None if a base can not be followed, else False
+        visited_name_set.add(class_node.name)
+        for node in class_node.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == "action":
+                return True
+        result = False
+        for base in class_node.bases:
+            if isinstance(base, ast.Name) and base.id in class_node_map:
+                if base.id in visited_name_set:
+                    continue
+                base_result = has_action(class_node_map[base.id], visited_name_set)
+                if base_result:
+                    return True
+                if base_result is None:
+                    result = None
+            elif not (isinstance(base, ast.Name) and base.id == "object"):
+                result = None
+        return result
+
+    action_name_array = []
+    candidate_name_array = []
+    for name, class_node in class_node_map.items():
+        result = has_action(class_node, set())
+        if result:
+            action_name_array.append(name)
+        elif result is None:
+            candidate_name_array.append(name)
+    return action_name_array, candidate_name_array
@@ -1,27 +1,92 @@
 # System imports
-import importlib
-import inspect
+import asyncio
 import os
 import sys
 import subprocess
 
+from concurrent.futures import ThreadPoolExecutor, wait
+from enum import Enum, auto
+
 # Core imports
+from multiclone.sub import fs
 from multiclone.sub.globals import globals_object
+from multiclone.sub.plugin_registry import get_plugin_registry
+from multiclone.sub.action_context import ActionContext
+from multiclone.sub.action_context import run_legacy_action
+from multiclone.sub.action_context import takes_context
+from multiclone.sub.action_plan import ActionPlan
+from multiclone.sub.action_plan import action_step
+from multiclone.sub.action_plan import ACTION_SOURCE_INITIAL
+from multiclone.sub.action_plan import ACTION_SOURCE
+from multiclone.sub.action_plan import ACTION_SOURCE_FINAL
+from multiclone.sub.async_action import AsyncActionRunner
+from multiclone.sub.async_action import ASYNC_LIMIT_DEFAULT
+from multiclone.sub.async_action import is_async_action
+from multiclone.sub.trace import trace_span
 
 # Plugin imports
 from multiclone.sub.path import sanity_check_path
 from multiclone.sub.path import create_folder
 from multiclone.sub.link import recreate_linked_folder_structure
+from multiclone.sub.link import LINK_MODE_ARRAY
+from multiclone.sub.link import LINK_MODE_HARDLINK
 from multiclone.sub.path import load_dependency_repo_names_from_file
 from multiclone.sub.link import create_folder_junction
 from multiclone.sub.path import delete_junction_if_force
 
+class StageOrder(Enum):
+    GLOBAL = auto()  # Default, stage completed for all repositories before the next stage
+    PER_REPO = auto()  # Stage run per repository as part of its pipeline
+
 ########################################################################################################################
 # Core #################################################################################################################
 ########################################################################################################################
 
 
-def post_clone_action_handler(paths, plugin_folders=None):
+def post_clone_action_handler(paths, plugin_folders=None, jobs=1, plan_only=False, async_limit=ASYNC_LIMIT_DEFAULT,
+                              action_timeout=None, state=None):
+    """
+    Run the post clone actions of the cloned repositories, linking repositories without actions to main.
+    All action files are compiled into one action plan first, nothing is run if the plan is invalid.
+    The initial, normal and final stages are run one after another. Within a stage up to jobs repositories are handled
+    at the same time, the actions of each repository are run in order and its output is printed as one block.
+    Async actions run on a shared event loop, a repository waiting for one does not count against jobs.
+
+    Args:
+        paths (str array): Paths to the cloned repositories.
+        plugin_folders (str, optional, default = None): Path or path array to folders containing plugin actions.
+        jobs (int, optional, default = 1): Number of repositories handled at the same time.
+        plan_only (boolean, optional, default = False): Print the action plan without running it.
+        async_limit (int, optional, default = 8): Number of async actions running at the same time.
+        action_timeout (float, optional, default = None): Seconds an async action may run before it fails.
+        state (WorkspaceState, optional, default = None): Workspace state, unchanged actions applied by an earlier run
+            are skipped and the actions run are recorded.
+
+    Returns:
+        boolean: True if all links and actions were successful (or the plan is valid if plan_only).
+    """
+
+    # Populate global with source paths
+    globals_object.populate_paths(paths)
+    fs.stat_cache_clear()
+
+    # Compile action plan
+    plan = ActionPlan(load_plugins(plugin_folders=plugin_folders),
+                      AsyncActionRunner(jobs=jobs, async_limit=async_limit, timeout=action_timeout), state=state)
+    for path in paths:
+        plan.add_repository(path)
+    if plan.error_array:
+        print("Post clone action plan invalid:")
+        for error in plan.error_array:
+            print(f"  {error}")
+        print("Post clone action plan invalid - No actions run")
+        print("")
+        return False
+    if plan_only:
+        print("Post clone action plan:")
+        plan.print_plan()
+        print("")
+        return True
 
     # Check for any clone actions, link to main if none are found
     paths_with_action_initial = []
@@ -31,57 +96,38 @@ def post_clone_action_handler(paths, plugin_folders=None):
     paths_with_no_action = []
     link_status_array = []
 
-    # Populate global with source paths
-    globals_object.populate_paths(paths)
-
     # Look for post clone action types in paths
     for path in paths:
-        path_action_initial = os.path.join(path, ".postcloneactions_initial")
-        path_action = os.path.join(path, ".postcloneactions")
-        path_action_final = os.path.join(path, ".postcloneactions_final")
-
-        action_found = False
+        action_source_array = plan.action_sources(path)
 
-        if os.path.exists(path_action_initial):
+        if ACTION_SOURCE_INITIAL in action_source_array:
             paths_with_action_initial.append(path)
-            action_found = True
 
-        if os.path.exists(path_action):
+        if ACTION_SOURCE in action_source_array:
             paths_with_action.append(path)
-            action_found = True
 
-        if os.path.exists(path_action_final):
+        if ACTION_SOURCE_FINAL in action_source_array:
             paths_with_action_final.append(path)
-            action_found = True
 
-        if not action_found:
+        if not action_source_array:
             paths_with_no_action.append(path)
         else:
             paths_with_action_any.append(path)
 
     if paths_with_no_action:
         print("Link non-action repositories to main")
-        for path in paths_with_no_action:
-            # Link repository to main
-            globals_object.pca_initialize(path)  # Populate global with current path
-            link_object = Action_LinkToMain()
-            link_status = link_object.action()
-            link_status_array.append(link_status)
-            if not link_status and globals_object.action_log:
-                print("  Linking failure encountered - Log:")
-                for log_element in globals_object.action_log:
-                    print(f"    {log_element}")
-            elif not link_status:
-                print("  Linking failure encountered")
-
-    if paths_with_action_any:
-        any_actions_found = True
-        # At least one path contains actions, handled in individual cases
-    elif not paths_with_action_any and all(link_status_array):
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+            for link_status, log in executor.map(link_to_main_worker, paths_with_no_action):
+                link_status_array.append(link_status)
+                for line in log:
+                    print(line)
+
+    # Without actions the run ends after linking, otherwise the actions are handled in individual cases
+    if not paths_with_action_any and all(link_status_array):
         print("No failures during link actions")
         print("")
         return True
-    elif not paths_with_action_any and not all(link_status_array):
+    elif not paths_with_action_any:
         print("No clone actions detected - Not all repositories successfully linked to main!")
         print("")
         return False
@@ -90,11 +136,12 @@ def post_clone_action_handler(paths, plugin_folders=None):
     action_initial_status = True
     if paths_with_action_initial:
         print("Run initial repository post clone actions:")
-        # ToDo: Add plugin_folders config (external config?)
         action_initial_status = repository_action(
             paths=paths_with_action_initial,
-            action_source=".postcloneactions_initial",
-            plugin_folders=plugin_folders
+            action_source=ACTION_SOURCE_INITIAL,
+            plugin_folders=plugin_folders,
+            jobs=jobs,
+            plan=plan
         )
         if action_initial_status:
             print("Initial post clone actions run successfully")
@@ -106,11 +153,12 @@ def post_clone_action_handler(paths, plugin_folders=None):
     action_status = True
     if paths_with_action:
         print("Run repository post clone actions:")
-        # ToDo: Add plugin_folders config (external config?)
         action_status = repository_action(
             paths=paths_with_action,
-            action_source=".postcloneactions",
-            plugin_folders=plugin_folders
+            action_source=ACTION_SOURCE,
+            plugin_folders=plugin_folders,
+            jobs=jobs,
+            plan=plan
         )
         if action_status:
             print("Post clone actions run successfully")
@@ -122,138 +170,310 @@ def post_clone_action_handler(paths, plugin_folders=None):
     action_final_status = True
     if paths_with_action_final:
         print("Run final repository post clone actions:")
-        # ToDo: Add plugin_folders config (external config?)
         action_final_status = repository_action(
             paths=paths_with_action_final,
-            action_source=".postcloneactions_final",
-            plugin_folders=plugin_folders
+            action_source=ACTION_SOURCE_FINAL,
+            plugin_folders=plugin_folders,
+            jobs=jobs,
+            plan=plan
         )
         if action_final_status:
             print("Final post clone actions run successfully")
         else:
             print("Final post clone actions did not all run successfully")
         print("")
+    plan.async_runner.close()
 
     return action_initial_status and action_status and action_final_status
 
+
+class PostCloneActionPipeline:
+    """
+    Run post clone actions of repositories as soon as they are ready (the repository and all its dependencies have
+    been cloned), while other repositories are still cloning. Up to jobs repositories are acted on at the same time.
+    Repositories without action files are linked to main as part of the normal stage. The action files of a repository
+    are compiled into the shared action plan when it is ready, its actions are not run if they are invalid.
+
+    Stage order:
+        initial_stage_order GLOBAL: Initial actions run as repositories become ready, normal actions wait for the
+            initial actions of all repositories, so only run once cloning is complete.
+        initial_stage_order PER_REPO: Initial and normal actions of a repository run in order once it is ready.
+        final_stage_order GLOBAL: Final actions run once cloning is complete and all other actions are done.
+        final_stage_order PER_REPO: Final actions of a repository run right after its normal actions.
+    """
+
+    def __init__(self, plugin_folders=None, jobs=1, initial_stage_order=None, final_stage_order=None,
+                 async_limit=ASYNC_LIMIT_DEFAULT, action_timeout=None, state=None):
+        self.plan = ActionPlan(load_plugins(plugin_folders=plugin_folders),
+                               AsyncActionRunner(jobs=jobs, async_limit=async_limit, timeout=action_timeout),
+                               state=state)
+        self.plugin_folders = plugin_folders
+        self.jobs = jobs
+        self.initial_stage_order = initial_stage_order if initial_stage_order is not None else StageOrder.GLOBAL
+        self.final_stage_order = final_stage_order if final_stage_order is not None else StageOrder.GLOBAL
+        self.executor = ThreadPoolExecutor(max_workers=self.plan.async_runner.worker_count())
+        self.future_array = []
+        self.printed_count = 0
+        self.path_array = []
+        self.status_array = []
+
+        globals_object.populate_paths([])
+        fs.stat_cache_clear()
+
+    def repository_ready(self, path):
+        """
+        Queue the actions of a repository that are not held back by a GLOBAL stage. Repositories are queued once.
+
+        Args:
+            path (str): Path to the cloned repository.
+        """
+        if path in self.path_array or path in self.plan.repository_map:
+            return
+        globals_object.populate_path_append(path)
+
+        # Compile, invalid repositories are not acted on
+        error_array = self.plan.add_repository(path)
+        if error_array:
+            print(f"  {os.path.basename(path)}: Post clone action plan invalid - No actions run")
+            for error in error_array:
+                print(f"    {error}")
+            self.status_array.append(False)
+            return
+        self.path_array.append(path)
+
+        if self.initial_stage_order == StageOrder.GLOBAL:
+            action_source_array = [ACTION_SOURCE_INITIAL]
+        else:
+            action_source_array = self.normal_action_sources()
+        self.submit(path, action_source_array)
+
+    def print_completed(self):
+        """
+        Print the output of the repositories completed so far, in the order they were queued.
+        """
+        while self.printed_count < len(self.future_array) and self.future_array[self.printed_count].done():
+            status, log = self.future_array[self.printed_count].result()
+            for line in log:
+                print(line)
+            self.status_array.append(status)
+            self.printed_count += 1
+
+    def finish(self):
+        """
+        Run the remaining actions once cloning is complete and wait for all actions.
+
+        Returns:
+            boolean: True if all links and actions were successful.
+        """
+        self.wait_and_print()
+
+        # Normal actions held back by global initial actions
+        if self.initial_stage_order == StageOrder.GLOBAL:
+            for path in self.path_array:
+                self.submit(path, self.normal_action_sources())
+            self.wait_and_print()
+        self.executor.shutdown()
+
+        pipeline_status = all(self.status_array)
+        if pipeline_status:
+            print("Pipelined post clone actions run successfully")
+        else:
+            print("Pipelined post clone actions did not all run successfully")
+        print("")
+
+        # Final actions after everything else
+        action_final_status = True
+        if self.final_stage_order == StageOrder.GLOBAL:
+            paths_with_action_final = [path for path in self.path_array
+                                       if ACTION_SOURCE_FINAL in self.plan.action_sources(path)]
+            if paths_with_action_final:
+                print("Run final repository post clone actions:")
+                action_final_status = repository_action(
+                    paths=paths_with_action_final,
+                    action_source=ACTION_SOURCE_FINAL,
+                    plugin_folders=self.plugin_folders,
+                    jobs=self.jobs,
+                    plan=self.plan
+                )
+                if action_final_status:
+                    print("Final post clone actions run successfully")
+                else:
+                    print("Final post clone actions did not all run successfully")
+                print("")
+        self.plan.async_runner.close()
+
+        return pipeline_status and action_final_status
+
+    def normal_action_sources(self):
+        action_source_array = []
+        if self.initial_stage_order == StageOrder.PER_REPO:
+            action_source_array.append(ACTION_SOURCE_INITIAL)
+        action_source_array.append(ACTION_SOURCE)
+        if self.final_stage_order == StageOrder.PER_REPO:
+            action_source_array.append(ACTION_SOURCE_FINAL)
+        return action_source_array
+
+    def submit(self, path, action_source_array):
+        self.future_array.append(self.executor.submit(pipeline_action_worker, path, action_source_array, self.plan))
+
+    def wait_and_print(self):
+        wait(self.future_array)
+        self.print_completed()
+
 ########################################################################################################################
 # Functions ############################################################################################################
 ########################################################################################################################
 
 
-def repository_action(paths, action_source=".postcloneactions", plugin_folders=None):
+def repository_action(paths, action_source=".postcloneactions", plugin_folders=None, jobs=1, plan=None):
     """
     Loop over the cloned repositories performing dynamic actions.
+    Up to jobs repositories are handled at the same time, the actions of each repository are run in order.
 
     Args:
         paths (str array): Path to the cloned repositories to act on.
         action_source (str, optional, default = ".postcloneactions":
                                                 The file name to load actions from in the repository root.
         plugin_folders (str, optional, default = None: Path or path array to folders containing plugin actions.
+        jobs (int, optional, default = 1): Number of repositories handled at the same time.
+        plan (ActionPlan, optional, default = None): Compiled action plan, compiled from paths if None.
 
+    Returns:
+        boolean: True if all actions of all repositories were successful.
     """
-    # ToDo: Add print
-    plugin_map = load_plugins(plugin_folders=plugin_folders)
+    plan_owner = plan is None
+    if plan_owner:
+        plan = ActionPlan(load_plugins(plugin_folders=plugin_folders), AsyncActionRunner(jobs=jobs))
+        for path in paths:
+            plan.add_repository(path)
 
-    # For every repository
+    # For every repository, output printed in repository order
     summary_array = []
-    for path in paths:
-        path_clone_actions = os.path.join(path, action_source)
-
-        # Action_source found?
-        if os.path.exists(path_clone_actions):
-            action_array = []
-            status_array = []
-
-            # Load post clone actions
-            with open(path_clone_actions, 'r') as file:
-                action_content = file.read()
-            if action_content:
-                repo_name = os.path.basename(path)
-                print(f"  {repo_name}: {action_source}")
-
-                action_array = action_content.split("\n",)
-                for action in action_array:
-                    try:
-                        action_status = run_plugin(plugin_map, action, path)
-                    except TypeError:
-                        action_status = False
-
-                    status_array.append(action_status)
-                    if not action_status and globals_object.action_log:
-                        print("    Action failure encountered - dump log:")
-                        for log_element in globals_object.action_log:
-                            print(f"      {log_element}")
-                    elif not action_status:
-                        print("    Action failure encountered")
-
-            summary_array.append(all(status_array))
-        else:
-            summary_array.append(True)
+    with ThreadPoolExecutor(max_workers=plan.async_runner.worker_count()) as executor:
+        future_array = [executor.submit(repository_action_worker, path, action_source, plan) for path in paths]
+        for future in future_array:
+            status, log = future.result()
+            for line in log:
+                print(line)
+            summary_array.append(status)
+    if plan_owner:
+        plan.async_runner.close()
 
     return all(summary_array)
 
 
-def load_plugins(plugin_folders=None):
-    # ToDo: Add documentation
-    # Parse plugin_folders
-    if plugin_folders is None:
-        plugin_folders = []
-    elif isinstance(plugin_folders, str):
-        plugin_folders = [plugin_folders]
-    elif isinstance(plugin_folders, list):
-        pass  # plugin_folders is already a list
-    else:
-        # Handle the case when plugin_folders is neither a string nor a list
-        raise ValueError("plugin_folders should be a string or a list of strings")
+def repository_action_worker(path, action_source, plan):
+    """
+    Run the planned actions of one repository in order, collecting the output. A job slot of the async runner of the
+    plan is held while running. Steps the workspace state of the plan reports as applied are skipped.
 
-    # Get a list of Python files in the folder
-    files = []
-    for folder in plugin_folders:
-        # Handle environmental variables in path
-        try:
-            expanded_folder = os.path.expandvars(folder)
-        except TypeError:
-            expanded_folder = folder
+    Args:
+        path (str): Path to the cloned repository to act on.
+        action_source (str): The action file name the actions were loaded from.
+        plan (ActionPlan): The compiled action plan.
 
-        # Append to main if relative path
-        if not os.path.isabs(expanded_folder):
-            target_path = os.path.join(globals_object.path_main, expanded_folder)
-        else:
-            target_path = expanded_folder
+    Returns:
+        tuple: True if all actions were successful and the output lines.
+    """
+    log = []
+    status_array = []
+    skipped_count = 0
+    step_array = plan.steps(path, action_source)
+    if step_array:
+        repo_name = os.path.basename(path)
+        log.append(f"  {repo_name}: {action_source}")
+        with plan.async_runner.job_slots:
+            for step in step_array:
+                if plan.state is not None and plan.state.action_applied(step, plan.source_hash(step)):
+                    skipped_count += 1
+                    status_array.append(True)
+                    continue
+                (action_status, ctx), run = plan.run_shared(step, lambda run_step: run_action_step(
+                    plan.plugin_map, run_step, plan.async_runner))
+                if plan.state is not None:
+                    plan.state.record_action(step, plan.source_hash(step), action_status)
+
+                status_array.append(action_status)
+                if run:
+                    log.extend(ctx.report)
+                if not action_status and not run:
+                    log.append(f"    Shared action failure encountered: {step.plugin_name} {step.data}")
+                elif not action_status and ctx.log:
+                    log.append("    Action failure encountered - dump log:")
+                    for log_element in ctx.log:
+                        log.append(f"      {log_element}")
+                elif not action_status:
+                    log.append("    Action failure encountered")
+        if skipped_count == len(step_array):
+            log[0] = f"  {repo_name}: {action_source} (unchanged, skipped)"
+        elif skipped_count:
+            log.append(f"    Unchanged actions skipped: {skipped_count}")
+
+    return all(status_array), log
+
+
+def link_to_main_worker(path):
+    """
+    Link a repository without actions to main, collecting the output.
 
-        if os.path.isdir(target_path):
-            # Add the module directory to the beginning of sys.path
-            sys.path.insert(0, str(target_path))
-            # Get py files in folder
-            files.append([name for name in os.listdir(target_path) if name.endswith(".py")])
+    Args:
+        path (str): Path to the cloned repository.
 
-    files = list(set(files))  # remove duplicate files
+    Returns:
+        tuple: True if the repository was linked and the output lines.
+    """
+    log = []
+    ctx = ActionContext(path)
+    link_object = Action_LinkToMain()
+    link_status = link_object.action(ctx)
+    if not link_status and ctx.log:
+        log.append("  Linking failure encountered - Log:")
+        for log_element in ctx.log:
+            log.append(f"    {log_element}")
+    elif not link_status:
+        log.append("  Linking failure encountered")
+    return link_status, log
+
+
+def pipeline_action_worker(path, action_source_array, plan):
+    """
+    Run the planned actions of one repository in order, or link it to main if it has no action files at all.
 
-    plugin_map = {}
+    Args:
+        path (str): Path to the cloned repository.
+        action_source_array (str array): The action file names to run, in order.
+        plan (ActionPlan): The compiled action plan.
 
-    # Load default plugins
-    module_name = __name__
-    module = importlib.import_module(module_name)
+    Returns:
+        tuple: True if the link or all actions were successful and the output lines.
+    """
+    if not plan.action_sources(path):
+        if ACTION_SOURCE not in action_source_array:
+            return True, []
+        with plan.async_runner.job_slots:
+            return link_to_main_worker(path)
 
-    # Search for the class in the module
-    for name, obj in inspect.getmembers(module):
-        if inspect.isclass(obj) and hasattr(obj(), "action") and callable(getattr(obj(), "action")):
-            plugin_map[name] = obj()
+    status_array = []
+    log = []
+    for action_source in action_source_array:
+        status, action_log = repository_action_worker(path, action_source, plan)
+        status_array.append(status)
+        log.extend(action_log)
+    return all(status_array), log
 
-    # Load dynamic plugins
-    for file in files:
-        module_name = os.path.splitext(file)[0]
 
-        # Import the module
-        module = importlib.import_module(module_name)
+def load_plugins(plugin_folders=None):
+    """
+    Get the plugin map of the default plugins and the plugins found in plugin_folders. The map is built once per
+    process, plugin modules are only imported when an action names one of their plugins.
 
-        # Search for the class in the module
-        for name, obj in inspect.getmembers(module):
-            if inspect.isclass(obj) and hasattr(obj(), "action") and callable(getattr(obj(), "action")):
-                plugin_map[name] = obj()
+    Args:
+        plugin_folders (str, optional, default = None: Path or path array to folders containing plugin actions.
 
-    return plugin_map
+    Returns:
+        PluginRegistry: Map of plugin name to plugin object.
+    """
+    return get_plugin_registry(sys.modules[__name__], plugin_folders=plugin_folders)
 
 
 def run_plugin(plugin_map, plugin_string, repo_path):
@@ -265,24 +485,65 @@ def run_plugin(plugin_map, plugin_string, repo_path):
     else:
         plugin_data = ""
 
+    action_status, _ = run_action_step(plugin_map, action_step(plugin_name=plugin_name, data=plugin_data,
+                                                                arguments=None, repo_path=repo_path,
+                                                                action_source=None, line_number=None,
+                                                                shared_key=None))
+    return action_status
+
+
+def run_action_step(plugin_map, step, async_runner=None):
+    """
+    Run one action step with its pre-parsed arguments in its own context.
+    Plugins defining "action(self, ctx)" (all built-in plugins) get the context, third-party plugins defining
+    "action(self)" read globals_object and are run through an adapter. Plugins defining "async def action(self, ctx)"
+    are run by async_runner.
+
+    Args:
+        plugin_map (PluginRegistry): Map of plugin name to plugin object.
+        step (action_step): The step to run.
+        async_runner (AsyncActionRunner, optional, default = None): Runner of async actions, the action is run on its
+            own event loop if None.
+
+    Returns:
+        tuple: The status returned by the action (False if the plugin is not found or fails to load) and the
+            ActionContext holding its log and report.
+    """
+    ctx = ActionContext(step.repo_path, step.data, step.arguments)
+    span = trace_span(f"{step.plugin_name} {ctx.repo_name}", "action", data=step.data, source=step.action_source,
+                      line=step.line_number)
+
     # get plugin object
-    if plugin_name in plugin_map:
-        plugin_object = plugin_map[plugin_name]
+    if step.plugin_name in plugin_map:
+        try:
+            plugin_object = plugin_map[step.plugin_name]
+        except ImportError as e:
+            ctx.log_add(f"Failed to load plugin {step.plugin_name}: {e}")
+            span.end(status=False)
+            return False, ctx
     else:
         # ToDo: Add print
-        return False
+        span.end(status=False)
+        return False, ctx
 
     # Call action
     action_status = False
     try:
-        globals_object.pca_initialize(repo_path, plugin_data)  # Reset and initialize global post clone action data
-        action_status = plugin_object.action()
+        if is_async_action(plugin_object) and async_runner is not None:
+            action_status = async_runner.run(plugin_object, ctx)
+        elif is_async_action(plugin_object):
+            action_status = asyncio.run(plugin_object.action(ctx))
+        elif takes_context(plugin_object):
+            action_status = plugin_object.action(ctx)
+        else:
+            action_status = run_legacy_action(plugin_object, ctx)
         if not isinstance(action_status, bool):
             raise TypeError("action() method must return a boolean value")
     except TypeError:
         action_status = False
 
-    return action_status
+    span.end(status=action_status)
+    return action_status, ctx
 
 ########################################################################################################################
 # Plugins ##############################################################################################################
@@ -304,10 +565,13 @@ Returns:
 
 
 class Action_CreateFolder:
-    def action(self):
-        # Get global data
-        path = globals_object.action_data
-        main_path = globals_object.path_main
+    required_arguments = ("value",)
+    idempotent = True  # Result only depends on the path
+
+    def action(self, ctx):
+        # Get context data
+        path = ctx.arguments.value
+        main_path = ctx.workspace.path_main
 
         # Setup variables
         indentation = "      "  # Default indentation for post clone actions
@@ -343,7 +607,7 @@ class Action_CreateFolder:
             status = False
 
         # Return results
-        globals_object.pca_log_add(log_string)
+        ctx.log_add(log_string)
         return status
 
 # Action_CreateFolderInSelf ############################################################################################
@@ -362,15 +626,28 @@ Returns:
 
 
 class Action_CreateFolderInSelf:
-    def action(self):
-        # Get global data
-        repo_path = globals_object.action_repo_path
-        path = globals_object.action_data
+    required_arguments = ("value",)
+
+    def action(self, ctx):
+        # Get context data
+        repo_path = ctx.repo_path
+        path = ctx.arguments.value
+
+        return create_folder_in_self(repo_path, path, log=ctx.log)
 
-        return create_folder_in_self(repo_path, path)
 
+def create_folder_in_self(repo_path, folder_path, log=None):
+    """
+    Create a folder inside a repository.
+
+    Args:
+        repo_path (str): Path to the repository.
+        folder_path (str): Path relative to the repository.
+        log (str array, optional, default = None): Collects the log lines of the action, globals_object if None.
 
-def create_folder_in_self(repo_path, folder_path):
+    Returns:
+        status (boolean): True if folder created or already found.
+    """
     # Sanity check path
     if not sanity_check_path(folder_path):
         return False
@@ -394,7 +671,7 @@ def create_folder_in_self(repo_path, folder_path):
         status = False
 
     # Return results
-    globals_object.pca_log_add(log_string)
+    action_log_add(log, log_string)
     return status
 
 # Action_LinkContentStructureToFolder ##################################################################################
@@ -417,55 +694,55 @@ Returns:
 
 
 class Action_LinkContentStructureToFolder:
-    def action(self):
-        # Get global data
-        arguments_string = globals_object.action_data
-        main_path = globals_object.path_main
-        repo_name = globals_object.action_repo_name
-
-        # Parse argument data from action_data - source
-        source_path = globals_object.action_repo_path
-        for arg in arguments_string.split(";"):
-            if arg.strip().startswith("source="):
-                source_path = arg.strip().replace("source=", "")
-                break
-
-        # Parse argument data from action_data - target
-        target_found = False
-        target_path_arg = None
-        for arg in arguments_string.split(";"):
-            if arg.strip().startswith("target="):
-                target_found = True
-                target_path_arg = arg.strip().replace("target=", "")
-                break
-        if not target_found:
-            globals_object.pca_log_add(f"{repo_name}: target-argument missing from provided argument string")
+    required_arguments = ("target",)
+    argument_keys = ("source", "target", "exclusions", "mode")
+    argument_values = {"mode": LINK_MODE_ARRAY}
+
+    def action(self, ctx):
+        # Get context data
+        arguments = ctx.arguments
+        main_path = ctx.workspace.path_main
+        repo_name = ctx.repo_name
+
+        # Argument data from action_data - source
+        source_path = ctx.repo_path
+        if arguments.source is not None:
+            source_path = arguments.source
+
+        # Argument data from action_data - target
+        target_path_arg = arguments.target
+        if target_path_arg is None:
+            ctx.log_add(f"{repo_name}: target-argument missing from provided argument string")
             return False
         target_path = os.path.join(main_path, target_path_arg)
         valid_target = create_folder(target_path)
         if not valid_target:
-            globals_object.pca_log_add(f"{repo_name}: Failed to find or create target folder")
+            ctx.log_add(f"{repo_name}: Failed to find or create target folder")
             return False
 
-        # Parse argument data from action_data - exclusions
-        exclusions_split = arguments_string.split("exclusions=")
-        if len(exclusions_split) > 1:
-            exclusions_arg = exclusions_split[1].split(";")
-        else:
-            exclusions_arg = []
-        exclusions_arg.extend([".git", "README.md"])
-        exclusions = exclusions_arg
+        # Argument data from action_data - exclusions
+        exclusions = list(arguments.exclusions)
+        exclusions.extend([".git", "README.md"])
 
         # Check if source_path exists
         if not os.path.exists(source_path):
-            globals_object.pca_log_add(f"{repo_name}: source path not found")
+            ctx.log_add(f"{repo_name}: source path not found")
             return False
 
         # Re-create structure at target
-        recreate_linked_folder_structure(source_path, target_path, exclusions)
+        mode = arguments.mode if arguments.mode is not None else LINK_MODE_HARDLINK
+        result = recreate_linked_folder_structure(source_path, target_path, exclusions, mode=mode)
+        indentation = "      "  # Default indentation for post clone actions
+        mode_string = ", ".join(f"{used_mode}: {count}" for used_mode, count in result.mode_count_map.items())
+        ctx.report_add(f"    Linked {result.linked} files ({mode_string or mode}), kept "
+                       f"{result.skipped} existing, removed {result.removed} stale: {target_path}")
+        if any(used_mode != mode for used_mode in result.mode_count_map):
+            ctx.report_add(f"    Link mode {mode} not supported for all files, fallback used")
+        for failed_path, error in result.failed:
+            ctx.log_add(f"{indentation}Failed to link {failed_path}: {error}")
 
         # Return result
-        return True
+        return not result.failed
 
 # Action_LinkDependenciesIntoSelf ######################################################################################
 ########################################################################################################################
@@ -486,35 +763,27 @@ Returns:
 
 
 class Action_LinkDependenciesIntoSelf:
-    def action(self):
-        # Get global data
-        arguments_string = globals_object.action_data
-        repo_path = globals_object.action_repo_path
-        repo_name = globals_object.action_repo_name
-        source_path = globals_object.path_source
-
-        # Parse argument data from action_data - target
-        target_found = False
-        target_path_arg = None
-        for arg in arguments_string.split(";"):
-            if arg.strip().startswith("target="):
-                target_found = True
-                target_path_arg = arg.strip().replace("target=", "")
-                break
-        if not target_found:
-            globals_object.pca_log_add(f"{repo_name}: target-argument missing from provided argument string")
+    required_arguments = ("target",)
+    argument_keys = ("target", "exclusions")
+
+    def action(self, ctx):
+        # Get context data
+        arguments = ctx.arguments
+        repo_path = ctx.repo_path
+        repo_name = ctx.repo_name
+        source_path = ctx.workspace.path_source
+
+        # Argument data from action_data - target
+        target_path_arg = arguments.target
+        if target_path_arg is None:
+            ctx.log_add(f"{repo_name}: target-argument missing from provided argument string")
             return False
 
-        # Parse argument data from action_data - exclusions
-        exclusions_split = arguments_string.split("exclusions=")
-        if len(exclusions_split) > 1:
-            exclusions_arg = exclusions_split[1].split(";")
-        else:
-            exclusions_arg = []
-        exclusions = list(exclusions_arg)
+        # Argument data from action_data - exclusions
+        exclusions = list(arguments.exclusions)
 
         # Create target if needed
-        if not create_folder_in_self(repo_path, target_path_arg):
+        if not create_folder_in_self(repo_path, target_path_arg, log=ctx.log):
             return False
         target_path = os.path.join(repo_path, target_path_arg)
 
@@ -526,11 +795,11 @@ class Action_LinkDependenciesIntoSelf:
         for dependency in dependencies:
             repo_source = os.path.join(source_path, dependency)
             if dependency not in exclusions and os.path.exists(repo_source):
-                status = create_soft_link(target_path, repo_source)
+                status = create_soft_link(target_path, repo_source, log=ctx.log)
                 status_array.append(status)
             elif not os.path.exists(repo_source):
                 status_array.append(False)
-                globals_object.pca_log_add(f"{repo_name}: source path ({dependency}) not found")
+                ctx.log_add(f"{repo_name}: source path ({dependency}) not found")
 
         # Return result
         return all(status_array)
@@ -556,12 +825,14 @@ Returns:
 
 
 class Action_LinkIntoMainSubFolder:
-    def action(self):
-        # Get global data
-        path = globals_object.action_data
-        repo_name = globals_object.action_repo_name
-        main_path = globals_object.path_main
-        source_path = globals_object.action_repo_path
+    required_arguments = ("value",)
+
+    def action(self, ctx):
+        # Get context data
+        path = ctx.arguments.value
+        repo_name = ctx.repo_name
+        main_path = ctx.workspace.path_main
+        source_path = ctx.repo_path
 
         # Sanity check path
         if not sanity_check_path(path):
@@ -590,7 +861,7 @@ class Action_LinkIntoMainSubFolder:
             status = False
 
         # Return results
-        globals_object.pca_log_add(log_string)
+        ctx.log_add(log_string)
         return status
 
 # Action_LinkToFolder ##################################################################################################
@@ -609,16 +880,16 @@ Returns:
 
 
 class Action_LinkToFolder:
-    def action(self):
+    def action(self, ctx):
         # Setup variables
-        target_path = globals_object.action_data
-        source_path = globals_object.action_repo_path
-        fallback_path = globals_object.path_main
+        target_path = ctx.arguments.value
+        source_path = ctx.repo_path
+        fallback_path = ctx.workspace.path_main
 
-        return create_soft_link(target_path, source_path, fallback_path)
+        return create_soft_link(target_path, source_path, fallback_path, log=ctx.log)
 
 
-def create_soft_link(target_path, source_path, fallback_path=None):
+def create_soft_link(target_path, source_path, fallback_path=None, log=None):
 
     """
     Link source path to target_path\repo_name. If target is not provided it defaults to the main folder.
@@ -626,6 +897,9 @@ def create_soft_link(target_path, source_path, fallback_path=None):
     action_data:
         path (str): Target path that repository will be linked into as a sub-folder.
 
+    Args:
+        log (str array, optional, default = None): Collects the log lines of the action, globals_object if None.
+
     Returns:
         status (boolean): True if folder linked or already exists.
     """
@@ -675,9 +949,17 @@ def create_soft_link(target_path, source_path, fallback_path=None):
         status = False
 
     # Return results
-    globals_object.pca_log_add(log_string)
+    action_log_add(log, log_string)
     return status
 
+
+def action_log_add(log, log_value):
+    # Helpers shared with third-party plugins log to globals_object unless given the log of a context
+    if log is None:
+        globals_object.pca_log_add(log_value)
+    else:
+        log.append(log_value)
+
 # Action_LinkToMain ####################################################################################################
 ########################################################################################################################
 
@@ -691,10 +973,10 @@ Returns:
 
 
 class Action_LinkToMain:
-    def action(self):
+    def action(self, ctx):
         # Setup variables
-        source_path = globals_object.action_repo_path
-        destination_path = os.path.join(globals_object.path_main, globals_object.action_repo_name)
+        source_path = ctx.repo_path
+        destination_path = os.path.join(ctx.workspace.path_main, ctx.repo_name)
         indentation = "      "  # Default indentation for post clone actions
 
         deletion_status = delete_junction_if_force(destination_path)
@@ -715,7 +997,7 @@ class Action_LinkToMain:
             status = False
 
         # Return results
-        globals_object.pca_log_add(log_string)
+        ctx.log_add(log_string)
         return status
 
 # Action_CreateMainFolder ##############################################################################################
@@ -732,10 +1014,13 @@ Returns:
 """
 
 class Action_CreateMainFolder:
-    def action(self):
-        # Get global data
-        path = globals_object.action_data
-        main_path = globals_object.path_main
+    required_arguments = ("value",)
+    idempotent = True  # Result only depends on the path
+
+    def action(self, ctx):
+        # Get context data
+        path = ctx.arguments.value
+        main_path = ctx.workspace.path_main
 
         # Sanity check path
         if not sanity_check_path(path):
@@ -760,5 +1045,5 @@ class Action_CreateMainFolder:
             status = False
 
         # Return results
-        globals_object.pca_log_add(log_string)
+        ctx.log_add(log_string)
         return status
\ No newline at end of file
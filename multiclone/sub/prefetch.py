@@ -0,0 +1,58 @@
+# System imports
+import hashlib
+import json
+import os
+
+# Graph cache location, relative to the workspace root
+GRAPH_CACHE_FOLDER = os.path.join(".multiclone", "graph")
+
+########################################################################################################################
+# Graph cache ##########################################################################################################
+########################################################################################################################
+
+
+class GraphCache:
+    """
+    The dependencies the last run found for the same requested repositories, as ".dependencies"-lines in
+    "<workspace>/.multiclone/graph/<hash>.json". The hash is taken over the request lines, so every set of requested
+    repositories (and versions) has its own cached graph.
+
+    Attributes:
+        path (str): Path of the cache file of the request.
+    """
+
+    def __init__(self, workspace_path, request_line_array):
+        request_hash = hashlib.sha1("\n".join(request_line_array).encode("utf-8")).hexdigest()
+        self.path = os.path.join(workspace_path, GRAPH_CACHE_FOLDER, f"{request_hash}.json")
+        self.request_line_array = list(request_line_array)
+
+    def read(self):
+        """
+        Read the cached dependencies.
+
+        Returns:
+            str array: The dependency lines in the order they were found, None if nothing is cached or the cache can
+                not be read.
+        """
+        try:
+            with open(self.path, 'r') as file:
+                content = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if content.get("requested") != self.request_line_array:
+            return None  # Hash collision
+        return content.get("dependencies")
+
+    def write(self, dependency_line_array):
+        """
+        Replace the cached dependencies. The file is replaced at once, so an interrupted write keeps the old graph.
+
+        Args:
+            dependency_line_array (str array): The dependency lines in the order they were found.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, 'w') as file:
+            json.dump({"requested": self.request_line_array, "dependencies": list(dependency_line_array)}, file,
+                      indent=2)
+        os.replace(temporary_path, self.path)
@@ -0,0 +1,305 @@
+# System imports
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Core imports
+from multiclone.sub.git.command import git_head_commit
+from multiclone.sub.journal import RunJournal
+from multiclone.sub.journal import JOURNAL_CLONE
+from multiclone.sub.journal import JOURNAL_ACTION
+
+# Workspace state location, relative to the workspace root
+STATE_FOLDER = ".multiclone"
+STATE_FILE = "state.db"
+
+COMMIT_PATTERN = re.compile(r"^[0-9a-f]{40}([0-9a-f]{24})?$")
+
+STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS repository (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    options TEXT NOT NULL,
+    clone_path TEXT NOT NULL,
+    clone_commit TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS action_file (
+    repo_path TEXT NOT NULL,
+    action_source TEXT NOT NULL,
+    file_hash TEXT NOT NULL,
+    PRIMARY KEY (repo_path, action_source)
+);
+CREATE TABLE IF NOT EXISTS action_line (
+    repo_path TEXT NOT NULL,
+    action_source TEXT NOT NULL,
+    line_number INTEGER NOT NULL,
+    line_hash TEXT NOT NULL,
+    PRIMARY KEY (repo_path, action_source, line_number)
+);
+"""
+
+########################################################################################################################
+# Workspace state ######################################################################################################
+########################################################################################################################
+
+
+class WorkspaceState:
+    """
+    What the previous runs did in a workspace, stored in SQLite under "<workspace>/.multiclone/state.db".
+
+    A repository is skipped when it is requested with the same url, version and clone options as when it was cloned
+    and its HEAD is still the recorded commit. A requested branch is not fetched to check if it moved, use sync for
+    that. The post clone action lines applied successfully are recorded with the hash of their action file, an action
+    line is skipped when its action file is unchanged and its repository and all its dependencies were skipped (a
+    repository that is cloned again has new files, so links to the old ones must be recreated).
+
+    The state is read once when opened, changes are kept in memory and written by close. Every change is also
+    appended to the RunJournal of the workspace right away. If resume, what the journal shows an interrupted run
+    finished is added to the state, so it is not done again.
+    """
+
+    def __init__(self, workspace_path, database=True, resume=False):
+        self.path = os.path.join(workspace_path, STATE_FOLDER, STATE_FILE)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.connection = None
+        self.lock = threading.Lock()
+
+        self.repository_map = {}  # Key -> (url, options, clone_path, clone_commit)
+        self.action_file_map = {}  # (repo_path, action_source) -> file hash
+        self.action_line_map = {}  # (repo_path, action_source) -> {line_number: line_hash}
+        if database:
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.executescript(STATE_SCHEMA)
+            for key, url, options, clone_path, clone_commit in self.connection.execute(
+                    "SELECT key, url, options, clone_path, clone_commit FROM repository"):
+                self.repository_map[key] = (url, options, clone_path, clone_commit)
+            for repo_path, action_source, file_hash in self.connection.execute(
+                    "SELECT repo_path, action_source, file_hash FROM action_file"):
+                self.action_file_map[(repo_path, action_source)] = file_hash
+            for repo_path, action_source, line_number, line_hash in self.connection.execute(
+                    "SELECT repo_path, action_source, line_number, line_hash FROM action_line"):
+                self.action_line_map.setdefault((repo_path, action_source), {})[line_number] = line_hash
+
+        self.unchanged_key_set = set()  # Repositories skipped by this run
+        self.reusable_path_set = set()  # Repositories whose recorded actions may be skipped by this run
+        self.changed_repository_map = {}  # Key -> row, None to delete
+        self.applied_file_map = {}  # (repo_path, action_source) -> file hash, for action files run by this run
+        self.applied_line_map = {}  # (repo_path, action_source) -> {line_number: line_hash} applied after this run
+
+        # Journal, continued if an interrupted run is resumed
+        self.journal = RunJournal(workspace_path)
+        event_array = self.journal.read_interrupted() if resume else None
+        self.resumed = event_array is not None
+        self.resumed_clone_count = 0
+        self.resumed_action_count = 0
+        for event in event_array or []:
+            self.apply_event(event)
+        self.journal.start(resume=self.resumed)
+
+    def apply_event(self, event):
+        """
+        Add a clone or action event of an interrupted run to the state.
+
+        Args:
+            event (dict): The journal event.
+        """
+        if event["event"] == JOURNAL_CLONE and event["clone_commit"] is None:
+            self.repository_map.pop(event["key"], None)
+            self.changed_repository_map[event["key"]] = None
+        elif event["event"] == JOURNAL_CLONE:
+            row = (event["url"], event["options"], event["clone_path"], event["clone_commit"])
+            self.repository_map[event["key"]] = row
+            self.changed_repository_map[event["key"]] = row
+            self.resumed_clone_count += 1
+        elif event["event"] == JOURNAL_ACTION:
+            source_key = (event["repo_path"], event["action_source"])
+            if self.action_file_map.get(source_key) != event["file_hash"]:
+                self.action_file_map[source_key] = event["file_hash"]
+                self.action_line_map[source_key] = {}
+            line_map = self.action_line_map.setdefault(source_key, {})
+            if event["status"]:
+                line_map[event["line_number"]] = event["line_hash"]
+                self.resumed_action_count += 1
+            else:
+                line_map.pop(event["line_number"], None)
+            self.applied_file_map[source_key] = event["file_hash"]
+            self.applied_line_map[source_key] = dict(line_map)
+
+    # Repositories
+
+    def clone_unchanged(self, key, url, options, clone_path):
+        """
+        Check if a repository can be skipped, marking it unchanged if so.
+
+        Args:
+            key (str): Normalized url of the repository.
+            url (str): The requested url.
+            options (dict): The requested version and clone options.
+            clone_path (str): Path the repository is cloned to.
+
+        Returns:
+            str: The recorded commit if the repository is unchanged, else None.
+        """
+        record = self.repository_map.get(key)
+        if record is None or record[:3] != (url, options_to_string(options), clone_path):
+            return None
+        if read_head_commit(clone_path) != record[3]:
+            return None
+        with self.lock:
+            self.unchanged_key_set.add(key)
+        return record[3]
+
+    def record_clone(self, key, url, options, clone_path, clone_commit):
+        row = (url, options_to_string(options), clone_path, clone_commit)
+        with self.lock:
+            if self.repository_map.get(key) == row:
+                return
+            self.repository_map[key] = row
+            self.changed_repository_map[key] = row
+        self.journal.append(JOURNAL_CLONE, key=key, url=url, options=row[1], clone_path=clone_path,
+                            clone_commit=clone_commit)
+
+    def forget_clone(self, key):
+        with self.lock:
+            if key not in self.repository_map:
+                return
+            del self.repository_map[key]
+            self.changed_repository_map[key] = None
+        self.journal.append(JOURNAL_CLONE, key=key, clone_commit=None)
+
+    def mark_actions_reusable(self, path):
+        with self.lock:
+            self.reusable_path_set.add(path)
+
+    # Actions
+
+    def action_applied(self, step, file_hash):
+        """
+        Check if an action line was applied successfully by an earlier run and may be skipped.
+
+        Args:
+            step (action_step): The step.
+            file_hash (str): Hash of the action file of the step.
+
+        Returns:
+            boolean: True if the step may be skipped.
+        """
+        source_key = (step.repo_path, step.action_source)
+        if step.repo_path not in self.reusable_path_set or self.action_file_map.get(source_key) != file_hash:
+            return False
+        return self.action_line_map.get(source_key, {}).get(step.line_number) == line_hash(step)
+
+    def record_action(self, step, file_hash, status):
+        """
+        Record the result of an action line run by this run. A failed line is forgotten, so it is run again.
+
+        Args:
+            step (action_step): The step.
+            file_hash (str): Hash of the action file of the step.
+            status (boolean): The status of the action.
+        """
+        source_key = (step.repo_path, step.action_source)
+        with self.lock:
+            if self.applied_file_map.get(source_key) != file_hash:
+                self.applied_line_map[source_key] = {}
+                if self.action_file_map.get(source_key) == file_hash:
+                    self.applied_line_map[source_key].update(self.action_line_map.get(source_key, {}))
+                self.applied_file_map[source_key] = file_hash
+            if status:
+                self.applied_line_map[source_key][step.line_number] = line_hash(step)
+            else:
+                self.applied_line_map[source_key].pop(step.line_number, None)
+        self.journal.append(JOURNAL_ACTION, repo_path=step.repo_path, action_source=step.action_source,
+                            line_number=step.line_number, file_hash=file_hash, line_hash=line_hash(step),
+                            status=status)
+
+    def close(self, done=True):
+        """
+        Write the changes of this run to the database, if used, and close the journal.
+
+        Args:
+            done (boolean, optional, default = True): Mark the run done in the journal. An aborted run is not marked
+                done, so it can be continued with resume.
+        """
+        if self.connection is not None:
+            self.write_database()
+        if done:
+            self.journal.finish()
+        else:
+            self.journal.close()
+
+    def write_database(self):
+        with self.lock, self.connection:
+            now = time.time()
+            for key, row in self.changed_repository_map.items():
+                if row is None:
+                    self.connection.execute("DELETE FROM repository WHERE key = ?", (key,))
+                else:
+                    self.connection.execute("INSERT OR REPLACE INTO repository VALUES (?, ?, ?, ?, ?, ?)",
+                                            (key, *row, now))
+            for source_key, file_hash in self.applied_file_map.items():
+                repo_path, action_source = source_key
+                self.connection.execute("INSERT OR REPLACE INTO action_file VALUES (?, ?, ?)",
+                                        (repo_path, action_source, file_hash))
+                self.connection.execute("DELETE FROM action_line WHERE repo_path = ? AND action_source = ?",
+                                        source_key)
+                self.connection.executemany("INSERT INTO action_line VALUES (?, ?, ?, ?)",
+                                            [(repo_path, action_source, line_number, hash_value) for
+                                             line_number, hash_value in self.applied_line_map[source_key].items()])
+            self.changed_repository_map = {}
+            self.applied_file_map = {}
+            self.applied_line_map = {}
+        self.connection.close()
+
+
+def options_to_string(options):
+    return json.dumps(options, sort_keys=True)
+
+
+def line_hash(step):
+    return hashlib.sha1(f"{step.plugin_name} {step.data}".encode("utf-8")).hexdigest()
+
+
+def read_head_commit(path):
+    """
+    Read the commit HEAD of a repository points to from the files in ".git", without starting git. Falls back to git
+    for layouts not handled (for example a ".git"-file of a worktree).
+
+    Args:
+        path (str): Path to the repository.
+
+    Returns:
+        str: The full commit hash or None if it could not be read.
+    """
+    git_path = os.path.join(path, ".git")
+    try:
+        with open(os.path.join(git_path, "HEAD"), 'r') as file:
+            head = file.read().strip()
+    except OSError:
+        return git_head_commit(path)
+    if COMMIT_PATTERN.match(head):
+        return head
+    if not head.startswith("ref: "):
+        return git_head_commit(path)
+
+    # Loose or packed reference
+    ref = head[len("ref: "):]
+    try:
+        with open(os.path.join(git_path, *ref.split("/")), 'r') as file:
+            return file.read().strip()
+    except OSError:
+        pass
+    try:
+        with open(os.path.join(git_path, "packed-refs"), 'r') as file:
+            for line in file:
+                part_array = line.strip().split(" ")
+                if len(part_array) == 2 and part_array[1] == ref:
+                    return part_array[0]
+    except OSError:
+        pass
+    return git_head_commit(path)
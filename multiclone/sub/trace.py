@@ -0,0 +1,174 @@
+# System imports
+import atexit
+import json
+import os
+import threading
+import time
+
+# Number of spans printed by the summary
+TRACE_SUMMARY_COUNT = 10
+
+########################################################################################################################
+# Trace ################################################################################################################
+########################################################################################################################
+
+
+class Tracer:
+    """
+    Records timed spans of a run from any thread and writes them as Chrome trace-event JSON (load the file in
+    chrome://tracing or https://ui.perfetto.dev). Spans are only recorded while enabled.
+
+    Attributes:
+        file_path (str): Path the trace is written to, None while disabled.
+        span_array (dict array): Completed spans as trace events.
+    """
+
+    def __init__(self):
+        self.file_path = None
+        self.span_array = []
+        self.thread_id_map = {}  # threading.get_ident() -> small thread id
+        self.start_time = time.perf_counter()
+        self.finished = False
+        self.exit_registered = False
+        self.lock = threading.Lock()
+
+    def enable(self, file_path):
+        """
+        Start recording. The trace is written and summarized by finish, or at exit if the run is aborted.
+
+        Args:
+            file_path (str): Path to write the trace to.
+        """
+        with self.lock:
+            self.file_path = file_path
+            self.span_array = []
+            self.thread_id_map = {}
+            self.start_time = time.perf_counter()
+            self.finished = False
+            register_exit = not self.exit_registered
+            self.exit_registered = True
+        if register_exit:
+            atexit.register(self.finish)
+
+    def enabled(self):
+        return self.file_path is not None
+
+    def record(self, name, category, start_time, end_time, args):
+        thread_ident = threading.get_ident()
+        with self.lock:
+            if thread_ident not in self.thread_id_map:
+                self.thread_id_map[thread_ident] = (len(self.thread_id_map) + 1, threading.current_thread().name)
+            self.span_array.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round((start_time - self.start_time) * 1e6, 1),
+                "dur": round((end_time - start_time) * 1e6, 1),
+                "pid": os.getpid(),
+                "tid": self.thread_id_map[thread_ident][0],
+                "args": args
+            })
+
+    def finish(self):
+        """
+        Write the trace file and print the slowest spans. Done once per enable.
+        """
+        with self.lock:
+            if self.file_path is None or self.finished:
+                return
+            self.finished = True
+            event_array = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": thread_id,
+                            "args": {"name": thread_name}} for thread_id, thread_name in self.thread_id_map.values()]
+            event_array.extend(self.span_array)
+            span_array = list(self.span_array)
+
+        try:
+            with open(self.file_path, 'w') as file:
+                json.dump({"traceEvents": event_array, "displayTimeUnit": "ms"}, file)
+            print(f"Trace written: {self.file_path} ({len(span_array)} spans)")
+        except OSError as e:
+            print(f"Failed to write trace: {self.file_path} ({e})")
+        print_summary(span_array)
+        print("")
+
+
+class TraceSpan:
+    """
+    A span recorded from creation until end is called or its with-block is left. Does nothing if tracing is disabled.
+    """
+
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start_time = time.perf_counter() if tracer.enabled() else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end()
+        return False
+
+    def end(self, **args):
+        """
+        End the span, args are added to the arguments of the span. Later calls do nothing.
+        """
+        if self.start_time is None:
+            return
+        self.args.update(args)
+        self.tracer.record(self.name, self.category, self.start_time, time.perf_counter(), self.args)
+        self.start_time = None
+
+
+tracer = Tracer()
+
+
+def trace_enable(file_path):
+    tracer.enable(file_path)
+
+
+def trace_finish():
+    tracer.finish()
+
+
+def trace_span(name, category, **args):
+    """
+    Start a span, use as context manager or call end.
+
+    Example:
+        with trace_span("clone RepoA", "clone", url=url):
+            ...
+
+    Args:
+        name (str): Name shown for the span.
+        category (str): Category of the span (phase, clone, git, plugin or action), summed in the summary.
+        **args: Values shown with the span.
+
+    Returns:
+        TraceSpan: The span.
+    """
+    return TraceSpan(tracer, name, category, args)
+
+
+def print_summary(span_array, count=TRACE_SUMMARY_COUNT):
+    """
+    Print the time per category and the slowest spans, excluding the run phases from the slowest spans.
+
+    Args:
+        span_array (dict array): Completed spans as trace events.
+        count (int, optional, default = 10): Number of slowest spans printed.
+    """
+    category_map = {}
+    for span in span_array:
+        total, span_count = category_map.get(span["cat"], (0, 0))
+        category_map[span["cat"]] = (total + span["dur"], span_count + 1)
+    print("Trace summary:")
+    for category, (total, span_count) in sorted(category_map.items(), key=lambda item: -item[1][0]):
+        print(f"  {category}: {total / 1000:.0f} ms ({span_count} spans)")
+    slowest_array = sorted([span for span in span_array if span["cat"] != "phase"], key=lambda span: -span["dur"])
+    if slowest_array:
+        print("  Slowest:")
+        for span in slowest_array[:count]:
+            print(f"    {span['dur'] / 1000:8.0f} ms  {span['cat']}: {span['name']}")
@@ -1,5 +1,17 @@
 # Imports
+import asyncio
+import contextlib
+import io
+import json
 import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
 
 # Set directory to root
 current_dir = os.path.dirname(os.path.abspath(__file__))  # Get file directory
@@ -14,20 +26,1258 @@ if current_dir == "/":
 
 # Set directories
 os.chdir(current_dir)
+sys.path.insert(0, current_dir)
 path_test = os.path.join(os.path.dirname(current_dir), "Test")
 
 # Imports after directory change
 from multiclone.core import main
 from multiclone.core import clone_request
+from multiclone.sub.git.command import git_run
+from multiclone.sub.git.command import git_head_commit
+from multiclone.sub.git.mirror import mirror_evict
+from multiclone.sub.git.mirror import mirror_update
+from multiclone.sub.git.mirror import build_mirror_path
+from multiclone.sub.git.mirror import MIRROR_LAST_USED_FILE
+from multiclone.sub.clone_url import normalize_url
+from multiclone.core import string_to_clone_elements
+from multiclone.core import VersionAction
+from multiclone.sub.clone_url import extract_repo_name
+from multiclone.sub.clone_url import valid_repo_name
+from multiclone.sub.graph import DependencyGraph
+from multiclone.core import select_version
+from multiclone.core import sort_constraints
+from multiclone.core import versions_conflict
+from multiclone.core import version_constraint
+from multiclone.core import ConflictAction
+from multiclone.sub import post_clone_handler
+from multiclone.sub.plugin_registry import PluginRegistry
+from multiclone.sub.plugin_registry import scan_action_classes
+from multiclone.sub.post_clone_handler import StageOrder
+from multiclone.sub.action_plan import parse_action_arguments
+from multiclone.sub.action_plan import validate_action_arguments
+from multiclone.sub import fs
+from multiclone.sub.path import delete_junction_if_force
+from multiclone.sub.path import delete_folder_if_force
+from multiclone.sub.globals import globals_object
+from multiclone.sub.link import recreate_linked_folder_structure
+from multiclone.sub.link import build_manifest_path
+from multiclone.sub.action_context import ActionContext
+from multiclone.sub.action_context import workspace_info
+from multiclone.sub.action_context import takes_context
+from multiclone.sub.action_context import run_legacy_action
+from multiclone.sub.async_action import AsyncActionRunner
+from multiclone.sub.async_action import is_async_action
+from multiclone.sub.trace import tracer
+from multiclone.sub.trace import Tracer
+from multiclone.sub.trace import TraceSpan
+from multiclone.sub.state import WorkspaceState
+from multiclone.sub.action_plan import action_step
+from multiclone.sub.journal import RunJournal
+from multiclone.sub.journal import JOURNAL_CLONE
+
+#####################################################################################################
+# Helpers ###########################################################################################
+#####################################################################################################
+
+def create_repository(path, file_map):
+    """
+    Create a repository with one commit holding the provided files.
+
+    Args:
+        path (str): Path of the repository.
+        file_map (dict): Relative file path -> content.
+
+    Returns:
+        str: The commit hash.
+    """
+    git_run(["git", "init", "--quiet", path])
+    commit_files(path, file_map)
+    return git_head_commit(path)
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as file:
+        file.write(content)
+
+def commit_files(path, file_map):
+    for relative_path, content in file_map.items():
+        write_file(os.path.join(path, relative_path), content)
+    git_run(["git", "add", "-A"], cwd=path)
+    git_run(["git", "-c", "user.name=test", "-c", "user.email=test@localhost", "commit", "--quiet", "-m", "Commit"],
+            cwd=path)
+
+def build_remotes(remote_path, dependency_map, file_map_map=None):
+    """
+    Create a bare file:// remote for every repository, listing its dependencies in ".dependencies".
+
+    Args:
+        remote_path (str): Folder to create the remotes in.
+        dependency_map (dict): Repository name -> dependency name array.
+        file_map_map (dict, optional, default = None): Repository name -> additional files (relative path -> content).
+    """
+    work_path = os.path.join(remote_path, "_work")
+    for name, dependency_array in dependency_map.items():
+        file_map = {os.path.join("Content", name, "file.txt"): name}
+        file_map.update((file_map_map or {}).get(name, {}))
+        if dependency_array:
+            file_map[".dependencies"] = "\n".join(f"file://{os.path.join(remote_path, dependency)}"
+                                                  for dependency in dependency_array)
+        repo_path = os.path.join(work_path, name)
+        create_repository(repo_path, file_map)
+        git_run(["git", "clone", "--quiet", "--bare", repo_path, os.path.join(remote_path, name)])
+    shutil.rmtree(work_path)
+
+def push_commit(remote_path, name, file_map):
+    """
+    Add a commit holding the provided files to the default branch of a remote created by build_remotes.
+
+    Returns:
+        str: The commit hash.
+    """
+    work_path = os.path.join(remote_path, "_work", name)
+    git_run(["git", "clone", "--quiet", os.path.join(remote_path, name), work_path])
+    commit_files(work_path, file_map)
+    git_run(["git", "push", "--quiet", "origin", "HEAD"], cwd=work_path)
+    commit = git_head_commit(work_path)
+    shutil.rmtree(os.path.join(remote_path, "_work"))
+    return commit
+
+def run_main(clone_request_list, path, **argument_map):
+    """
+    Run main with the output suppressed.
+
+    Returns:
+        tuple: The status and the output of the run.
+    """
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        status = main(clone_request_list, path=path, **argument_map)
+    return status, output.getvalue()
+
+def file_request(remote_path, name, branch=None, commit=None):
+    return clone_request(url=f"file://{os.path.join(remote_path, name)}", branch=branch, commit=commit)
+
+class TemporaryFolderTestCase(unittest.TestCase):
+    """
+    Test case with an empty temporary folder, removed after every test.
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp(prefix="multiclone-test-")
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+#####################################################################################################
+# Tests #############################################################################################
+#####################################################################################################
+
+class TestClone(TemporaryFolderTestCase):
+
+    def test_diamond_jobs(self):
+        remote_path = os.path.join(self.path, "remote")
+        build_remotes(remote_path, {"Root": ["Left", "Right"], "Left": ["Base"], "Right": ["Base/"],
+                                    "Base": []})
+        workspace_path = os.path.join(self.path, "workspace")
+        lock_path = os.path.join(self.path, "multiclone.lock")
+        status, output = run_main([file_request(remote_path, "Root")], workspace_path, force=True, depth=1, jobs=4,
+                                  write_lock=lock_path)
+        self.assertTrue(status, output)
+
+        self.assertEqual(sorted(os.listdir(os.path.join(workspace_path, "source"))),
+                         ["Base", "Left", "Right", "Root"])
+        for name in ("Base", "Left", "Right", "Root"):
+            self.assertTrue(os.path.isfile(os.path.join(workspace_path, "source", name, "Content", name, "file.txt")))
+        with open(lock_path, 'r') as file:
+            lock_line_array = file.read().splitlines()
+        self.assertEqual(len(lock_line_array), 4)  # Base cloned once
+        self.assertFalse(os.path.exists(os.path.join(workspace_path, ".multiclone")))  # No state by default
+
+class TestMirrorCache(TemporaryFolderTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.remote_path = os.path.join(self.path, "remote")
+        build_remotes(self.remote_path, {"A": [], "B": []})
+        self.cache_path = os.path.join(self.path, "cache")
+
+    def test_reuse(self):
+        workspace_path = os.path.join(self.path, "workspace")
+        status, output = run_main([file_request(self.remote_path, "A")], workspace_path, mirror_cache=self.cache_path)
+        self.assertTrue(status, output)
+        self.assertIn("Mirror created: A-", output)
+        repo_path = os.path.join(workspace_path, "source", "A")
+        origin = git_run(["git", "remote", "get-url", "origin"], cwd=repo_path).stdout.decode().strip()
+        self.assertEqual(origin, f"file://{os.path.join(self.remote_path, 'A')}")
+
+        # New commits are fetched into the existing mirror
+        commit = push_commit(self.remote_path, "A", {"new.txt": "new"})
+        status, output = run_main([file_request(self.remote_path, "A")], workspace_path, force=True,
+                                  mirror_cache=self.cache_path)
+        self.assertTrue(status, output)
+        self.assertIn("Mirror updated: A-", output)
+        self.assertEqual(git_head_commit(repo_path), commit)
+        self.assertEqual(len(os.listdir(self.cache_path)), 1)
+
+    def test_evict_least_recently_used(self):
+        path_map = {}
+        for index, name in enumerate(("A", "B")):
+            url = f"file://{os.path.join(self.remote_path, name)}"
+            path_map[name] = mirror_update(url, normalize_url(url), self.cache_path, log=[])
+            self.assertEqual(path_map[name], build_mirror_path(normalize_url(url), self.cache_path))
+            os.utime(os.path.join(path_map[name], MIRROR_LAST_USED_FILE), (1000 + index, 1000 + index))
+
+        self.assertEqual(mirror_evict(self.cache_path, 1024 ** 3), [])  # Within size
+        self.assertEqual(mirror_evict(self.cache_path, 1, keep_after=1000), [])  # Used by this run
+        self.assertEqual(mirror_evict(self.cache_path, 1, keep_after=1001), [os.path.basename(path_map["A"])])
+        self.assertFalse(os.path.exists(path_map["A"]))
+        self.assertTrue(os.path.exists(path_map["B"]))
+
+class TestSync(TemporaryFolderTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.remote_path = os.path.join(self.path, "remote")
+        build_remotes(self.remote_path, {"A": []})
+        self.workspace_path = os.path.join(self.path, "workspace")
+        self.repo_path = os.path.join(self.workspace_path, "source", "A")
+        status, output = run_main([file_request(self.remote_path, "A")], self.workspace_path)
+        self.assertTrue(status, output)
+
+    def test_fetch_and_skip(self):
+        commit = push_commit(self.remote_path, "A", {"new.txt": "new"})
+        status, output = run_main([file_request(self.remote_path, "A")], self.workspace_path, sync=True)
+        self.assertTrue(status, output)
+        self.assertIn("Successfully synced repository: A", output)
+        self.assertEqual(git_head_commit(self.repo_path), commit)
+
+        status, output = run_main([file_request(self.remote_path, "A")], self.workspace_path, sync=True)
+        self.assertTrue(status, output)
+        self.assertIn("Repository already at requested version, sync skipped: A", output)
+
+    def test_local_changes_reset(self):
+        file_path = os.path.join(self.repo_path, "Content", "A", "file.txt")
+        write_file(file_path, "local change")
+        untracked_path = os.path.join(self.repo_path, "untracked.txt")
+        write_file(untracked_path, "kept")
+        status, output = run_main([file_request(self.remote_path, "A")], self.workspace_path, sync=True)
+        self.assertTrue(status, output)
+        self.assertIn("Successfully synced repository: A", output)
+        with open(file_path, 'r') as file:
+            self.assertEqual(file.read(), "A")
+        self.assertTrue(os.path.exists(untracked_path))
+
+    def test_branch(self):
+        work_path = os.path.join(self.path, "work")
+        git_run(["git", "clone", "--quiet", os.path.join(self.remote_path, "A"), work_path])
+        git_run(["git", "checkout", "--quiet", "-b", "dev"], cwd=work_path)
+        commit_files(work_path, {"dev.txt": "dev"})
+        git_run(["git", "push", "--quiet", "origin", "dev"], cwd=work_path)
+
+        status, output = run_main([file_request(self.remote_path, "A", branch="dev")], self.workspace_path, sync=True)
+        self.assertTrue(status, output)
+        self.assertEqual(git_head_commit(self.repo_path), git_head_commit(work_path))
+        branch = git_run(["git", "rev-parse", "--abbrev-ref", "HEAD"], cwd=self.repo_path).stdout.decode().strip()
+        self.assertEqual(branch, "dev")
+
+class TestResolve(TemporaryFolderTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.remote_path = os.path.join(self.path, "remote")
+        self.workspace_path = os.path.join(self.path, "workspace")
+
+    def test_resolve_graph(self):
+        build_remotes(self.remote_path, {"Root": ["Left", "Right"], "Left": ["Base"], "Right": ["Base"], "Base": []})
+        status, output = run_main([file_request(self.remote_path, "Root")], self.workspace_path, resolve=True, jobs=4)
+        self.assertTrue(status, output)
+        self.assertIn("Dependency graph resolved: 4 repositories", output)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.workspace_path, "source"))),
+                         ["Base", "Left", "Right", "Root"])
+
+    def test_abort_before_clone(self):
+        build_remotes(self.remote_path, {"Root": ["Left", "Missing"], "Left": []})
+        with self.assertRaises(SystemExit) as context:
+            run_main([file_request(self.remote_path, "Root")], self.workspace_path, resolve=True, jobs=2)
+        self.assertEqual(context.exception.code, 1)
+        self.assertEqual(os.listdir(os.path.join(self.workspace_path, "source")), [])
+
+class TestCloneElements(unittest.TestCase):
+
+    def test_options(self):
+        request_array = string_to_clone_elements(
+            "https://host/A depth=3 filter=blob:none sparse=Source\\Sub/,Docs commit=abc123;https://host/B branch=dev")
+        self.assertEqual(len(request_array), 2)
+        self.assertEqual(request_array[0].url, "https://host/A")
+        self.assertEqual(request_array[0].depth, 3)
+        self.assertEqual(request_array[0].filter, "blob:none")
+        self.assertEqual(request_array[0].sparse, ("Source/Sub", "Docs"))
+        self.assertEqual(request_array[0].commit, "abc123")
+        self.assertEqual(request_array[1].branch, "dev")
+        self.assertIsNone(request_array[1].depth)
+        self.assertIsNone(request_array[1].sparse)
+
+    def test_newest_skips_commit_and_tag(self):
+        request_array = string_to_clone_elements("https://host/A commit=abc123\n\nhttps://host/B branch=tags/v1\n"
+                                                 "https://host/C branch=dev", delimiter="\n",
+                                                 version_action=VersionAction.ALL_NEWEST)
+        self.assertEqual(len(request_array), 3)
+        self.assertIsNone(request_array[0].commit)
+        self.assertIsNone(request_array[1].branch)
+        self.assertEqual(request_array[2].branch, "dev")
+
+    def test_target_keeps_commit_and_tag(self):
+        request_array = string_to_clone_elements("https://host/A commit=abc123\nhttps://host/B branch=tags/v1",
+                                                 delimiter="\n", version_action=VersionAction.ALWAYS_USE_TARGET)
+        self.assertEqual(request_array[0].commit, "abc123")
+        self.assertEqual(request_array[1].branch, "tags/v1")
+
+class TestCloneOptions(TemporaryFolderTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.remote_path = os.path.join(self.path, "remote")
+        work_path = os.path.join(self.remote_path, "_work", "A")
+        create_repository(work_path, {os.path.join("Docs", "doc.txt"): "doc", os.path.join("Source", "src.txt"): "src",
+                                      "root.txt": "root"})
+        git_run(["git", "clone", "--quiet", "--bare", work_path, os.path.join(self.remote_path, "A")])
+        self.url = f"file://{os.path.join(self.remote_path, 'A')}"
+        self.workspace_path = os.path.join(self.path, "workspace")
+        self.repo_path = os.path.join(self.workspace_path, "source", "A")
+
+    def test_sparse_and_filter(self):
+        request_array = string_to_clone_elements(f"{self.url} depth=1 filter=blob:none sparse=Docs")
+        status, output = run_main(request_array, self.workspace_path)
+        self.assertTrue(status, output)
+        self.assertEqual(sorted(os.listdir(self.repo_path)), [".git", "Docs", "root.txt"])
+        filter_spec = git_run(["git", "config", "remote.origin.partialclonefilter"], cwd=self.repo_path)
+        self.assertEqual(filter_spec.stdout.decode().strip(), "blob:none")
+
+    def test_sync_applies_sparse(self):
+        status, output = run_main(string_to_clone_elements(self.url), self.workspace_path)
+        self.assertTrue(status, output)
+        self.assertEqual(sorted(os.listdir(self.repo_path)), [".git", "Docs", "Source", "root.txt"])
+
+        status, output = run_main(string_to_clone_elements(f"{self.url} sparse=Source"), self.workspace_path,
+                                  sync=True)
+        self.assertTrue(status, output)
+        self.assertEqual(sorted(os.listdir(self.repo_path)), [".git", "Source", "root.txt"])
+
+        status, output = run_main(string_to_clone_elements(self.url), self.workspace_path, sync=True)
+        self.assertTrue(status, output)
+        self.assertEqual(sorted(os.listdir(self.repo_path)), [".git", "Docs", "Source", "root.txt"])
+
+class TestPinnedCommit(TemporaryFolderTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.remote_path = os.path.join(self.path, "remote")
+        build_remotes(self.remote_path, {"A": []})
+        self.commit = git_run(["git", "rev-parse", "HEAD"], cwd=os.path.join(self.remote_path, "A")).stdout.decode()
+        self.commit = self.commit.strip()
+        push_commit(self.remote_path, "A", {"new.txt": "1"})
+        push_commit(self.remote_path, "A", {"new.txt": "2"})
+        self.workspace_path = os.path.join(self.path, "workspace")
+        self.repo_path = os.path.join(self.workspace_path, "source", "A")
+
+    def test_full_commit(self):
+        status, output = run_main([file_request(self.remote_path, "A", commit=self.commit)], self.workspace_path)
+        self.assertTrue(status, output)
+        self.assertNotIn("deepen history", output)
+        self.assertEqual(git_head_commit(self.repo_path), self.commit)
+        self.assertFalse(os.path.exists(os.path.join(self.repo_path, "new.txt")))
+
+    def test_abbreviated_commit(self):
+        status, output = run_main([file_request(self.remote_path, "A", commit=self.commit[:10])], self.workspace_path)
+        self.assertTrue(status, output)
+        self.assertIn(f"Commit could not be fetched directly, deepen history: {self.commit[:10]}", output)
+        self.assertEqual(git_head_commit(self.repo_path), self.commit)
+
+    def test_unknown_commit(self):
+        output = io.StringIO()
+        with self.assertRaises(SystemExit), contextlib.redirect_stdout(output):
+            main([file_request(self.remote_path, "A", commit="0" * 40)], path=self.workspace_path)
+        self.assertIn("Failed to clone repository: A", output.getvalue())
+        self.assertFalse(os.path.exists(self.repo_path))
+
+class TestLockFile(TemporaryFolderTestCase):
+
+    def test_restore(self):
+        remote_path = os.path.join(self.path, "remote")
+        build_remotes(remote_path, {"Root": ["A"], "A": [], "B": []})
+        lock_path = os.path.join(self.path, "multiclone.lock")
+        status, output = run_main([file_request(remote_path, "Root")], os.path.join(self.path, "first"),
+                                  write_lock=lock_path)
+        self.assertTrue(status, output)
+        self.assertIn("Lock file written", output)
+        locked_commit_map = {name: git_head_commit(os.path.join(self.path, "first", "source", name))
+                             for name in ("Root", "A")}
+        with open(lock_path, 'r') as file:
+            lock_content = file.read()
+        self.assertIn(f"commit={locked_commit_map['A']}", lock_content)
+
+        # Later commits and dependencies are not used
+        push_commit(remote_path, "A", {"new.txt": "new"})
+        push_commit(remote_path, "Root", {".dependencies": f"file://{os.path.join(remote_path, 'A')}\n"
+                                                           f"file://{os.path.join(remote_path, 'B')}"})
+        workspace_path = os.path.join(self.path, "restore")
+        status, output = run_main([], workspace_path, from_lock=lock_path, jobs=2)
+        self.assertTrue(status, output)
+        self.assertEqual(sorted(os.listdir(os.path.join(workspace_path, "source"))), ["A", "Root"])
+        for name, commit in locked_commit_map.items():
+            self.assertEqual(git_head_commit(os.path.join(workspace_path, "source", name)), commit)
+
+class TestUrl(unittest.TestCase):
+
+    def test_normalize_url(self):
+        self.assertEqual(normalize_url("HTTPS://GitHub.com/Owner/Repo.git"), "https://github.com/Owner/Repo")
+        self.assertEqual(normalize_url("https://github.com/Owner/Repo/"), "https://github.com/Owner/Repo")
+        self.assertEqual(normalize_url(" https://github.com/Owner/Repo.git/ "), "https://github.com/Owner/Repo")
+        self.assertEqual(normalize_url("file:///tmp/Remote/Repo.git"), "file:///tmp/Remote/Repo")
+
+    def test_extract_repo_name(self):
+        self.assertEqual(extract_repo_name("https://github.com/Owner/Repo"), "Repo")
+        self.assertEqual(extract_repo_name("https://github.com/Owner/Repo.git"), "Repo")
+        self.assertEqual(extract_repo_name("https://github.com/Owner/Repo/"), "Repo")
+        self.assertEqual(extract_repo_name("https://github.com/Owner/Repo.git/"), "Repo")
+        self.assertEqual(extract_repo_name("https://github.com/Owner/LV32.2020..PPL.ClassLoader/"), "PPL.ClassLoader")
+
+    def test_invalid_repo_name(self):
+        self.assertFalse(valid_repo_name(extract_repo_name("file:///tmp/..")))
+        self.assertFalse(valid_repo_name(extract_repo_name("file:///tmp/.git")))
+        self.assertFalse(valid_repo_name(""))
+        self.assertTrue(valid_repo_name(extract_repo_name("file:///tmp/Repo.git/")))
+
+class TestDependencyGraph(unittest.TestCase):
+
+    def test_add(self):
+        graph = DependencyGraph()
+        graph.add("https://host/Root", 0)
+        graph.add("https://host/Left.git", 1, requester_url="https://host/Root")
+        graph.add("https://host/Right", 2, requester_url="https://host/Root")
+        node, is_new = graph.add("https://host/Base", 3, requester_url="https://host/Left")
+        self.assertTrue(is_new)
+        same_node, is_new = graph.add("HTTPS://HOST/Base.git/", 4, requester_url="https://host/Right/")
+        self.assertFalse(is_new)
+        self.assertIs(same_node, node)
+        self.assertEqual(node.index, 3)
+        self.assertEqual(node.requester_key, "https://host/Left")
+        self.assertEqual(len(graph), 4)
+        self.assertIn("HTTPS://HOST/Left", graph)  # Scheme and host are case insensitive, path is not
+        self.assertNotIn("https://host/left", graph)
+        self.assertEqual(graph.get("https://host/Root").dependency_keys, ["https://host/Left", "https://host/Right"])
+
+class TestSelectVersion(unittest.TestCase):
+
+    newest = version_constraint(requester="https://host/A", branch=None, commit=None)
+    commit = version_constraint(requester="https://host/B", branch=None, commit="abc123")
+    tag = version_constraint(requester="https://host/C", branch="tags/v1", commit=None)
+    branch = version_constraint(requester="https://host/D", branch="dev", commit=None)
+
+    def test_use_first_request(self):
+        constraint_array = [self.newest, self.commit, self.branch]
+        self.assertEqual(select_version(constraint_array, ConflictAction.USE_FIRST_REQUEST), self.commit)
+
+    def test_use_newest(self):
+        self.assertEqual(select_version([self.commit, self.tag, self.branch], ConflictAction.USE_NEWEST), self.branch)
+        self.assertEqual(select_version([self.commit, self.tag], ConflictAction.USE_NEWEST), self.commit)
+        self.assertEqual(select_version([self.newest, self.tag], ConflictAction.USE_NEWEST), self.tag)
+
+    def test_fail(self):
+        self.assertEqual(select_version([self.newest, self.tag, self.branch], ConflictAction.FAIL), self.tag)
+
+    def test_requested_directly(self):
+        requested = version_constraint(requester=None, branch=None, commit=None)
+        for conflict_action in ConflictAction:
+            self.assertEqual(select_version([self.commit, requested, self.branch], conflict_action), requested)
+
+    def test_unversioned_only(self):
+        other_newest = self.newest._replace(requester="https://host/E")
+        for conflict_action in ConflictAction:
+            self.assertEqual(select_version([self.newest, other_newest], conflict_action), self.newest)
+
+    def test_versions_conflict(self):
+        self.assertFalse(versions_conflict([self.newest, self.branch]))
+        self.assertFalse(versions_conflict([self.branch, self.branch._replace(requester="https://host/E")]))
+        self.assertTrue(versions_conflict([self.newest, self.branch, self.tag]))
+
+class TestDependencyGraphOrder(unittest.TestCase):
+
+    def build_graph(self):
+        graph = DependencyGraph()
+        graph.add("https://host/Root", 0)
+        graph.add("https://host/Other", 1)
+        graph.add("https://host/Right", 2, requester_url="https://host/Root")  # Found first, listed second
+        graph.add("https://host/Base", 3, requester_url="https://host/Right")
+        graph.add("https://host/Left", 4, requester_url="https://host/Other")
+        graph.get("https://host/Root").dependency_keys.insert(0, "https://host/Left")
+        graph.add("https://host/Base", 5, requester_url="https://host/Left")
+        return graph
+
+    def test_reachable(self):
+        graph = self.build_graph()
+        self.assertEqual(graph.reachable_keys(["https://host/Right"]), {"https://host/Right", "https://host/Base"})
+
+    def test_cycle(self):
+        graph = DependencyGraph()
+        graph.add("https://host/A", 0)
+        graph.add("https://host/B", 1, requester_url="https://host/A")
+        graph.add("https://host/A", 2, requester_url="https://host/B")
+        self.assertEqual(graph.reachable_keys(["https://host/B"]), {"https://host/A", "https://host/B"})
+        self.assertEqual(graph.order_map(), {"https://host/A": (0,), "https://host/B": (0, 0)})
+
+    def test_remove(self):
+        graph = DependencyGraph()
+        graph.add("https://host/A", 0)
+        node, _ = graph.add("https://host/B", 1, requester_url="https://host/A")
+        node.constraints.append(version_constraint(requester="https://host/A", branch="dev", commit=None))
+        graph.remove("https://host/A")
+        self.assertNotIn("https://host/A", graph)
+        self.assertEqual(node.constraints, [])
+
+    def test_order(self):
+        graph = self.build_graph()
+        order_map = graph.order_map()
+        self.assertEqual(sorted(order_map, key=order_map.get), ["https://host/Root", "https://host/Left",
+                                                                "https://host/Base", "https://host/Right",
+                                                                "https://host/Other"])
+
+    def test_sort_constraints(self):
+        graph = self.build_graph()
+        node = graph.get("https://host/Base")
+        right = version_constraint(requester="https://host/Right", branch="master", commit=None)
+        left = version_constraint(requester="https://host/Left", branch="dev", commit=None)
+        node.constraints = [right, left]  # Order found
+        self.assertEqual(sort_constraints(graph, node), [left, right])
+        self.assertEqual(select_version(sort_constraints(graph, node), ConflictAction.USE_FIRST_REQUEST), left)
+
+class TestConflictOrder(TemporaryFolderTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.remote_path = os.path.join(self.path, "remote")
+        build_remotes(self.remote_path, {"Root": ["Left", "Right"], "Left": ["Base branch=dev"],
+                                         "Right": ["Base branch=stable"], "Base": []})
+        work_path = os.path.join(self.path, "work")
+        git_run(["git", "clone", "--quiet", os.path.join(self.remote_path, "Base"), work_path])
+        self.commit_map = {}
+        for branch in ("dev", "stable"):
+            git_run(["git", "checkout", "--quiet", "-B", branch, "origin/HEAD"], cwd=work_path)
+            commit_files(work_path, {"branch.txt": branch})
+            git_run(["git", "push", "--quiet", "origin", branch], cwd=work_path)
+            self.commit_map[branch] = git_head_commit(work_path)
+
+        # Left is listed first but is the slowest clone, so Right requests Base first
+        push_commit(self.remote_path, "Left", {"large.bin": os.urandom(4 * 1024 * 1024).hex()})
+
+    def test_first_request_in_graph_order(self):
+        for resolve in (False, True, False):
+            workspace_path = os.path.join(self.path, f"workspace-{resolve}")
+            shutil.rmtree(workspace_path, ignore_errors=True)
+            status, output = run_main([file_request(self.remote_path, "Root")], workspace_path, jobs=4,
+                                      resolve=resolve)
+            self.assertTrue(status, output)
+            self.assertEqual(git_head_commit(os.path.join(workspace_path, "source", "Base")), self.commit_map["dev"],
+                             output)
+            self.assertNotIn("not applied", output)
+
+    def test_use_newest(self):
+        status, output = run_main([file_request(self.remote_path, "Root")], os.path.join(self.path, "workspace"),
+                                  jobs=4, conflict_action=ConflictAction.USE_NEWEST)
+        self.assertTrue(status, output)
+        self.assertEqual(git_head_commit(os.path.join(self.path, "workspace", "source", "Base")),
+                         self.commit_map["dev"])
+
+    def test_fail(self):
+        output = io.StringIO()
+        with self.assertRaises(SystemExit), contextlib.redirect_stdout(output):
+            main([file_request(self.remote_path, "Root")], path=os.path.join(self.path, "workspace"), jobs=4,
+                 resolve=True, conflict_action=ConflictAction.FAIL)
+        self.assertIn("Dependency version conflict - Abort", output.getvalue())
+        self.assertEqual(os.listdir(os.path.join(self.path, "workspace", "source")), [])
+
+class TestPluginRegistry(TemporaryFolderTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.suffix = os.path.basename(self.path).replace("-", "_")
+        write_file(os.path.join(self.path, f"plugin_base_{self.suffix}.py"),
+                   "class Base:\n"
+                   "    def action(self, ctx):\n"
+                   "        return True\n")
+        write_file(os.path.join(self.path, f"plugin_lazy_{self.suffix}.py"),
+                   f"from plugin_base_{self.suffix} import Base\n\n"
+                   "class Action_Direct:\n"
+                   "    def action(self, ctx):\n"
+                   "        return True\n\n"
+                   "class Action_Local(Action_Direct):\n"
+                   "    pass\n\n"
+                   "class Action_Inherited(Base):\n"
+                   "    pass\n\n"
+                   "class NotAPlugin:\n"
+                   "    pass\n\n"
+                   "class NotAPluginEither(dict):\n"
+                   "    pass\n")
+        self.module_name = f"plugin_lazy_{self.suffix}"
+
+    def tearDown(self):
+        sys.modules.pop(self.module_name, None)
+        sys.modules.pop(f"plugin_base_{self.suffix}", None)
+        super().tearDown()
+
+    def test_scan(self):
+        action_name_array, candidate_name_array = scan_action_classes(os.path.join(self.path,
+                                                                                   f"{self.module_name}.py"))
+        self.assertEqual(action_name_array, ["Action_Direct", "Action_Local"])
+        self.assertEqual(candidate_name_array, ["Action_Inherited", "NotAPluginEither"])
+
+    def test_lazy_import(self):
+        registry = PluginRegistry(post_clone_handler, [self.path])
+        self.assertNotIn(self.module_name, sys.modules)
+        self.assertIn("Action_Direct", registry)
+        self.assertIn("Action_CreateMainFolder", registry)  # Default plugin
+        self.assertNotIn(self.module_name, sys.modules)
+
+        plugin_object = registry["Action_Local"]
+        self.assertIn(self.module_name, sys.modules)
+        self.assertIs(registry["Action_Local"], plugin_object)  # Instantiated once
+        self.assertTrue(plugin_object.action(None))
+
+    def test_candidate(self):
+        registry = PluginRegistry(post_clone_handler, [self.path])
+        self.assertNotIn("Action_Inherited", registry.names())
+        self.assertIn("Action_Inherited", registry)  # Imported to check
+        self.assertNotIn("NotAPlugin", registry)
+        self.assertNotIn("NotAPluginEither", registry)
+        self.assertTrue(registry["Action_Inherited"].action(None))
+
+class TestPostCloneActions(TemporaryFolderTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.plugin_path = os.path.join(self.path, "plugins")
+        self.event_path = os.path.join(self.path, "events.txt")
+        module_name = f"plugin_actions_{os.path.basename(self.path).replace('-', '_')}"
+        write_file(os.path.join(self.plugin_path, f"{module_name}.py"),
+                   "import threading\n\n"
+                   f"EVENT_PATH = {self.event_path!r}\n"
+                   "barrier = threading.Barrier(2, timeout=2)\n"
+                   "event_lock = threading.Lock()\n\n"
+                   "class Action_Meet:\n"
+                   "    def action(self, ctx):\n"
+                   "        try:\n"
+                   "            barrier.wait()\n"
+                   "            return True\n"
+                   "        except threading.BrokenBarrierError:\n"
+                   "            return False\n\n"
+                   "class Action_Record:\n"
+                   "    def action(self, ctx):\n"
+                   "        with event_lock, open(EVENT_PATH, 'a') as file:\n"
+                   "            file.write(f'{ctx.repo_name} {ctx.data}\\n')\n"
+                   "        return True\n")
+        self.remote_path = os.path.join(self.path, "remote")
+
+    def read_events(self):
+        with open(self.event_path, 'r') as file:
+            return [tuple(line.split()) for line in file.read().splitlines()]
+
+    def test_parallel(self):
+        meet_map = {".postcloneactions": "Action_Meet"}
+        build_remotes(self.remote_path, {"Root": ["A"], "A": []}, {"Root": meet_map, "A": meet_map})
+        status, output = run_main([file_request(self.remote_path, "Root")], os.path.join(self.path, "parallel"),
+                                  jobs=2, action_paths=[self.plugin_path])
+        self.assertTrue(status, output)
+
+        # One repository at a time, the first action waits for the second in vain
+        status, output = run_main([file_request(self.remote_path, "Root")], os.path.join(self.path, "serial"),
+                                  jobs=1, action_paths=[self.plugin_path])
+        self.assertFalse(status, output)
+
+    def build_stage_remotes(self):
+        file_map_map = {}
+        for name in ("Root", "A", "B"):
+            file_map_map[name] = {".postcloneactions_initial": "Action_Record initial",
+                                  ".postcloneactions": "Action_Record normal",
+                                  ".postcloneactions_final": "Action_Record final"}
+        build_remotes(self.remote_path, {"Root": ["A", "B"], "A": [], "B": []}, file_map_map)
+
+    def run_stages(self, name, **argument_map):
+        status, output = run_main([file_request(self.remote_path, "Root")], os.path.join(self.path, name), jobs=3,
+                                  action_paths=[self.plugin_path], **argument_map)
+        self.assertTrue(status, output)
+        event_array = self.read_events()
+        os.remove(self.event_path)
+        self.assertEqual(sorted(event_array), sorted((repo_name, stage) for repo_name in ("Root", "A", "B")
+                                                     for stage in ("initial", "normal", "final")))
+        return event_array
+
+    def assert_global(self, event_array, first_stage, second_stage):
+        last_first = max(i for i, (_, stage) in enumerate(event_array) if stage == first_stage)
+        first_second = min(i for i, (_, stage) in enumerate(event_array) if stage == second_stage)
+        self.assertLess(last_first, first_second, event_array)
+
+    def assert_per_repo(self, event_array):
+        for repo_name in ("Root", "A", "B"):
+            self.assertEqual([stage for name, stage in event_array if name == repo_name],
+                             ["initial", "normal", "final"], event_array)
+
+    def test_stages(self):
+        self.build_stage_remotes()
+        event_array = self.run_stages("stages")
+        self.assert_global(event_array, "initial", "normal")
+        self.assert_global(event_array, "normal", "final")
+
+    def test_pipelined_global(self):
+        self.build_stage_remotes()
+        event_array = self.run_stages("global", pipeline_actions=True)
+        self.assert_global(event_array, "initial", "normal")
+        self.assert_global(event_array, "normal", "final")
+
+    def test_pipelined_per_repo(self):
+        self.build_stage_remotes()
+        event_array = self.run_stages("per-repo", pipeline_actions=True, initial_stage_order=StageOrder.PER_REPO,
+                                      final_stage_order=StageOrder.PER_REPO)
+        self.assert_per_repo(event_array)
+
+        # Dependencies are ready before the repository requiring them
+        root_index = event_array.index(("Root", "initial"))
+        self.assertLess(event_array.index(("A", "initial")), root_index)
+        self.assertLess(event_array.index(("B", "initial")), root_index)
+
+class TestActionArguments(unittest.TestCase):
+
+    class Action_Test:
+        required_arguments = ("target",)
+        argument_keys = ("target", "exclusions", "mode")
+        argument_values = {"mode": ("hardlink", "copy")}
+
+        def action(self, ctx):
+            return True
+
+    def test_parse(self):
+        arguments = parse_action_arguments(" source=Src;target=PPL;exclusions=a.txt;b.txt;mode=copy ")
+        self.assertEqual(arguments.value, "source=Src;target=PPL;exclusions=a.txt;b.txt;mode=copy")
+        self.assertEqual(arguments.source, "Src")
+        self.assertEqual(arguments.target, "PPL")
+        self.assertEqual(arguments.exclusions, ["a.txt", "b.txt"])
+        self.assertEqual(arguments.mode, "copy")
+
+    def test_parse_empty(self):
+        arguments = parse_action_arguments(None)
+        self.assertEqual(arguments.value, "")
+        self.assertIsNone(arguments.target)
+        self.assertEqual(arguments.exclusions, [])
+
+    def test_validate(self):
+        self.assertEqual(validate_action_arguments(self.Action_Test, parse_action_arguments("target=PPL")), [])
+        self.assertEqual(validate_action_arguments(self.Action_Test, parse_action_arguments("exclusions=a")),
+                         ["target-argument missing"])
+        self.assertEqual(validate_action_arguments(self.Action_Test, parse_action_arguments("target=PPL;source=Src")),
+                         ["unknown argument: source="])
+        self.assertEqual(validate_action_arguments(self.Action_Test, parse_action_arguments("target=PPL;mode=move")),
+                         ["mode-argument must be one of hardlink, copy: move"])
+
+    def test_validate_without_metadata(self):
+        class Action_Plain:
+            def action(self, ctx):
+                return True
+        self.assertEqual(validate_action_arguments(Action_Plain, parse_action_arguments("anything=1")), [])
+
+class TestActionPlan(TemporaryFolderTestCase):
+
+    def test_invalid_plan(self):
+        remote_path = os.path.join(self.path, "remote")
+        build_remotes(remote_path, {"Root": ["A"], "A": []},
+                      {"Root": {".postcloneactions": "Action_Unknown"},
+                       "A": {".postcloneactions": "Action_CreateMainFolder Main"}})
+        clone_path = os.path.join(self.path, "clone")
+        status, output = run_main([file_request(remote_path, "Root")], clone_path)
+        self.assertFalse(status)
+        self.assertIn("unknown action Action_Unknown", output)
+
+        # An invalid plan runs no actions at all
+        self.assertFalse(os.path.exists(os.path.join(clone_path, "main", "Main")))
+
+class TestFileSystem(TemporaryFolderTestCase):
+
+    def setUp(self):
+        super().setUp()
+        fs.stat_cache_clear()
+        self.source_path = os.path.join(self.path, "source")
+        write_file(os.path.join(self.source_path, "file.txt"), "content")
+        self.link_path = os.path.join(self.path, "link")
+
+    def test_link(self):
+        self.assertFalse(fs.is_link(self.link_path))
+        fs.create_link(self.link_path, self.source_path)
+        self.assertTrue(fs.is_link(self.link_path))
+        self.assertFalse(fs.is_link(self.source_path))
+        self.assertEqual(os.path.abspath(fs.link_target(self.link_path)), os.path.abspath(self.source_path))
+        fs.remove_link(self.link_path)
+        self.assertFalse(fs.path_exists(self.link_path))
+        self.assertTrue(os.path.exists(os.path.join(self.source_path, "file.txt")))
+
+    def test_remove_tree(self):
+        # Removing a link keeps the folder it points to
+        fs.create_link(self.link_path, self.source_path)
+        fs.remove_tree(self.link_path)
+        self.assertFalse(fs.path_exists(self.link_path))
+        self.assertTrue(os.path.exists(os.path.join(self.source_path, "file.txt")))
+
+        # Read-only files are removed too, like git objects
+        os.chmod(os.path.join(self.source_path, "file.txt"), stat.S_IREAD)
+        fs.remove_tree(self.source_path)
+        self.assertFalse(os.path.exists(self.source_path))
+
+    def test_cache_missing_path(self):
+        # Missing paths are looked up again, other code may create them
+        self.assertFalse(fs.path_exists(self.link_path))
+        os.makedirs(self.link_path)
+        self.assertTrue(fs.path_exists(self.link_path))
+        self.assertFalse(fs.is_link(self.link_path))
+        fs.remove_tree(self.link_path)
+        fs.create_link(self.link_path, self.source_path)
+        self.assertTrue(fs.is_link(self.link_path))
+
+    def test_delete_if_force(self):
+        fs.create_link(self.link_path, self.source_path)
+        force = globals_object.force
+        try:
+            globals_object.force = False
+            self.assertTrue(delete_junction_if_force(self.link_path))
+            self.assertTrue(fs.is_link(self.link_path))
+            globals_object.force = True
+            self.assertTrue(delete_junction_if_force(self.link_path))
+            self.assertFalse(fs.path_exists(self.link_path))
+            self.assertTrue(delete_folder_if_force(self.source_path))
+            self.assertFalse(os.path.exists(self.source_path))
+        finally:
+            globals_object.force = force
+
+class TestLinkManifest(TemporaryFolderTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.path_workspace = globals_object.path_workspace
+        self.force = globals_object.force
+        globals_object.path_workspace = self.path
+        globals_object.force = False
+        self.path_source = os.path.join(self.path, "source", "Repo")
+        self.path_target = os.path.join(self.path, "main", "Repo")
+        for relative_path in ("a.txt", os.path.join("Sub", "b.txt"), "_hidden.txt"):
+            write_file(os.path.join(self.path_source, relative_path), relative_path)
+
+    def tearDown(self):
+        globals_object.path_workspace = self.path_workspace
+        globals_object.force = self.force
+        super().tearDown()
+
+    def test_hardlink(self):
+        recreate_linked_folder_structure(self.path_source, self.path_target, exclusions=["Sub"])
+        source_stat = os.stat(os.path.join(self.path_source, "a.txt"))
+        target_stat = os.stat(os.path.join(self.path_target, "a.txt"))
+        self.assertEqual((source_stat.st_ino, source_stat.st_dev), (target_stat.st_ino, target_stat.st_dev))
+        self.assertFalse(os.path.exists(os.path.join(self.path_target, "Sub")))
+
+    def test_diff(self):
+        result = recreate_linked_folder_structure(self.path_source, self.path_target)
+        self.assertEqual((result.linked, result.skipped, result.removed, result.failed), (2, 0, 0, []))
+        manifest_path = build_manifest_path(self.path_source, self.path_target)
+        self.assertTrue(os.path.isfile(manifest_path))
+        self.assertEqual(os.path.dirname(manifest_path), os.path.join(self.path, ".multiclone", "links"))
+        self.assertEqual(sorted(os.listdir(self.path_target)), ["Sub", "a.txt"])
+        self.assertFalse(os.path.exists(os.path.join(self.path_target, "_hidden.txt")))
+
+        # Unchanged source
+        result = recreate_linked_folder_structure(self.path_source, self.path_target)
+        self.assertEqual((result.linked, result.skipped, result.removed), (0, 2, 0))
+
+        # Added and removed source files
+        write_file(os.path.join(self.path_source, "c.txt"), "c")
+        os.remove(os.path.join(self.path_source, "Sub", "b.txt"))
+        result = recreate_linked_folder_structure(self.path_source, self.path_target)
+        self.assertEqual((result.linked, result.skipped, result.removed), (1, 1, 1))
+        self.assertTrue(os.path.isfile(os.path.join(self.path_target, "c.txt")))
+        self.assertFalse(os.path.exists(os.path.join(self.path_target, "Sub")))
+
+    def test_changed_copy(self):
+        result = recreate_linked_folder_structure(self.path_source, self.path_target, mode="copy")
+        self.assertEqual(result.linked, 2)
+        write_file(os.path.join(self.path_source, "a.txt"), "changed content")
+        result = recreate_linked_folder_structure(self.path_source, self.path_target, mode="copy")
+        self.assertEqual((result.linked, result.skipped), (1, 1))
+        with open(os.path.join(self.path_target, "a.txt"), 'r') as file:
+            self.assertEqual(file.read(), "changed content")
+
+    def test_copy_isolated(self):
+        result = recreate_linked_folder_structure(self.path_source, self.path_target, mode="copy")
+        self.assertEqual(result.mode_count_map, {"copy": 2})
+        write_file(os.path.join(self.path_target, "a.txt"), "written in place")
+        with open(os.path.join(self.path_source, "a.txt"), 'r') as file:
+            self.assertEqual(file.read(), "a.txt")
+
+    def test_reflink_fallback(self):
+        # Copy-on-write where supported, a full copy elsewhere, never a hard link
+        result = recreate_linked_folder_structure(self.path_source, self.path_target, mode="reflink")
+        self.assertEqual((result.linked, result.failed), (2, []))
+        self.assertEqual(sum(result.mode_count_map.values()), 2)
+        self.assertTrue(set(result.mode_count_map) <= {"reflink", "copy"})
+        self.assertNotEqual(os.stat(os.path.join(self.path_source, "a.txt")).st_ino,
+                            os.stat(os.path.join(self.path_target, "a.txt")).st_ino)
+
+    def test_foreign_target_kept(self):
+        recreate_linked_folder_structure(self.path_source, self.path_target)
+        target_file_path = os.path.join(self.path_target, "a.txt")
+        os.remove(target_file_path)
+        write_file(target_file_path, "local")  # Replaced by the user, not ours anymore
+        os.remove(os.path.join(self.path_source, "a.txt"))
+        result = recreate_linked_folder_structure(self.path_source, self.path_target)
+        self.assertEqual(result.removed, 0)
+        with open(target_file_path, 'r') as file:
+            self.assertEqual(file.read(), "local")
+
+class TestActionContext(TemporaryFolderTestCase):
+
+    class Action_Legacy:
+        barrier = None
+
+        def action(self):
+            if self.barrier is not None:
+                self.barrier.wait(timeout=5)  # All threads initialized before any reads its data
+            globals_object.pca_log_add(f"log {globals_object.action_repo_name}")
+            globals_object.pca_report_add(f"report {globals_object.action_arguments.target}")
+            globals_object.pca_variable_add("data", globals_object.action_data)
+            return globals_object.action_repo_path is not None
+
+    class Action_Context:
+        def action(self, ctx):
+            return True
+
+    def build_context(self, repo_name, data):
+        workspace = workspace_info(path_main=self.path, path_source=self.path, force=False, path_array=(),
+                                   repo_name_array=())
+        return ActionContext(os.path.join(self.path, repo_name), data, workspace=workspace)
+
+    def test_interface(self):
+        self.assertFalse(takes_context(self.Action_Legacy()))
+        self.assertTrue(takes_context(self.Action_Context()))
+
+    def test_legacy_action(self):
+        ctx = self.build_context("Repo", "target=PPL")
+        self.assertTrue(run_legacy_action(self.Action_Legacy(), ctx))
+        self.assertEqual(ctx.log, ["log Repo"])
+        self.assertEqual(ctx.report, ["report PPL"])
+        self.assertEqual(ctx.variable_map, {"data": "target=PPL"})
+
+    def test_legacy_action_threads(self):
+        # The globals_object action state is held per thread
+        plugin_object = self.Action_Legacy()
+        plugin_object.barrier = threading.Barrier(4)
+        ctx_array = [self.build_context(f"Repo{i}", f"target=T{i}") for i in range(4)]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            status_array = list(executor.map(lambda ctx: run_legacy_action(plugin_object, ctx), ctx_array))
+        self.assertEqual(status_array, [True] * 4)
+        for i, ctx in enumerate(ctx_array):
+            self.assertEqual(ctx.log, [f"log Repo{i}"])
+            self.assertEqual(ctx.report, [f"report T{i}"])
+            self.assertEqual(ctx.variable_map, {"data": f"target=T{i}"})
+
+class TestAsyncAction(unittest.TestCase):
+
+    class Action_Sleep:
+        running = 0
+        running_max = 0
+        lock = threading.Lock()
+
+        async def action(self, ctx):
+            with self.lock:
+                type(self).running += 1
+                type(self).running_max = max(type(self).running_max, type(self).running)
+            try:
+                await asyncio.sleep(float(ctx.data))
+            finally:
+                with self.lock:
+                    type(self).running -= 1
+            return True
+
+    class Action_SleepLimited(Action_Sleep):
+        timeout = 0.1
+
+    class Action_Raise:
+        async def action(self, ctx):
+            raise RuntimeError("broken")
+
+    def setUp(self):
+        self.Action_Sleep.running_max = 0
+
+    def run_action(self, runner, plugin_object, data):
+        ctx = ActionContext("Repo", data, workspace=workspace_info(path_main=None, path_source=None, force=False,
+                                                                   path_array=(), repo_name_array=()))
+        with runner.job_slots:  # Held by the repository worker running the action
+            return runner.run(plugin_object, ctx), ctx.log
+
+    def test_async_action(self):
+        self.assertTrue(is_async_action(self.Action_Sleep))
+        self.assertFalse(is_async_action(TestActionContext.Action_Context))
+        runner = AsyncActionRunner()
+        try:
+            self.assertEqual(self.run_action(runner, self.Action_Sleep(), "0"), (True, []))
+            self.assertEqual(self.run_action(runner, self.Action_Raise(), ""),
+                             (False, ["Action raised RuntimeError: broken"]))
+        finally:
+            runner.close()
+
+    def test_timeout(self):
+        runner = AsyncActionRunner(timeout=0.1)
+        try:
+            self.assertEqual(self.run_action(runner, self.Action_Sleep(), "5"),
+                             (False, ["Action timed out after 0.1 seconds"]))
+        finally:
+            runner.close()
+
+        # The plugin timeout takes precedence
+        runner = AsyncActionRunner(timeout=None)
+        try:
+            self.assertFalse(self.run_action(runner, self.Action_SleepLimited(), "5")[0])
+        finally:
+            runner.close()
+
+    def test_limit(self):
+        runner = AsyncActionRunner(jobs=1, async_limit=2)
+        try:
+            # One job slot, waiting workers give it up so all actions are started, two at a time
+            with ThreadPoolExecutor(max_workers=runner.worker_count() + 2) as executor:
+                result_array = list(executor.map(lambda _: self.run_action(runner, self.Action_Sleep(), "0.2"),
+                                                 range(6)))
+        finally:
+            runner.close()
+        self.assertEqual(result_array, [(True, [])] * 6)
+        self.assertEqual(self.Action_Sleep.running_max, 2)
+
+class TestTrace(TemporaryFolderTestCase):
+
+    def tearDown(self):
+        tracer.file_path = None  # Stop recording spans of later tests
+        super().tearDown()
+
+    def test_disabled(self):
+        span_tracer = Tracer()
+        with TraceSpan(span_tracer, "clone Repo", "clone", {}):
+            pass
+        self.assertEqual(span_tracer.span_array, [])
+
+    def test_trace(self):
+        remote_path = os.path.join(self.path, "remote")
+        build_remotes(remote_path, {"Root": ["A"], "A": []})
+        trace_path = os.path.join(self.path, "trace.json")
+        status, output = run_main([file_request(remote_path, "Root")], os.path.join(self.path, "clone"),
+                                  trace=trace_path)
+        self.assertTrue(status, output)
+        self.assertIn(f"Trace written: {trace_path}", output)
+        self.assertIn("Trace summary:", output)
+
+        with open(trace_path, 'r') as file:
+            event_array = json.load(file)["traceEvents"]
+        span_array = [event for event in event_array if event["ph"] == "X"]
+        name_set = {(span["cat"], span["name"]) for span in span_array}
+        for phase_name in ("config", "clone", "post clone actions"):
+            self.assertIn(("phase", phase_name), name_set)
+        self.assertIn(("clone", "clone Root"), name_set)
+        self.assertIn(("clone", "clone A"), name_set)
+        self.assertTrue(any(span["cat"] == "git" for span in span_array))
+
+        # Every thread recording spans is named
+        thread_id_set = {event["tid"] for event in event_array if event["ph"] == "M"}
+        self.assertEqual({span["tid"] for span in span_array}, thread_id_set)
+
+class TestWorkspaceState(TemporaryFolderTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.repo_path = os.path.join(self.path, "source", "Repo")
+        self.commit = create_repository(self.repo_path, {"file.txt": "1"})
+        self.url = "file:///remote/Repo"
+        self.key = normalize_url(self.url)
+        self.options = {"branch": None, "commit": None, "depth": 1, "filter": None, "sparse": None}
+
+    def record(self):
+        workspace_state = WorkspaceState(self.path)
+        workspace_state.record_clone(self.key, self.url, self.options, self.repo_path, self.commit)
+        workspace_state.close()
+
+    def test_unchanged_skipped(self):
+        self.record()
+        workspace_state = WorkspaceState(self.path)
+        self.assertEqual(workspace_state.clone_unchanged(self.key, self.url, self.options, self.repo_path),
+                         self.commit)
+        self.assertIn(self.key, workspace_state.unchanged_key_set)
+        workspace_state.close()
+
+    def test_changed_not_skipped(self):
+        self.record()
+        workspace_state = WorkspaceState(self.path)
+        other_options = dict(self.options, depth=2)
+        self.assertIsNone(workspace_state.clone_unchanged(self.key, self.url, other_options, self.repo_path))
+        self.assertIsNone(workspace_state.clone_unchanged(self.key, f"{self.url}.git", self.options, self.repo_path))
+        commit_files(self.repo_path, {"file.txt": "2"})
+        self.assertIsNone(workspace_state.clone_unchanged(self.key, self.url, self.options, self.repo_path))
+        self.assertEqual(workspace_state.unchanged_key_set, set())
+        workspace_state.close()
+
+    def test_action_skipped(self):
+        step = action_step(plugin_name="Action_CreateMainFolder", data="Shared", arguments=None,
+                           repo_path=self.repo_path, action_source=".postcloneactions", line_number=1,
+                           shared_key=None)
+        workspace_state = WorkspaceState(self.path)
+        workspace_state.record_action(step, "hash", True)
+        workspace_state.close()
+
+        workspace_state = WorkspaceState(self.path)
+        self.assertFalse(workspace_state.action_applied(step, "hash"))  # Repository not marked reusable
+        workspace_state.mark_actions_reusable(self.repo_path)
+        self.assertTrue(workspace_state.action_applied(step, "hash"))
+        self.assertFalse(workspace_state.action_applied(step, "other hash"))
+        self.assertFalse(workspace_state.action_applied(step._replace(data="Other"), "hash"))
+        workspace_state.close()
+
+    def test_run_state(self):
+        remote_path = os.path.join(self.path, "remote")
+        build_remotes(remote_path, {"Root": ["A"], "A": []})
+        workspace_path = os.path.join(self.path, "workspace")
+        status, output = run_main([file_request(remote_path, "Root")], workspace_path, state=True)
+        self.assertTrue(status, output)
+        self.assertNotIn("clone skipped", output)
+
+        status, output = run_main([file_request(remote_path, "Root")], workspace_path, state=True)
+        self.assertTrue(status, output)
+        self.assertIn("Repository unchanged since last run, clone skipped: Root", output)
+        self.assertIn("Repository unchanged since last run, clone skipped: A", output)
+
+class TestRunJournal(TemporaryFolderTestCase):
+
+    def test_read_interrupted(self):
+        journal = RunJournal(self.path)
+        self.assertIsNone(journal.read_interrupted())  # No journal
+
+        journal.start()
+        journal.append(JOURNAL_CLONE, key="a", clone_commit="1")
+        journal.append("other", key="b")
+        event_array = journal.read_interrupted()
+        self.assertEqual([event["key"] for event in event_array], ["a"])
+
+        journal.finish()
+        self.assertIsNone(journal.read_interrupted())  # Completed
+
+    def test_resume_and_cut_line(self):
+        journal = RunJournal(self.path)
+        journal.start()
+        journal.append(JOURNAL_CLONE, key="a", clone_commit="1")
+        journal.file.close()
+        journal.file = None  # Killed
+        with open(journal.path, 'a') as file:
+            file.write('{"event": "clone", "key": "b", "clo')
+
+        journal = RunJournal(self.path)
+        self.assertEqual([event["key"] for event in journal.read_interrupted()], ["a"])
+        journal.start(resume=True)
+        journal.append(JOURNAL_CLONE, key="c", clone_commit="3")
+        self.assertEqual([event["key"] for event in journal.read_interrupted()], ["a", "c"])
+        journal.finish()
+
+        journal = RunJournal(self.path)
+        journal.start()
+        self.assertEqual(journal.read_interrupted(), [])  # New run replaces the journal
+        journal.finish()
+
+    def test_abort_resumable(self):
+        remote_path = os.path.join(self.path, "remote")
+        build_remotes(remote_path, {"Root": ["Left", "Right"], "Left": ["Base branch=dev"],
+                                    "Right": ["Base branch=stable"], "Base": []})
+        for branch in ("dev", "stable"):
+            git_run(["git", "branch", branch], cwd=os.path.join(remote_path, "Base"))
+        workspace_path = os.path.join(self.path, "workspace")
+        output = io.StringIO()
+        with self.assertRaises(SystemExit), contextlib.redirect_stdout(output):
+            main([file_request(remote_path, "Root")], path=workspace_path, state=True,
+                 conflict_action=ConflictAction.FAIL)
+        self.assertIn("Dependency version conflict - Abort", output.getvalue())
+        self.assertIn("Run again with --resume", output.getvalue())
+
+        # The journal of the aborted run is closed but not done
+        event_array = RunJournal(workspace_path).read_interrupted()
+        self.assertEqual(len(event_array), 4, output.getvalue())
+        status, output = run_main([file_request(remote_path, "Root")], workspace_path, resume=True,
+                                  conflict_action=ConflictAction.USE_FIRST_REQUEST)
+        self.assertTrue(status, output)
+        self.assertIn("Resume interrupted run: 4 clones", output)
+        self.assertIsNone(RunJournal(workspace_path).read_interrupted())
+
+class TestPrefetch(TemporaryFolderTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.remote_path = os.path.join(self.path, "remote")
+        build_remotes(self.remote_path, {"Root": ["A"], "A": ["B"], "B": [], "C": []})
+        self.workspace_path = os.path.join(self.path, "workspace")
+
+    def run_prefetch(self, **argument_map):
+        status, output = run_main([file_request(self.remote_path, "Root")], self.workspace_path, force=True, jobs=4,
+                                  prefetch=True, **argument_map)
+        self.assertTrue(status, output)
+        return output
+
+    def source_names(self):
+        return sorted(name for name in os.listdir(os.path.join(self.workspace_path, "source"))
+                      if not name.startswith("."))
+
+    def test_confirm(self):
+        output = self.run_prefetch()
+        self.assertIn("Prefetch: No dependencies cached for the requested repositories", output)
+        output = self.run_prefetch()
+        self.assertIn("Prefetch: 2 dependencies cached by the last run", output)
+        self.assertIn("Prefetched dependencies: 2 confirmed, 0 discarded", output)
+        self.assertEqual(self.source_names(), ["A", "B", "Root"])
+
+    def test_discard(self):
+        self.run_prefetch()
+        push_commit(self.remote_path, "Root", {".dependencies": f"file://{os.path.join(self.remote_path, 'C')}"})
+        output = self.run_prefetch()
+        self.assertIn("Prefetched dependencies: 0 confirmed, 2 discarded", output)
+        self.assertEqual(self.source_names(), ["A", "B", "C", "Root"])  # A and B are left from the first run
+        self.assertEqual([name for name in os.listdir(os.path.join(self.workspace_path, "source"))
+                          if name.endswith(".partial")], [])
+        self.assertTrue(os.path.isfile(os.path.join(self.workspace_path, "source", "C", "Content", "C", "file.txt")))
+
+        # The dependencies found replace the cache
+        output = self.run_prefetch()
+        self.assertIn("Prefetched dependencies: 1 confirmed, 0 discarded", output)
+
+    def test_resolve_updates_cache(self):
+        output = self.run_prefetch(resolve=True)
+        self.assertNotIn("dependencies cached", output)
+        output = self.run_prefetch()
+        self.assertIn("Prefetched dependencies: 2 confirmed, 0 discarded", output)
+
+#####################################################################################################
+# Online example ####################################################################################
+#####################################################################################################
+
+def run_online_example():
+    # Build clone request
+    clone_request_list = []
+    url = 'https://github.com/HenrikDueholm/LV32.2020..PPL.HDH.Driver.DMM'
+    info = clone_request(url=url, branch=None, commit=None)
+    clone_request_list.append(info)
+    url = 'https://github.com/HenrikDueholm/LV32.2020..PPL.ClassLoader'
+    info = clone_request(url=url, branch=None, commit=None)
+    clone_request_list.append(info)
+
+    # Call MultiClone
+    main(clone_request_list, path=path_test, force=True, depth=1)
 
-# Build clone request
-clone_request_list = []
-url = 'https://github.com/HenrikDueholm/LV32.2020..PPL.HDH.Driver.DMM'
-info = clone_request(url=url, branch=None, commit=None)
-clone_request_list.append(info)
-url = 'https://github.com/HenrikDueholm/LV32.2020..PPL.ClassLoader'
-info = clone_request(url=url, branch=None, commit=None)
-clone_request_list.append(info)
-
-# Call MultiClone
-main(clone_request_list, path=path_test, force=True, depth=1)
+if __name__ == "__main__":
+    # Offline tests by default, "--online" clones the example repositories from GitHub into ../Test
+    if "--online" in sys.argv:
+        run_online_example()
+    else:
+        unittest.main()